@@ -2,7 +2,8 @@ import streamlit as st
 from streamlit_option_menu import option_menu
 import sys
 import os
-from PIL import Image
+import copy
+import hashlib
 
 # Page config
 st.set_page_config(
@@ -12,6 +13,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Rerun latency: everything from here to the end of the routed view is one trace
+from utils import tracing
+tracing.begin_rerun()
+
 # Load CSS
 def local_css(file_name):
     with open(file_name) as f:
@@ -28,55 +33,107 @@ if "analysis_complete" not in st.session_state:
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
 
+# Per-session memory accounting: rehydrate spilled values, spill idle sessions
+from services import session_memory
+session_memory.touch()
+
+# A reconnected tab, or any tab after a server restart, logs back in from its session snapshot
+from services import session_restore
+if not st.session_state.authenticated:
+    session_restore.restore()
+
 # Import views
-from views import home, dashboard, progress, resources, immigration, contact, login
+from views import home, dashboard, progress, resources, immigration, contact, login, operator
+from utils.config import is_operator
+from utils.fragments import rerun_fragment
+from services import avatar, db_handler
+from botocore.exceptions import BotoCoreError, ClientError
 
 # AUTHENTICATION CHECK
 if not st.session_state.authenticated:
-    login.render()
+    with tracing.view("login"):
+        login.render()
     st.stop()  # Stop execution here, don't show the rest of the app
 
+# Profile picture and its uploader. A new photo reruns only this fragment,
+# not the navigation and the routed view.
+@st.fragment
+def profile_card():
+    with tracing.fragment("avatar"):
+        session_memory.touch()
+        # Only the avatar's content hash lives in session state; the encoded bytes
+        # (a few KB) are served from the in-process cache.
+        if "avatar_hash" not in st.session_state:
+            digest, avatar_bytes = db_handler.load_avatar(st.session_state.get("user_email", "unknown_user"))
+            if digest:
+                avatar.cache_avatar(digest, avatar_bytes)
+            st.session_state.avatar_hash = digest
+
+        avatar_img = avatar.DEFAULT_AVATAR_URL
+        if st.session_state.avatar_hash:
+            cached = avatar.get_cached_avatar(st.session_state.avatar_hash)
+            if cached is None:
+                # Evicted from the cache - fetch it again from the profile
+                digest, cached = db_handler.load_avatar(st.session_state.get("user_email", "unknown_user"))
+                if digest:
+                    avatar.cache_avatar(digest, cached)
+            avatar_img = cached or avatar.DEFAULT_AVATAR_URL
+
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.image(avatar_img, width=60)
+
+        with col2:
+            st.title("DreamJob")
+
+        # Upload Expander
+        with st.expander("Edit Profile Photo"):
+            uploaded_pic = st.file_uploader("Upload Image", type=['png', 'jpg', 'jpeg'], label_visibility="collapsed")
+            if uploaded_pic is not None:
+                raw = uploaded_pic.getvalue()
+                upload_hash = hashlib.sha256(raw).hexdigest()
+                # The uploader keeps its file across reruns, so only process a new upload once
+                if st.session_state.get("avatar_upload_hash") != upload_hash:
+                    st.session_state.avatar_upload_hash = upload_hash
+                    try:
+                        digest, avatar_bytes = avatar.make_avatar(raw)
+                    except avatar.AvatarError as e:
+                        st.error(str(e))
+                    else:
+                        db_handler.save_avatar(st.session_state.get("user_email", "unknown_user"), digest, avatar_bytes)
+                        st.session_state.avatar_hash = digest
+                        rerun_fragment()
+
 # Sidebar Navigation (Only visible if authenticated)
 with st.sidebar:
     # Logout Button (Top of Sidebar)
     if st.button("🔒 Logout", key="logout_btn", use_container_width=True):
-        st.session_state.authenticated = False
-        st.session_state.analysis_complete = False
-        st.rerun()
-        
-    # Profile Picture Logic
-    # Profile Picture Logic
-    if "profile_pic" not in st.session_state:
-        st.session_state.profile_pic = "https://cdn-icons-png.flaticon.com/512/3135/3135715.png"
-
-    col1, col2 = st.columns([1, 2])
-    with col1:
-         # Display current profile pic (as image or URL)
-        if isinstance(st.session_state.profile_pic, str):
-             st.image(st.session_state.profile_pic, width=60)
-        else:
-             st.image(st.session_state.profile_pic, width=60)
-    
-    with col2:
-        st.title("DreamJob")
-
-    # Upload Expander
-    with st.expander("Edit Profile Photo"):
-        uploaded_pic = st.file_uploader("Upload Image", type=['png', 'jpg', 'jpeg'], label_visibility="collapsed")
-        if uploaded_pic is not None:
-            image = Image.open(uploaded_pic)
-            st.session_state.profile_pic = image
+        # This rerun ends here, before the routed view
+        with tracing.view("logout"):
+            session_restore.forget()
+            st.session_state.authenticated = False
+            st.session_state.analysis_complete = False
+            for key in ("avatar_hash", "avatar_upload_hash", "analysis_result", "skill_matrix", "profile_pending",
+                        "latest_sk", "score_history", "stored_resumes"):
+                st.session_state.pop(key, None)
             st.rerun()
+        
+    profile_card()
 
     # helper for programmatic navigation
     # Only force index if manually set by redirection logic
     default_index = 0
     selected_from_state = None
+
+    options_list = ["Home", "Dashboard", "Progress Matrix", "Learning Resources", "Immigration & Visa", "Contact Us"]
+    icons_list = ["house", "speedometer2", "list-task", "book", "globe", "envelope"]
+    if is_operator(st.session_state.get("user_email")):
+        options_list.append("Operator")
+        icons_list.append("activity")
     
     if "manual_selection" in st.session_state and st.session_state.manual_selection:
         try:
              # Map string to index
-            options_list = ["Home", "Dashboard", "Progress Matrix", "Learning Resources", "Immigration & Visa", "Contact Us"]
             default_index = options_list.index(st.session_state.manual_selection)
             selected_from_state = st.session_state.manual_selection
             st.session_state.manual_selection = None # Reset immediately
@@ -86,8 +143,8 @@ with st.sidebar:
     # Ensure consistent navigation state
     selected = option_menu(
         menu_title=None,
-        options=["Home", "Dashboard", "Progress Matrix", "Learning Resources", "Immigration & Visa", "Contact Us"],
-        icons=["house", "speedometer2", "list-task", "book", "globe", "envelope"],
+        options=options_list,
+        icons=icons_list,
         menu_icon="cast",
         default_index=default_index, 
         # key="main_nav", # Avoid key conflict for now, rely on reruns
@@ -104,19 +161,54 @@ with st.sidebar:
         selected = selected_from_state
     
 # Routing
-if selected == "Home":
-    home.render()
-elif selected == "Dashboard":
-    if st.session_state.analysis_complete:
-        dashboard.render()
-    else:
-        st.warning("Please analyze your career path on the Home page first!")
+# Every view (and the profile hydration that may follow it) is timed; the
+# rerun ends when this block exits, also through st.rerun()/st.stop().
+VIEW_NAMES = {"Home": "home", "Dashboard": "dashboard", "Progress Matrix": "progress",
+              "Learning Resources": "resources", "Immigration & Visa": "immigration",
+              "Contact Us": "contact", "Operator": "operator"}
+with tracing.view(VIEW_NAMES.get(selected, "unknown")):
+    if selected == "Home":
         home.render()
-elif selected == "Progress Matrix":
-    progress.render()
-elif selected == "Learning Resources":
-    resources.render()
-elif selected == "Immigration & Visa":
-    immigration.render()
-elif selected == "Contact Us":
-    contact.render()
+    elif selected == "Dashboard":
+        if st.session_state.analysis_complete:
+            dashboard.render()
+        else:
+            st.warning("Please analyze your career path on the Home page first!")
+            home.render()
+    elif selected == "Progress Matrix":
+        progress.render()
+    elif selected == "Learning Resources":
+        resources.render()
+    elif selected == "Immigration & Visa":
+        immigration.render()
+    elif selected == "Contact Us":
+        contact.render()
+    elif selected == "Operator":
+        operator.render()
+
+    # Lazy profile hydration: login only verifies the password, the stored analysis
+    # and avatar are fetched in one read once the first page has been drawn.
+    if st.session_state.get("profile_pending"):
+        st.session_state.profile_pending = False
+        try:
+            profile_data, digest, avatar_bytes = db_handler.hydrate_user(
+                st.session_state.get("user_email", "unknown_user"),
+                latest_sk=st.session_state.get("latest_sk")
+            )
+        except (ClientError, BotoCoreError) as e:
+            # Partially loaded, not a user without a profile: try again on the next rerun
+            print(f"Failed to hydrate profile: {e}")
+            st.session_state.profile_pending = True
+            st.warning("Your saved analysis could not be loaded yet. It will be loaded on your next action.")
+        else:
+            if digest:
+                avatar.cache_avatar(digest, avatar_bytes)
+                st.session_state.avatar_hash = digest
+            if profile_data:
+                # The profile cache shares this dict with other sessions
+                st.session_state.analysis_result = copy.deepcopy(profile_data)
+                st.session_state.analysis_complete = True
+                st.session_state.manual_selection = "Dashboard"
+            st.rerun()
+
+    session_restore.checkpoint(selected)
@@ -0,0 +1,114 @@
+"""
+Throughput benchmark for the standalone analysis service (services/api.py).
+
+Starts uvicorn with --workers N on a free local port, drives POST /analyze
+from a pool of client threads for a fixed duration and reports requests/sec
+overall and per worker core.
+
+    python -m benchmarks.bench_analysis_service --workers 2 --duration 15
+    python -m benchmarks.bench_analysis_service --pdf resume.pdf   # multipart path incl. extraction
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+SAMPLE_TEXT = (
+    "Senior DevOps engineer with 6 years of experience. Linux, Docker, Kubernetes (EKS, Helm), "
+    "Terraform, Ansible, Jenkins and GitHub Actions pipelines. Python and Bash scripting, "
+    "AWS (EC2, S3, Lambda), Prometheus and Grafana monitoring. Git branching strategies. "
+) * 20
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("service did not start")
+
+
+def _drive(base_url, duration, pdf_bytes, counts, errors, stop_at):
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        n = failed = 0
+        while time.time() < stop_at:
+            if pdf_bytes:
+                r = client.post("/analyze", data={"job_title": "DevOps Engineer", "country": "USA"},
+                                files={"resume": ("resume.pdf", pdf_bytes, "application/pdf")})
+            else:
+                r = client.post("/analyze", json={"job_title": "DevOps Engineer", "country": "USA",
+                                                  "resume_text": SAMPLE_TEXT})
+            if r.status_code == 200:
+                n += 1
+            else:
+                failed += 1
+        counts.append(n)
+        errors.append(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=0, help="client threads (default 4 per worker)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--pdf", help="send this PDF as multipart instead of pre-extracted text")
+    args = parser.parse_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "services.api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=root,
+    )
+    try:
+        _wait_ready(base_url)
+        pdf_bytes = open(args.pdf, "rb").read() if args.pdf else None
+        concurrency = args.concurrency or 4 * args.workers
+
+        # Warm up every worker before measuring
+        warm_counts, warm_errors = [], []
+        _drive(base_url, args.warmup, pdf_bytes, warm_counts, warm_errors, time.time() + args.warmup)
+
+        counts, errors = [], []
+        stop_at = time.time() + args.duration
+        threads = [threading.Thread(target=_drive, args=(base_url, args.duration, pdf_bytes, counts, errors, stop_at))
+                   for _ in range(concurrency)]
+        started = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - started
+
+        total = sum(counts)
+        rps = total / elapsed
+        print(f"mode:          {'multipart PDF' if pdf_bytes else 'pre-extracted text'}")
+        print(f"workers:       {args.workers}  client threads: {concurrency}")
+        print(f"requests:      {total} ok, {sum(errors)} failed in {elapsed:.1f}s")
+        print(f"throughput:    {rps:.1f} req/s")
+        print(f"per core:      {rps / args.workers:.1f} req/s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
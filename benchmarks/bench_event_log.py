@@ -0,0 +1,95 @@
+"""
+Hot-path and storage benchmark for the analysis event log (services/event_log.py).
+
+Emits synthetic analysis events from several threads into a temporary log
+with small segments, then reports the emit() latency the analyzing thread
+pays, the compressed bytes per event, and how fast read() streams the
+segments back - all of them and a time range in the middle.
+
+    python -m benchmarks.bench_event_log --events 200000 --threads 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import streamlit as st
+
+from services import event_log
+from services.career_analyzer import get_job_skills_database, skill_ids
+
+
+def _events(n, seed):
+    rng = random.Random(seed)
+    db = get_job_skills_database()
+    ids = skill_ids()
+    roles = list(db)
+    for _ in range(n):
+        role = rng.choice(roles)
+        skills = [ids[s] for s in db[role]["critical"] + db[role]["nice_to_have"]]
+        cut = rng.randint(0, len(skills))
+        yield {"source": "app", "input": "%016x" % rng.getrandbits(64), "outcome": "ok",
+               "ms": {"extract": round(rng.uniform(50, 900), 2), "analyze": round(rng.uniform(1, 9), 2),
+                      "total": 0.0},
+               "role": role, "country": rng.choice(["USA", "Germany", "India", "UK"]),
+               "job_title": role, "score": rng.randint(18, 98),
+               "matched": skills[:cut], "missing": skills[cut:], "taxonomy": "bench"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        st.secrets._secrets = {"event_log": {"dir": tmp, "segment_bytes": 256 * 1024,
+                                             "max_pending": args.events}}
+        per_thread = args.events // args.threads
+        latencies = [[] for _ in range(args.threads)]
+
+        def producer(n):
+            out = latencies[n]
+            for fields in _events(per_thread, n):
+                started = time.perf_counter()
+                event_log.emit("analysis", fields)
+                out.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=producer, args=(n,)) for n in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        emitted = time.perf_counter() - started
+        event_log.close()
+        written = time.perf_counter() - started
+
+        samples = sorted(s for thread in latencies for s in thread)
+        pct = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+        segments = event_log.segments(tmp)
+        size = sum(os.path.getsize(s[3]) for s in segments)
+        print(f"emit p50 {pct(0.5):.1f} us, p99 {pct(0.99):.1f} us, max {samples[-1] * 1e6:.0f} us "
+              f"({len(samples) / emitted:,.0f} events/s emitted, all written after {written:.2f} s)")
+        print(f"{len(segments)} segments, {size / len(samples):.1f} bytes/event compressed")
+
+        started = time.perf_counter()
+        records = list(event_log.read(directory=tmp))
+        seconds = time.perf_counter() - started
+        print(f"read all: {len(records):,} events in {seconds:.2f} s ({len(records) / seconds:,.0f} events/s)")
+        if len(records) != len(samples) or any(a["ts"] > b["ts"] for a, b in zip(records, records[1:])):
+            raise SystemExit("events lost or out of order")
+
+        lo, hi = records[len(records) // 3]["ts"], records[2 * len(records) // 3]["ts"]
+        started = time.perf_counter()
+        window = list(event_log.read(lo, hi, directory=tmp))
+        expected = sum(1 for r in records if lo <= r["ts"] < hi)
+        print(f"read middle third: {len(window):,} events in {time.perf_counter() - started:.2f} s")
+        if len(window) != expected:
+            raise SystemExit(f"time range returned {len(window)} events, expected {expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-interaction cost of a full script rerun vs. a fragment-only rerun.
+
+Before st.fragment, checking a box in the progress matrix or uploading a
+photo re-executed app.py end to end (sidebar, option menu, routing, view).
+Now only the fragment function runs. This drives both with Streamlit's
+AppTest harness and reports wall time and process CPU per interaction.
+
+    python -m benchmarks.bench_fragments --runs 50
+"""
+import argparse
+import os
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ANALYSIS = {
+    "match_score": 60, "missing_skills": [{"skill": "Kubernetes", "severity": "High"}],
+    "all_required_skills": [
+        {"Skill": f"Skill {i}", "Category": "Technical", "Priority": "High",
+         "Status": "Completed" if i % 2 else "To Do"} for i in range(16)
+    ],
+}
+
+
+def _progress_fragment():
+    # What a fragment-only rerun executes; the warm-up run builds the matrix
+    import streamlit as st
+    from views import progress
+    if "skill_matrix" in st.session_state:
+        progress.skill_matrix()
+    else:
+        progress.render()
+
+
+def _prepare(at):
+    at.session_state["authenticated"] = True
+    at.session_state["user_email"] = "bench@example.com"
+    at.session_state["avatar_hash"] = None
+    at.session_state["analysis_complete"] = True
+    at.session_state["analysis_result"] = ANALYSIS
+    return at
+
+
+def _measure(at, runs, before_run=lambda at: None):
+    before_run(at)
+    at.run()  # warm up: imports, session init, skill_matrix built
+    wall, cpu = [], []
+    for _ in range(runs):
+        before_run(at)
+        w, c = time.perf_counter(), time.process_time()
+        at.run()
+        wall.append(time.perf_counter() - w)
+        cpu.append(time.process_time() - c)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    wall.sort()
+    return wall[len(wall) // 2] * 1000, sum(cpu) / len(cpu) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+
+    # The option menu only keeps a selection in a browser; route through
+    # manual_selection before every run instead
+    def select_progress(at):
+        at.session_state["manual_selection"] = "Progress Matrix"
+
+    full = _prepare(AppTest.from_file("app.py", default_timeout=60))
+    full_wall, full_cpu = _measure(full, args.runs, select_progress)
+
+    fragment = _prepare(AppTest.from_function(_progress_fragment, default_timeout=60))
+    frag_wall, frag_cpu = _measure(fragment, args.runs)
+
+    print(f"full rerun (Progress Matrix):  p50 {full_wall:6.1f} ms wall, {full_cpu:6.1f} ms CPU")
+    print(f"fragment rerun (skill matrix): p50 {frag_wall:6.1f} ms wall, {frag_cpu:6.1f} ms CPU")
+    print(f"saved per interaction:         {full_wall - frag_wall:6.1f} ms wall, {full_cpu - frag_cpu:6.1f} ms CPU")
+
+
+if __name__ == "__main__":
+    main()
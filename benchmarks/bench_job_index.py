@@ -0,0 +1,72 @@
+"""
+Build and query benchmark for the offline job-postings index (services/job_index.py).
+
+Generates a synthetic JSONL dump, builds the index in two incremental
+batches and reports build throughput and query latency percentiles.
+
+    python -m benchmarks.bench_job_index --rows 1000000 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from services import job_index
+
+COUNTRIES = ["USA", "Canada", "Germany", "UK", "Australia", "UAE", "India"]
+FILLER = ("We are looking for a motivated colleague to join our growing team. "
+          "You will work closely with product and design on customer-facing features. ")
+
+
+def _write_dump(path, rows, seed):
+    rng = random.Random(seed)
+    vocab = job_index.skill_vocabulary()
+    with open(path, "w") as f:
+        for i in range(rows):
+            skills = rng.sample(vocab, rng.randint(3, 10))
+            f.write(json.dumps({
+                "id": f"{seed}-{i}",
+                "title": rng.choice(["DevOps Engineer", "Software Engineer", "Data Scientist", "Product Manager"]),
+                "company": f"Company {rng.randint(1, 5000)}",
+                "country": rng.choice(COUNTRIES),
+                "description": FILLER + "Experience with " + ", ".join(skills) + ".",
+                "posted_at": f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}",
+            }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = os.path.join(tmp, "a.jsonl"), os.path.join(tmp, "b.jsonl")
+        _write_dump(first, args.rows // 2, 1)
+        _write_dump(second, args.rows - args.rows // 2, 2)
+        index_dir = os.path.join(tmp, "index")
+
+        for batch in ([first], [first, second]):
+            summary = job_index.build(index_dir, batch)
+            rate = summary["docs"] / summary["seconds"] if summary["seconds"] else 0
+            print(f"build {summary}: {rate:,.0f} postings/s")
+
+        index = job_index.JobIndex(index_dir)
+        vocab = job_index.skill_vocabulary()
+        rng = random.Random(3)
+        latencies = []
+        for _ in range(args.queries):
+            skills = rng.sample(vocab, 12)
+            started = time.perf_counter()
+            index.search(skills[:8], skills[8:], rng.choice(COUNTRIES), k=10)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+        print(f"{index.total_docs:,} postings in {len(index.segments)} segments; "
+              f"query p50 {pct(0.5):.1f} ms, p90 {pct(0.9):.1f} ms, p99 {pct(0.99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
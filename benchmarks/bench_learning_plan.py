@@ -0,0 +1,115 @@
+"""
+Latency and quality benchmark for the learning planner (services/learning_plan.py).
+
+Generates a synthetic catalogue (JSONL) where every resource covers 1-4 skills
+from a large vocabulary, then plans random missing-skill sets of 4-16 skills
+without a cache and with one, and reports latency percentiles. It also
+compares plan weights with brute force on small instances: exact plans must
+be optimal and greedy plans stay within the H(k) bound.
+
+    python -m benchmarks.bench_learning_plan --items 50000 --plans 300
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+
+import streamlit as st
+
+from services import learning_plan
+
+
+def _write_catalog(path, items, skills, seed):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(items):
+            free = rng.random() < 0.4
+            f.write(json.dumps({
+                "title": f"Resource {i}", "link": "#", "type": "Course",
+                "cost_usd": 0 if free else rng.choice([10, 20, 49, 99, 150, 300]),
+                "hours": rng.randint(1, 60),
+                "skills": rng.sample(skills, rng.choice([1, 1, 2, 2, 3, 4])),
+            }) + "\n")
+
+
+def _weight(items, hour_value):
+    return sum(float(i["cost_usd"]) + float(i["hours"]) * hour_value + learning_plan.ITEM_WEIGHT for i in items)
+
+
+def _brute_force(catalog, missing, hour_value):
+    """Minimum weight over every cover of the coverable skills (small instances only)."""
+    wanted = {learning_plan.normalize_skill(s) for s in missing}
+    candidates = sorted({i for s in wanted for i in catalog.by_skill.get(s, ())})
+    coverable = {learning_plan.normalize_skill(s) for i in candidates for s in catalog.items[i]["skills"]} & wanted
+    best = None
+    for size in range(1, len(coverable) + 1):
+        for combo in itertools.combinations(candidates, size):
+            items = [catalog.items[i] for i in combo]
+            if coverable <= {learning_plan.normalize_skill(s) for it in items for s in it["skills"]}:
+                w = _weight(items, hour_value)
+                best = w if best is None else min(best, w)
+    return best
+
+
+def _pct(latencies, q):
+    return sorted(latencies)[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--skills", type=int, default=2_000, help="size of the skill vocabulary")
+    parser.add_argument("--plans", type=int, default=300)
+    args = parser.parse_args()
+
+    skills = [f"skill-{n}" for n in range(args.skills)]
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.jsonl")
+        _write_catalog(path, args.items, skills, 1)
+        st.secrets._secrets = {"learning_plan": {"catalog": path}}
+        hour_value = float(learning_plan.get_policy()["hour_value"])
+        started = time.perf_counter()
+        catalog = learning_plan.get_catalog()
+        print(f"loaded {len(catalog.items):,} resources in {time.perf_counter() - started:.2f} s")
+
+        sets = [rng.sample(skills, rng.randint(4, 16)) for _ in range(args.plans)]
+        for label in ("cold", "cached"):
+            latencies, methods = [], {}
+            for missing in sets:
+                budget = rng.choice([None, 0, 100, 500])
+                started = time.perf_counter()
+                result = learning_plan.plan(missing, budget if label == "cold" else None)
+                latencies.append(time.perf_counter() - started)
+                methods[result["method"]] = methods.get(result["method"], 0) + 1
+            if label == "cold":
+                for missing in sets:  # warm the cache for the second round
+                    learning_plan.plan(missing)
+            print(f"{label}: p50 {_pct(latencies, 0.5):.2f} ms, p99 {_pct(latencies, 0.99):.2f} ms, "
+                  f"max {max(latencies) * 1000:.2f} ms; {methods}")
+
+        # Plan quality against brute force on small catalogues of the same shape
+        small_path = os.path.join(tmp, "small.jsonl")
+        small_skills = skills[:12]
+        _write_catalog(small_path, 40, small_skills, 2)
+        st.secrets._secrets = {"learning_plan": {"catalog": small_path}}
+        small = learning_plan.get_catalog()
+        worst = {"exact": 1.0, "greedy": 1.0}
+        for _ in range(30):
+            missing = rng.sample(small_skills, rng.randint(3, 6))
+            optimum = _brute_force(small, missing, hour_value)
+            for method, limit in (("exact", 10), ("greedy", 0)):
+                st.secrets._secrets["learning_plan"]["exact_max_skills"] = limit
+                result = learning_plan.plan(missing)
+                assert result["method"] == method
+                worst[method] = max(worst[method], _weight(result["items"], hour_value) / optimum)
+        print(f"weight / optimum, worst of 30: exact {worst['exact']:.3f}, greedy {worst['greedy']:.3f}")
+        if worst["exact"] > 1 + 1e-9:
+            raise SystemExit("exact plans are not optimal")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Ingestion and lookup benchmark for the market demand counters (services/market_demand.py).
+
+Generates a synthetic postings feed as several daily-ish JSONL files, ingests
+them in two incremental runs (the second only reads the new files) and
+reports ingestion throughput and lookup latency.
+
+    python -m benchmarks.bench_market_demand --rows 5000000 --files 10
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+from services import market_demand
+
+TITLES = ["DevOps Engineer", "Senior DevOps Engineer", "Software Engineer", "Backend Developer",
+          "Data Scientist", "Machine Learning Engineer", "Product Manager", "Office Assistant"]
+COUNTRIES = ["USA", "United States", "Canada", "Germany", "UK", "Australia", "UAE", "India"]
+
+
+def _write_feed(path, rows, start, days, seed):
+    rng = random.Random(seed)
+    dates = [(start + datetime.timedelta(days=d)).isoformat() for d in range(days)]
+    with open(path, "w") as f:
+        for i in range(rows):
+            f.write(json.dumps({"id": f"{seed}-{i}", "title": rng.choice(TITLES), "company": "Company",
+                                "country": rng.choice(COUNTRIES), "posted_at": rng.choice(dates)}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    start = datetime.date.today() - datetime.timedelta(days=180)
+    span = 180 // args.files
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.files):
+            path = os.path.join(tmp, f"postings-{n:03d}.jsonl")
+            _write_feed(path, args.rows // args.files, start + datetime.timedelta(days=n * span), span, n)
+            paths.append(path)
+        index_dir = os.path.join(tmp, "demand")
+
+        half = args.files // 2
+        for batch in (paths[:half], paths):
+            summary = market_demand.build(index_dir, batch)
+            rate = summary["rows"] / summary["seconds"] if summary["seconds"] else 0
+            print(f"ingest {summary}: {rate:,.0f} postings/s")
+
+        index = market_demand.DemandIndex(index_dir)
+        roles = index.manifest["roles"]
+        rng = random.Random(3)
+        latencies = []
+        for _ in range(args.lookups):
+            started = time.perf_counter()
+            index.demand(rng.choice(roles), rng.choice(COUNTRIES))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e6
+        print(f"lookup p50 {pct(0.5):.0f} us, p99 {pct(0.99):.0f} us")
+        print("DevOps Engineer / Germany:", index.demand("DevOps Engineer", "Germany"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Hit rate and time saved by near-duplicate reuse (services/near_duplicates.py).
+
+Builds a bulk-run corpus of PDF resumes the way they arrive in practice:
+distinct CVs, plus re-uploads of the same file and copies with trivial edits
+(a changed date or phone number, a fixed typo, one more or one less bullet).
+The corpus goes through services.batch_analyze with and without reuse. The
+report has the hit rate, the measured and estimated time saved, how often an
+adjusted result differs from analyzing the document from scratch, and the
+SimHash distances of edited copies against unrelated CVs.
+
+    python -m benchmarks.bench_near_duplicates --resumes 150 --copies 2
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+
+from services import batch_analyze, career_analyzer, near_duplicates
+
+ROLES = {"DevOps Engineer": "Germany", "Software Engineer": "USA", "Data Scientist": "India"}
+TOOLS = ["Python", "Docker", "Kubernetes", "EKS", "Helm", "Terraform", "Jenkins", "Git", "AWS", "Linux", "Bash",
+         "Java", "Spring Boot", "React", "Node.js", "PostgreSQL", "MongoDB", "GraphQL", "Pandas", "NumPy",
+         "scikit-learn", "PyTorch", "Tableau", "Spark", "SQL", "Prometheus", "Grafana", "Ansible", "Go"]
+VERBS = ["Built", "Designed", "Migrated", "Automated", "Maintained", "Led", "Optimized", "Introduced", "Scaled"]
+OBJECTS = ["the payments platform", "an internal analytics pipeline", "CI pipelines for 40 services",
+           "the customer onboarding flow", "a recommendation service", "monitoring and alerting",
+           "the data warehouse", "release tooling", "a multi-region deployment", "the search backend"]
+OUTCOMES = ["cutting costs by {n}%", "reducing latency by {n}%", "for {n} engineers", "serving {n}k users daily",
+            "with {n}% fewer incidents", "saving {n} hours a week"]
+
+
+def _resume(rng):
+    lines = [f"Candidate {rng.randint(1000, 9999)}", f"Phone +49 {rng.randint(100000, 999999)}", "", "Experience"]
+    for year in range(2024, 2024 - rng.randint(3, 6), -1):
+        lines.append(f"Company {rng.randint(1, 500)}, {year - 1} - {year}")
+        for _ in range(rng.randint(3, 6)):
+            lines.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} with {rng.choice(TOOLS)} and "
+                         f"{rng.choice(TOOLS)}, {rng.choice(OUTCOMES).format(n=rng.randint(5, 60))}.")
+    lines += ["", "Skills", ", ".join(rng.sample(TOOLS, rng.randint(5, 12))), "", "Education",
+              f"BSc Computer Science, University {rng.randint(1, 90)}, {rng.randint(2005, 2018)}"]
+    return lines
+
+
+def _edit(lines, rng):
+    """A trivial edit: a date, the phone number, a typo, or one bullet added or removed."""
+    lines = list(lines)
+    kind = rng.choice(["date", "phone", "typo", "add", "remove"])
+    bullets = [i for i, line in enumerate(lines) if line.startswith("- ")]
+    if kind == "date":
+        lines[-1] = lines[-1][:-4] + str(int(lines[-1][-4:]) + 1)
+    elif kind == "phone":
+        lines[1] = f"Phone +49 {rng.randint(100000, 999999)}"
+    elif kind == "typo":
+        i = rng.choice(bullets)
+        lines[i] = lines[i].replace("the ", "teh ", 1) if "the " in lines[i] else lines[i] + " "
+    elif kind == "add":
+        lines.insert(rng.choice(bullets) + 1, f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)}.")
+    else:
+        del lines[rng.choice(bullets)]
+    return lines
+
+
+def _pdf(lines):
+    """A minimal text PDF (Helvetica, 50 lines a page) that pypdf extracts line by line."""
+    pages = [lines[i:i + 50] for i in range(0, len(lines), 50)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        text = "".join(f"({line.replace(chr(92), '').replace('(', '[').replace(')', ']')}) Tj T* " for line in page)
+        stream = f"BT /F1 10 Tf 14 TL 50 800 Td {text}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{n} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{o:010d} 00000 n \n" for o in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=150, help="distinct CVs")
+    parser.add_argument("--copies", type=int, default=2, help="average extra copies per CV (re-uploads and edits)")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        documents, originals = [], []
+        for n in range(args.resumes):
+            role = rng.choice(list(ROLES))
+            lines = _resume(rng)
+            originals.append(lines)
+            path = os.path.join(tmp, f"cv-{n:04d}.pdf")
+            with open(path, "wb") as f:
+                f.write(_pdf(lines))
+            documents.append((path, role, ROLES[role], path, None))
+            for c in range(rng.randint(0, 2 * args.copies)):
+                if rng.random() < 0.35:
+                    documents.append((f"{path}#reupload{c}", role, ROLES[role], path, None))
+                    continue
+                copy_path = os.path.join(tmp, f"cv-{n:04d}-edit{c}.pdf")
+                with open(copy_path, "wb") as f:
+                    f.write(_pdf(_edit(lines, rng)))
+                documents.append((copy_path, role, ROLES[role], copy_path, None))
+        rng.shuffle(documents)
+        budget = {"isolation": "inline"} if os.environ.get("BENCH_INLINE") else None
+
+        runs = {}
+        for label, dedup in (("from scratch", False), ("with reuse", True)):
+            with open(os.path.join(tmp, f"{label}.jsonl"), "w") as out:
+                runs[label] = batch_analyze.run(iter(documents), out, dedup=dedup, budget=budget)
+            print(f"{label}: {json.dumps(runs[label])}")
+
+        plain, reused = runs["from scratch"], runs["with reuse"]
+        saved = plain["seconds"] - reused["seconds"]
+        print(f"\n{len(documents)} documents from {args.resumes} CVs; hit rate {reused['hit_rate']:.1%} "
+              f"({reused['exact']} exact, {reused['adjusted']} adjusted, {reused['files']} extractions skipped)")
+        print(f"time saved: {saved:.2f} s measured ({saved / plain['seconds']:.0%}), "
+              f"{reused['saved_seconds_estimate']:.2f} s estimated by the batch summary")
+
+        # Adjusted results against analyzing the same document from scratch
+        def rows(label):
+            with open(os.path.join(tmp, f"{label}.jsonl")) as f:
+                return [json.loads(line) for line in f]
+        differ = sum(1 for a, b in zip(rows("from scratch"), rows("with reuse"))
+                     if b.get("duplicate") and (a["score"], a["missing"]) != (b["score"], b["missing"]))
+        print(f"reused results that differ from a fresh analysis: {differ}")
+
+        # SimHash distances: trivial edits against unrelated CVs
+        def distance(a, b):
+            clean = lambda lines: career_analyzer.clean_resume_text("\n".join(lines))
+            return near_duplicates.hamming(near_duplicates.simhash(clean(a)), near_duplicates.simhash(clean(b)))
+        edits = sorted(distance(o, _edit(o, rng)) for o in originals)
+        unrelated = sorted(distance(a, b) for a, b in zip(originals, originals[1:]))
+        pct = lambda xs, q: xs[min(len(xs) - 1, int(q * len(xs)))]
+        print(f"simhash bits, trivial edit: p50 {pct(edits, 0.5)}, p90 {pct(edits, 0.9)}, max {edits[-1]}; "
+              f"unrelated CVs: min {unrelated[0]}, p50 {pct(unrelated, 0.5)}")
+        if differ:
+            raise SystemExit("reused results must match a fresh analysis")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Region routing against local stand-ins.
+
+Point [aws] regions and [aws.endpoints] in .streamlit/secrets.toml at a few
+local DynamoDB stand-ins (DynamoDB Local or moto servers, one per region),
+then run this. It bootstraps the tables in every region, adds an artificial
+round-trip delay per region to play the WAN, creates users (each written to
+its home region), optionally copies the items to every other region to play
+global-table replication, and then logs everyone in and loads their
+profiles. Reports how users spread over home regions and the per-region
+latency, fallbacks and replica misses seen by the router.
+
+    python -m benchmarks.bench_regions --users 200 --delay eu-central-1=90 --delay ap-south-1=140
+    python -m benchmarks.bench_regions --users 200 --delay eu-central-1=90 --replicate
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_delays(specs):
+    delays = {}
+    for spec in specs or []:
+        region, ms = spec.split("=")
+        delays[region] = float(ms) / 1000
+    return delays
+
+
+def _add_delay(client, seconds):
+    def sleep(**kwargs):
+        time.sleep(seconds)
+    client.meta.events.register("before-send.dynamodb", sleep)
+
+
+def _replicate(db_handler, region_router):
+    """Copies every item from each region to the others, like a global table would."""
+    names = list(db_handler.table_specs())
+    regions = region_router.regions()
+    for source in regions:
+        for name in names:
+            items = db_handler.new_db_resource(region=source).Table(name).scan().get("Items", [])
+            for target in regions:
+                if target == source:
+                    continue
+                with db_handler.new_db_resource(region=target).Table(name).batch_writer() as batch:
+                    for item in items:
+                        batch.put_item(Item=item)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--delay", action="append", help="REGION=MS added to every request to that region")
+    parser.add_argument("--replicate", action="store_true", help="copy items to every region after the writes")
+    args = parser.parse_args()
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+
+    from services import db_handler, profile_cache, region_router
+    from utils import metrics
+
+    regions = region_router.regions()
+    print(f"regions: {', '.join(regions)} (local {region_router.local_region()}, "
+          f"replicated={region_router.replicated()})")
+    for region in regions:
+        db_handler.bootstrap_tables("PAY_PER_REQUEST", region=region)
+    delays = _parse_delays(args.delay)
+    for region in regions:
+        if delays.get(region):
+            _add_delay(db_handler.get_db_client(region).meta.client, delays[region])
+
+    users = [f"bench-{i}@example.com" for i in range(args.users)]
+    homes = collections.Counter(region_router.home_region(u) for u in users)
+    started = time.perf_counter()
+    for user in users:
+        db_handler.create_user(user, "pw")
+        db_handler.save_profile(user, {"match_score": 50, "job_title": "DevOps Engineer"})
+    write_seconds = time.perf_counter() - started
+    if args.replicate:
+        _replicate(db_handler, region_router)
+
+    metrics.reset()
+    started = time.perf_counter()
+    for user in users:
+        profile_cache._entries.clear()  # measure the storage path, not the cache
+        ok, info = db_handler.verify_user(user, "pw")
+        db_handler.hydrate_user(user, latest_sk=info["latest_sk"] if ok else None)
+    read_seconds = time.perf_counter() - started
+
+    print("home regions: " + ", ".join(f"{r} {homes[r]}" for r in regions))
+    print(f"writes: {write_seconds / len(users) * 1000:.1f} ms per user (create + save)")
+    print(f"reads:  {read_seconds / len(users) * 1000:.1f} ms per login (verify + hydrate)")
+    print(f"{'region':<16} {'requests':>9} {'p50 ms':>8} {'p90 ms':>8} {'fallbacks':>10} {'replica misses':>15}")
+    for row in region_router.region_table(metrics.snapshot()):
+        print(f"{row['region']:<16} {row['requests']:>9} {row['p50_ms'] or 0:>8} {row['p90_ms'] or 0:>8} "
+              f"{row['fallbacks']:>10} {row['replica_misses']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Build and query benchmark for the salary percentile index (services/salary_index.py).
+
+Generates a synthetic compensation dataset (half Parquet, half CSV, salaries
+in local currencies), builds the index and reports build throughput and
+query latency percentiles.
+
+    python -m benchmarks.bench_salary_index --rows 5000000 --queries 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from services import salary_index
+
+TITLES = ["DevOps Engineer", "Senior DevOps Engineer", "Software Engineer", "Junior Software Developer",
+          "Lead Software Engineer", "Data Scientist", "Senior Data Scientist", "Product Manager",
+          "Site Reliability Engineer", "QA Analyst"]
+COUNTRIES = ["United States", "USA", "Canada", "Germany", "UK", "Australia", "UAE", "India"]
+
+
+def _dataset(rows, seed):
+    rng = np.random.default_rng(seed)
+    fx = salary_index.load_fx()["rates"]
+    country = rng.choice(COUNTRIES, rows)
+    currency = pd.Series(country).map(lambda c: salary_index.COUNTRY_CURRENCY[salary_index.normalize_country(c)])
+    usd = rng.lognormal(np.log(80_000), 0.45, rows)
+    return pd.DataFrame({
+        "job_title": rng.choice(TITLES, rows),
+        "country": country,
+        "salary": np.round(usd * currency.map(fx).to_numpy(), -2),
+        "currency": currency,
+        "years_experience": np.where(rng.random(rows) < 0.5, rng.integers(0, 20, rows), np.nan),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet, csv = os.path.join(tmp, "a.parquet"), os.path.join(tmp, "b.csv")
+        _dataset(args.rows // 2, 1).to_parquet(parquet, index=False)
+        _dataset(args.rows - args.rows // 2, 2).to_csv(csv, index=False)
+        index_dir = os.path.join(tmp, "index")
+
+        summary = salary_index.build(index_dir, [parquet, csv])
+        rate = summary["rows"] / summary["seconds"] if summary["seconds"] else 0
+        print(f"build {summary}: {rate:,.0f} rows/s")
+
+        index = salary_index.SalaryIndex(index_dir)
+        roles = index.manifest["roles"]
+        rng = random.Random(3)
+        latencies = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            index.band(rng.choice(roles), rng.choice(COUNTRIES), rng.choice(salary_index.SENIORITIES))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e6
+        print(f"{summary['cells']:,} cells; query p50 {pct(0.5):.0f} us, p90 {pct(0.9):.0f} us, p99 {pct(0.99):.0f} us")
+        print("DevOps Engineer / India:", index.band("DevOps Engineer", "India"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Render-payload check for the heavy views.
+
+Renders the dashboard and the learning resources through Streamlit's AppTest
+harness with a large analysis (many missing skills and roadmap stages), once
+with [ui] compact on and once with it off, and reports the ForwardMsg bytes
+and element count of each rerun. Exits non-zero when a compact rerun is over
+its budget in utils/payload.PAYLOAD_BUDGETS, so it can gate CI.
+
+    python -m benchmarks.check_payload
+"""
+import argparse
+import os
+import sys
+
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SKILLS = ["Kubernetes", "Docker", "AWS", "Python", "CI/CD", "System Design", "Terraform", "Go",
+          "Prometheus", "Ansible", "Linux", "Networking", "Helm", "Kafka", "Redis", "GraphQL"]
+
+ANALYSIS = {
+    "match_score": 42, "market_demand_score": 88, "salary_range": [90000, 140000], "target_country": "USA",
+    "hiring_companies": [{"Company": f"Company {i}", "Openings": 10 + i} for i in range(8)],
+    "missing_skills": [{"skill": s, "severity": ("High", "Medium", "Low")[i % 3]} for i, s in enumerate(SKILLS)],
+    "roadmap": [
+        {"Stage": f"Stage {i}", "Date": f"Month {i * 2}", "Status": "Pending",
+         "Topics": SKILLS[i * 2:i * 2 + 3], "Action": f"Ship a project using {SKILLS[i]}."}
+        for i in range(6)
+    ],
+}
+
+VIEWS = {"dashboard": "Dashboard", "resources": "Learning Resources"}
+
+
+def measure(view, compact):
+    # Imported after the chdir/sys.path setup so the app's own modules resolve
+    from utils import metrics
+
+    at = AppTest.from_file("app.py", default_timeout=60)
+    at.secrets["ui"] = {"compact": compact}
+    at.session_state["authenticated"] = True
+    at.session_state["user_email"] = "bench@example.com"
+    at.session_state["avatar_hash"] = None
+    at.session_state["analysis_complete"] = True
+    at.session_state["analysis_result"] = ANALYSIS
+    at.session_state["score_history"] = []
+    at.session_state["manual_selection"] = VIEWS[view]
+    metrics.reset()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    timings = metrics.snapshot()["timings"]
+    return int(timings[f"payload.bytes.{view}"]["max"]), int(timings[f"payload.elements.{view}"]["max"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+    from utils.payload import PAYLOAD_BUDGETS, over_budget
+
+    failed = []
+    print(f"{'view':<10} {'full bytes':>11} {'elements':>9} {'compact bytes':>14} {'elements':>9} {'budget':>16}")
+    for view in VIEWS:
+        full_bytes, full_elements = measure(view, compact=False)
+        compact_bytes, compact_elements = measure(view, compact=True)
+        budget_bytes, budget_elements = PAYLOAD_BUDGETS[view]
+        print(f"{view:<10} {full_bytes:>11,} {full_elements:>9} {compact_bytes:>14,} {compact_elements:>9} "
+              f"{budget_bytes:>10,} / {budget_elements:<3}")
+        if over_budget(view, compact_bytes, compact_elements):
+            failed.append(view)
+
+    if failed:
+        print(f"over budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("all views within budget")
+
+
+if __name__ == "__main__":
+    main()
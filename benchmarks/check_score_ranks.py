@@ -0,0 +1,111 @@
+"""
+Correctness check for the match score histograms (services/score_ranks.py).
+
+Simulates users saving analyses from several regions: every save moves the
+user between bins of their region's item, as save_profile's ADD updates do,
+and some accounts are deleted. Halfway through, a rebuild of a replicated
+table (score_ranks.replacement) moves every user to one region's item and
+removes the others, so later saves from the other regions re-create items
+with negative bins. Then checks that:
+  - merging the per-region items read back with from_item (in any order)
+    gives exactly the histogram of the users' latest scores, and
+  - every rank is within the documented bound of the exact mid-rank
+    computed by sorting the raw scores (zero: integer scores are exact).
+Also reports the time per rank. Exits non-zero on any violation, so it can
+gate CI.
+
+    python -m benchmarks.check_score_ranks --users 50000 --saves 200000
+"""
+import argparse
+import bisect
+import random
+import sys
+import time
+
+from services import score_ranks
+
+REGIONS = ["us-east-1", "eu-west-1", "ap-south-1"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--saves", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    latest = {}  # user -> summary
+    items = {}  # (pk, sk) -> stats item, one table replicated to every region
+    group = {"target_role_detected": "DevOps Engineer", "target_country": "India"}
+
+    def apply(region, old, new):
+        for pk, bins in score_ranks.deltas(old, new).items():
+            item = items.setdefault((pk, region), {})
+            for b, d in bins.items():
+                item[f"s{b}"] = item.get(f"s{b}", 0) + d
+            item["n"] = item.get("n", 0) + sum(bins.values())
+
+    def rebuild(target):
+        histograms = {}
+        for summary in latest.values():
+            pk, b = score_ranks._group(summary)
+            histograms.setdefault(pk, [0] * score_ranks.BINS)[b] += 1
+        stale, puts = score_ranks.replacement(histograms, list(items), target, replicated=True)
+        for key in stale:
+            del items[key]
+        for item in puts:
+            items[item.pop("pk"), item.pop("sk")] = item
+
+    for n in range(args.saves):
+        if n == args.saves // 2:
+            rebuild(REGIONS[0])
+        user = rng.randrange(args.users)
+        region = REGIONS[user % len(REGIONS)]  # the user's home region writes
+        if rng.random() < 0.01:
+            apply(region, latest.pop(user, None), None)  # account deleted
+            continue
+        new = dict(group, match_score=min(max(int(rng.gauss(60, 15)), 18), 98))
+        apply(region, latest.get(user), new)
+        latest[user] = new
+
+    pk = score_ranks.stats_key(group["target_role_detected"], group["target_country"])
+    parts = [score_ranks.from_item(items.get((pk, r), {})) for r in REGIONS]
+    negative = sum(1 for part in parts for count in part if count < 0)
+    merged = score_ranks.combine(parts)
+    failures = 0
+    if merged != score_ranks.combine(reversed(parts)) or \
+            merged != score_ranks.combine([score_ranks.merge(parts[:1]), score_ranks.merge(parts[1:])]):
+        print("merge depends on order or grouping")
+        failures += 1
+    exact = [0] * score_ranks.BINS
+    for summary in latest.values():
+        exact[summary["match_score"]] += 1
+    if merged != exact:
+        print("merged histogram differs from the users' latest scores")
+        failures += 1
+
+    scores = sorted(s["match_score"] for s in latest.values())
+    worst = 0.0
+    for score in range(score_ranks.BINS):
+        below = bisect.bisect_left(scores, score)
+        equal = bisect.bisect_right(scores, score) - below
+        expected = 100.0 * (below + equal / 2) / len(scores)
+        worst = max(worst, abs(score_ranks.percentile(merged, score) - expected))
+    if worst > 1e-9:
+        print(f"rank error {worst:.6f} percentage points, expected 0")
+        failures += 1
+
+    started = time.perf_counter()
+    for _ in range(10_000):
+        score_ranks.top_percent(merged, rng.randrange(score_ranks.BINS))
+    per_rank = (time.perf_counter() - started) / 10_000
+
+    print(f"{len(latest):,} users, {args.saves:,} saves over {len(REGIONS)} regions, rebuilt halfway "
+          f"({negative} negative bins after it); "
+          f"max rank error {worst:.2g} pp; {per_rank * 1e6:.1f} us per rank")
+    print("ok" if not failures else f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
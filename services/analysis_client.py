@@ -0,0 +1,88 @@
+import threading
+import time
+
+import httpx
+
+from services import event_log, near_duplicates
+from services.career_analyzer import analyze_text
+from utils import metrics, tracing
+from utils.config import get_section
+
+# Calls the standalone analysis service (services/api.py) when
+# [analysis_service] url is configured, otherwise - or when the service is
+# unreachable - runs the analyzer in-process. Every analysis goes to the event
+# log of the process that ran it, so remote ones are logged by the service.
+# Uploads that repeat or nearly repeat a recent one reuse its analysis (see
+# services/near_duplicates.py).
+
+_client_lock = threading.Lock()
+_client = None
+
+
+def _get_client(cfg):
+    # One pooled client per process: keep-alive connections are reused across reruns and sessions
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                base_url=cfg["url"].rstrip("/"),
+                timeout=httpx.Timeout(float(cfg.get("timeout", 30)), connect=2.0),
+                limits=httpx.Limits(max_connections=int(cfg.get("max_connections", 20)),
+                                    max_keepalive_connections=int(cfg.get("max_keepalive", 10))),
+            )
+        return _client
+
+
+def _analyze_remote(cfg, job_title, resume_file, country, keep_text):
+    headers = {}
+    if cfg.get("token"):
+        headers["Authorization"] = f"Bearer {cfg['token']}"
+    resume_file.seek(0)
+    response = _get_client(cfg).post(
+        "/analyze",
+        data={"job_title": job_title, "country": country, "keep_text": "1" if keep_text else "0"},
+        files={"resume": ("resume.pdf", resume_file.read(), "application/pdf")},
+        headers=headers,
+    )
+    if response.status_code >= 500 or response.status_code in (401, 404):
+        # Server-side problem: treat like an outage and fall back
+        raise httpx.HTTPStatusError("analysis service error", request=response.request, response=response)
+    return response.json()
+
+
+def analyze(job_title, resume_file, country, budget=None, keep_text=False):
+    """
+    Same contract as career_analyzer.analyze_profile, served remotely when configured.
+    """
+    cfg = get_section("analysis_service")
+    if cfg.get("url"):
+        try:
+            with metrics.timed("analysis_client.remote"), tracing.span("analyzer.remote"):
+                result = _analyze_remote(cfg, job_title, resume_file, country, keep_text)
+            metrics.incr("analysis_client.remote")
+            return result
+        except (httpx.HTTPError, ValueError) as e:
+            metrics.incr("analysis_client.fallback")
+            print(f"Analysis service unavailable, analyzing locally: {e}")
+            resume_file.seek(0)
+
+    metrics.incr("analysis_client.local")
+    started = time.perf_counter()
+    with tracing.span("analyzer.local"):
+        result = near_duplicates.analyze(job_title, resume_file, country, budget=budget, keep_text=keep_text)
+    event_log.analysis_event("app", result, started)
+    return result
+
+
+def retarget(job_title, resume_text, country):
+    """
+    Re-analyzes an already extracted (stored) resume text for another job or
+    country. Always in-process: without the PDF extraction this takes
+    milliseconds, less than a round trip to the service.
+    """
+    metrics.incr("analysis_client.retarget")
+    started = time.perf_counter()
+    with tracing.span("analyzer.retarget"):
+        result = analyze_text(job_title, resume_text, country)
+    event_log.analysis_event("retarget", result, started)
+    return result
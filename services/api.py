@@ -0,0 +1,147 @@
+"""
+Standalone HTTP service for the career analyzer and the read side of db_handler.
+
+Run it separately from the Streamlit UI, with as many workers as cores:
+
+    uvicorn services.api:app --host 0.0.0.0 --port 8600 --workers 4
+
+Endpoints:
+    POST /analyze                      multipart (job_title, country, resume=<pdf>[, keep_text=1])
+                                       or JSON {"job_title", "country", "resume_text"}
+    GET  /users/{user_id}/profile      latest stored analysis
+    GET  /users/{user_id}/history      ?limit=20&cursor=... newest first
+    GET  /healthz
+    GET  /metrics                      this worker's metrics snapshot
+
+Requests must carry "Authorization: Bearer <token>" when [analysis_service] token
+is set in secrets.toml. The /users routes return any user's stored analyses,
+so they answer 503 until a token is set. The Streamlit app calls this through
+services/analysis_client.py. Each worker appends its analyses to the event
+log (services/event_log.py) and reuses the analyses of near-duplicate
+resumes it has seen (services/near_duplicates.py); those results carry
+"near_duplicate".
+"""
+import hmac
+import time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from services import event_log, near_duplicates
+from utils import metrics
+from utils.config import get_section
+
+MAX_TEXT_CHARS = 500_000
+
+
+def _token():
+    return get_section("analysis_service").get("token")
+
+
+def _authorized(request):
+    token = _token()
+    if not token:
+        return True
+    header = request.headers.get("authorization", "")
+    return hmac.compare_digest(header, f"Bearer {token}")
+
+
+def _error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def _user_data_denied(request):
+    """The error response for a /users request, or None when it may proceed."""
+    if not _token():
+        return _error(503, "User data is not served without an [analysis_service] token.")
+    if not _authorized(request):
+        return _error(401, "Unauthorized")
+    return None
+
+
+async def analyze(request):
+    if not _authorized(request):
+        return _error(401, "Unauthorized")
+    metrics.incr("api.analyze.requests")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        job_title, country = form.get("job_title"), form.get("country")
+        upload = form.get("resume")
+        if not job_title or not country or upload is None or isinstance(upload, str):
+            return _error(400, "job_title, country and a resume file are required.")
+        keep_text = form.get("keep_text") == "1"
+        started = time.perf_counter()
+        with metrics.timed("api.analyze"):
+            # The spooled upload file is read through read_upload, never more than max_bytes + 1
+            result = await run_in_threadpool(
+                near_duplicates.analyze, job_title, upload.file, country, get_section("analysis_budget"), keep_text
+            )
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error(400, "Expected multipart/form-data or a JSON body.")
+        if not isinstance(body, dict):
+            return _error(400, "The JSON body must be an object.")
+        job_title, country, text = body.get("job_title"), body.get("country"), body.get("resume_text")
+        if not all(isinstance(value, str) and value for value in (job_title, country, text)):
+            return _error(400, "job_title, country and resume_text are required strings.")
+        if len(text) > MAX_TEXT_CHARS:
+            return _error(413, "resume_text is too long.")
+        started = time.perf_counter()
+        with metrics.timed("api.analyze"):
+            result = await run_in_threadpool(near_duplicates.analyze_text, job_title, text, country)
+
+    event_log.analysis_event("api", result, started)
+    return JSONResponse(result, status_code=200 if result.get("success") else 422)
+
+
+async def get_profile(request):
+    denied = _user_data_denied(request)
+    if denied is not None:
+        return denied
+    from services.db_handler import load_profile
+    profile = await run_in_threadpool(load_profile, request.path_params["user_id"])
+    if profile is None:
+        return _error(404, "No stored analysis for this user.")
+    return JSONResponse(profile)
+
+
+async def get_history(request):
+    denied = _user_data_denied(request)
+    if denied is not None:
+        return denied
+    from services.db_handler import list_history
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+    except ValueError:
+        return _error(400, "limit must be an integer.")
+    items, cursor = await run_in_threadpool(
+        list_history, request.path_params["user_id"], limit, request.query_params.get("cursor")
+    )
+    for item in items:
+        item["created_at"] = int(item.get("created_at", 0))
+    return JSONResponse({"items": items, "next_cursor": cursor})
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def get_metrics(request):
+    if not _authorized(request):
+        return _error(401, "Unauthorized")
+    return JSONResponse(metrics.snapshot())
+
+
+app = Starlette(routes=[
+    Route("/analyze", analyze, methods=["POST"]),
+    Route("/users/{user_id}/profile", get_profile),
+    Route("/users/{user_id}/history", get_history),
+    Route("/healthz", healthz),
+    Route("/metrics", get_metrics),
+])
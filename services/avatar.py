@@ -0,0 +1,74 @@
+import hashlib
+import io
+import threading
+import warnings
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+DEFAULT_AVATAR_URL = "https://cdn-icons-png.flaticon.com/512/3135/3135715.png"
+
+AVATAR_SIZE = (128, 128)
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_SOURCE_PIXELS = 40_000_000  # ~ a 7500x5300 photo; anything larger is treated as a bomb
+CACHE_ENTRIES = 512
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()  # content hash -> encoded avatar bytes
+
+
+class AvatarError(ValueError):
+    """Raised when an upload cannot be turned into an avatar."""
+
+
+def cache_avatar(digest, data):
+    """Keeps the encoded avatar in the in-process LRU cache."""
+    with _cache_lock:
+        _cache[digest] = data
+        _cache.move_to_end(digest)
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def get_cached_avatar(digest):
+    with _cache_lock:
+        data = _cache.get(digest)
+        if data is not None:
+            _cache.move_to_end(digest)
+        return data
+
+
+def make_avatar(raw):
+    """
+    Decodes an uploaded image once and returns (digest, webp_bytes) for a small square avatar.
+    The digest is the sha256 of the encoded avatar, so identical pictures share one entry.
+    Raises AvatarError for oversized, undecodable or decompression-bomb images.
+    """
+    if len(raw) > MAX_UPLOAD_BYTES:
+        raise AvatarError("Image is too large (max 5 MB).")
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(raw))
+            # Header-only check before any pixel data is decoded
+            width, height = image.size
+            if width * height > MAX_SOURCE_PIXELS:
+                raise AvatarError("Image dimensions are too large.")
+            # JPEG can decode straight at a reduced scale
+            image.draft("RGB", (AVATAR_SIZE[0] * 2, AVATAR_SIZE[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            image = ImageOps.fit(image.convert("RGB"), AVATAR_SIZE, Image.LANCZOS)
+    except AvatarError:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise AvatarError("Image dimensions are too large.")
+    except Exception as e:
+        raise AvatarError(f"Could not read image: {e}")
+
+    out = io.BytesIO()
+    image.save(out, format="WEBP", quality=80, method=4)
+    data = out.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    cache_avatar(digest, data)
+    return digest, data
@@ -0,0 +1,146 @@
+"""
+Bulk analysis of a resume corpus, with near-duplicate reuse.
+
+Inputs are PDFs, .txt files (one resume each) and JSONL(.gz) files with the
+text under "resume_text" or "text" and, optionally, "id", "job_title" and
+"country" per row (--job-title/--country fill in the rest). Documents are
+analyzed in input order through services/near_duplicates.py, so a repeat of
+an earlier document - the same PDF, the same text, or the same CV with
+trivial edits, for the same role and country - reuses its analysis.
+
+One JSON line per document goes to --out (stdout by default):
+
+    id, job_title, country, role, score, missing, implied   the analysis (--full: the whole result)
+    duplicate   null, or {of, distance, reuse, file} when an earlier analysis was reused
+    error       set instead of the analysis fields when it failed
+    ms          extract and total milliseconds
+
+The summary on stderr has the hit rate and an estimate of the time saved:
+skipped extractions at the mean extraction time, reused analyses at the
+mean analysis time, minus what the reuse cost. --no-dedup analyzes every
+document from scratch, to measure the difference directly.
+
+    python -m services.batch_analyze --job-title "DevOps Engineer" --country Germany resumes/*.pdf
+    python -m services.batch_analyze --out results.jsonl corpus/*.jsonl.gz
+"""
+import argparse
+import glob
+import gzip
+import json
+import sys
+import time
+
+from services import career_analyzer, near_duplicates
+from utils.config import get_section
+
+
+def iter_documents(paths, job_title, country):
+    """Yields (id, job_title, country, pdf path or None, text or None) per document."""
+    for path in paths:
+        if path.lower().endswith(".pdf"):
+            yield path, job_title, country, path, None
+        elif path.endswith(".txt"):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield path, job_title, country, None, f.read()
+        else:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                for n, line in enumerate(f):
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    text = row.get("resume_text") or row.get("text")
+                    if text:
+                        yield (str(row.get("id", f"{path}:{n + 1}")), row.get("job_title") or job_title,
+                               row.get("country") or country, None, text)
+
+
+def run(documents, out, dedup=True, full=False, budget=None):
+    """Analyzes the documents, writes one line each to `out` and returns the summary dict."""
+    index = None
+    if dedup:
+        policy = near_duplicates.get_policy()
+        index = near_duplicates.NearDuplicateIndex(policy["max_distance"], policy["max_entries"], policy["max_files"])
+    stats = {"documents": 0, "errors": 0, "fresh": 0, "exact": 0, "adjusted": 0, "files": 0}
+    seconds = {"total": 0.0, "extract": 0.0, "extracted": 0, "fresh": 0.0, "reused": 0.0}
+    started = time.perf_counter()
+    for doc_id, job_title, country, pdf, text in documents:
+        doc_started = time.perf_counter()
+        if not job_title or not country:
+            result = {"error": "No job_title/country for this document (see --job-title/--country)."}
+        elif pdf is not None:
+            with open(pdf, "rb") as f:
+                result = near_duplicates.analyze(job_title, f, country, budget, index=index) if index is not None \
+                    else career_analyzer.analyze_profile(job_title, f, country, budget=budget)
+        else:
+            result = near_duplicates.analyze_text(job_title, text, country, index=index) if index is not None \
+                else career_analyzer.analyze_text(job_title, text, country)
+        total = time.perf_counter() - doc_started
+
+        extract = float((result.get("extraction") or {}).get("elapsed") or 0.0)
+        duplicate = result.get("near_duplicate")
+        stats["documents"] += 1
+        seconds["total"] += total
+        if pdf is not None and not (duplicate and duplicate.get("file")):
+            seconds["extract"] += extract
+            seconds["extracted"] += 1
+        if not result.get("success"):
+            stats["errors"] += 1
+            record = {"id": doc_id, "job_title": job_title, "country": country, "error": result.get("error")}
+        else:
+            reuse = duplicate["reuse"] if duplicate else "fresh"
+            stats["files"] += bool(duplicate and duplicate.get("file"))
+            if reuse in ("exact", "adjusted"):
+                stats[reuse] += 1
+                seconds["reused"] += total - extract
+            else:
+                stats["fresh"] += 1
+                seconds["fresh"] += total - extract
+            if full:
+                record = {"id": doc_id, "result": result}
+            else:
+                record = {"id": doc_id, "job_title": job_title, "country": country,
+                          "role": result["target_role_detected"], "score": result["match_score"],
+                          "missing": [m["skill"] for m in result["missing_skills"]],
+                          "implied": [s["skill"] for s in result.get("implied_skills", [])]}
+            record["duplicate"] = duplicate
+        record["ms"] = {"extract": round(extract * 1000, 2), "total": round(total * 1000, 2)}
+        out.write(json.dumps(record) + "\n")
+
+    analyzed = stats["documents"] - stats["errors"]
+    reused = stats["exact"] + stats["adjusted"]
+    mean_extract = seconds["extract"] / seconds["extracted"] if seconds["extracted"] else 0.0
+    mean_fresh = seconds["fresh"] / stats["fresh"] if stats["fresh"] else 0.0
+    stats.update({
+        "hit_rate": round(reused / analyzed, 4) if analyzed else 0.0,
+        "seconds": round(time.perf_counter() - started, 3),
+        "extract_seconds": round(seconds["extract"], 3),
+        "saved_seconds_estimate": round(stats["files"] * mean_extract + reused * mean_fresh - seconds["reused"], 3),
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="PDF, .txt or JSONL(.gz) files or globs")
+    parser.add_argument("--job-title", help="for documents without their own job_title")
+    parser.add_argument("--country", help="for documents without their own country")
+    parser.add_argument("--out", help="JSONL output (default: stdout)")
+    parser.add_argument("--full", action="store_true", help="write the whole analysis result per document")
+    parser.add_argument("--no-dedup", action="store_true", help="analyze every document from scratch")
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.inputs for p in sorted(glob.glob(pattern))]
+    documents = iter_documents(paths, args.job_title, args.country)
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        stats = run(documents, out, dedup=not args.no_dedup, full=args.full, budget=get_section("analysis_budget"))
+    finally:
+        if args.out:
+            out.close()
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
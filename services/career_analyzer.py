@@ -1,33 +1,97 @@
-import pypdf
+import hashlib
 import json
+import os
 import re
+from functools import lru_cache
+from services.resource_governor import extract_pages, describe_outcome
 
-def extract_text_from_pdf(file):
+def clean_page_text(page_text):
+    """Reconstructs spaced-out characters in the text of a single PDF page."""
+    # Heuristic: if characters are separated by single spaces (e.g., "g a l g o t i a s"), join them.
+    # This pattern looks for a sequence of 3+ single characters separated by spaces.
+    # We include common symbols found in resumes (., /, @, %, &, +, -)
+    spaced_pattern = r'(?:[a-zA-Z0-9\.\/\%\&\@\(\)\+\-]\s){2,}[a-zA-Z0-9\.\/\%\&\@\(\)\+\-]'
+    def join_match(m):
+        # Replace single spaces but preserve double spaces (potential word boundaries)
+        return m.group(0).replace(" ", "")
+
+    fixed_text = re.sub(spaced_pattern, join_match, page_text)
+
+    # Second pass for common number formats like "7 . 9 8" or "2 0 2 4"
+    fixed_text = re.sub(r'([0-9])\s([\.\/])\s([0-9])', r'\1\2\3', fixed_text)
+    return fixed_text
+
+def extract_text_with_budget(file, budget=None):
+    """
+    Extracts text from an uploaded PDF within the per-analysis resource budget.
+    Returns (text, report); see resource_governor.extract_pages for the report.
+    """
+    pages, report = extract_pages(file, budget)
+    return "\n\n".join(p for p in pages if p), report
+
+def normalize_resume_text(text):
+    """
+    Canonical form of extracted text: line endings, trailing spaces and runs
+    of blank lines normalized. Identical resumes normalize to identical text,
+    which is what stored texts are deduplicated by.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r'[ \t]+\n', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+def extract_text_from_pdf(file, budget=None):
     """Extracts text from an uploaded PDF file with robust reconstruction of spaced-out characters."""
+    text, _ = extract_text_with_budget(file, budget)
+    return text
+
+# Synonyms and common variations per skill (lowercase), used by check_skill.
+SKILL_SYNONYMS = {
+    "sql": ["postgresql", "mysql", "oracle", "mariadb", "sqlite", "t-sql", "nosql", "dynamodb", "mongodb", "pl/sql", "databases", "querying"],
+    "python": ["python3", "py3", "django", "flask", "fastapi", "pandas", "numpy", "matplotlib", "scripting"],
+    "javascript": ["js", "es6", "typescript", "ts", "node", "react", "nextjs", "vue", "angular", "front-end"],
+    "aws": ["amazon web services", "ec2", "s3", "lambda", "cloudfront", "route53", "cloud computing"],
+    "ci/cd": ["cicd", "continuous integration", "continuous deployment", "pipelines", "actions", "github actions", "gitlab ci", "automation"],
+    "rest api": ["restful", "apis", "endpoint", "openapi", "swagger", "backend integration", "integrations"],
+    "git": ["github", "gitlab", "bitbucket", "version control", "svn", "mercurial", "branching"],
+    "docker": ["containers", "containerization", "dockerfile", "docker-compose"],
+    "kubernetes": ["k8s", "orchestration", "helm", "eks", "aks", "gke"],
+    "java": ["spring", "springboot", "hibernate", "maven", "gradle"]
+}
+
+# Reviewed additions mined from resume corpora (see services/mine_synonyms.py)
+SYNONYMS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "skill_synonyms.json")
+
+def load_reviewed_synonyms(path=SYNONYMS_FILE):
+    """
+    Merges the versioned synonym file into SKILL_SYNONYMS.
+    Returns the file's version (0 when there is none).
+    """
     try:
-        pdf_reader = pypdf.PdfReader(file)
-        text_parts = []
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                # Heuristic: if characters are separated by single spaces (e.g., "g a l g o t i a s"), join them.
-                # This pattern looks for a sequence of 3+ single characters separated by spaces.
-                # We include common symbols found in resumes (., /, @, %, &, +, -)
-                spaced_pattern = r'(?:[a-zA-Z0-9\.\/\%\&\@\(\)\+\-]\s){2,}[a-zA-Z0-9\.\/\%\&\@\(\)\+\-]'
-                def join_match(m):
-                    # Replace single spaces but preserve double spaces (potential word boundaries)
-                    return m.group(0).replace(" ", "")
-                
-                fixed_text = re.sub(spaced_pattern, join_match, page_text)
-                
-                # Second pass for common number formats like "7 . 9 8" or "2 0 2 4"
-                fixed_text = re.sub(r'([0-9])\s([\.\/])\s([0-9])', r'\1\2\3', fixed_text)
-                
-                text_parts.append(fixed_text)
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return ""
+        with open(path) as f:
+            reviewed = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    for skill, terms in reviewed.get("synonyms", {}).items():
+        merged = SKILL_SYNONYMS.setdefault(skill.lower(), [])
+        merged.extend(t for t in terms if t not in merged)
+    return reviewed.get("version", 0)
+
+SYNONYMS_VERSION = load_reviewed_synonyms()
+
+# Skill hierarchy: a term implies skills ("EKS" -> Kubernetes, AWS). Terms can
+# be taxonomy skills or other tools; implications are followed transitively.
+HIERARCHY_FILE = os.path.join(os.path.dirname(SYNONYMS_FILE), "skill_hierarchy.json")
+
+def load_skill_hierarchy(path=HIERARCHY_FILE):
+    """Returns the versioned hierarchy file's {term: [implied terms]} ({} when there is none)."""
+    try:
+        with open(path) as f:
+            return json.load(f).get("implies", {})
+    except (OSError, ValueError):
+        return {}
+
+SKILL_HIERARCHY = load_skill_hierarchy()
 
 def get_job_skills_database():
     """Returns a dictionary of job roles and their typical required skills."""
@@ -55,20 +119,92 @@ def get_job_skills_database():
         }
     }
 
-def analyze_profile(job_title, resume_file, country):
+def taxonomy_version():
+    """
+    Short fingerprint of the skill taxonomy (role skills, synonyms and hierarchy).
+    Stored with every analysis so stale scores can be found and re-scored.
+    """
+    payload = json.dumps([get_job_skills_database(), SKILL_SYNONYMS, SKILL_HIERARCHY], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+def skill_ids(version=None):
+    """
+    Stable small integer per skill of the taxonomy (sorted by name), used by
+    the event log instead of repeating skill names. Changes only with
+    taxonomy_version(); pass it when it is already known.
+    """
+    version = version or taxonomy_version()
+    if _skill_ids[0] != version:
+        names = sorted({s for skills in get_job_skills_database().values()
+                        for s in skills["critical"] + skills["nice_to_have"]})
+        _skill_ids[:] = [version, {name: i for i, name in enumerate(names)}]
+    return _skill_ids[1]
+
+_skill_ids = [None, {}]
+
+def implied_skill_index(version=None):
+    """
+    The transitive closure of SKILL_HIERARCHY as bitsets over skill_ids(),
+    built once per taxonomy version: (pattern, closures, names). `pattern`
+    finds hierarchy terms in cleaned (lowercase) resume text; `closures` maps
+    a lowercase term or skill to the bits of every skill it implies, not
+    counting itself, and `names` maps it back to its spelling.
+    """
+    version = version or taxonomy_version()
+    if _implied_index[0] != version:
+        ids = {name.lower(): i for name, i in skill_ids(version).items()}
+        edges = {}
+        for term, implied in SKILL_HIERARCHY.items():
+            edges.setdefault(term.lower(), set()).update(t.lower() for t in implied)
+        closures = {}
+        for start in edges:
+            seen, stack = set(), list(edges[start])
+            while stack:
+                term = stack.pop()
+                if term not in seen:
+                    seen.add(term)
+                    stack.extend(edges.get(term, ()))
+            bits = 0
+            for term in seen - {start}:
+                if term in ids:
+                    bits |= 1 << ids[term]
+            if bits:
+                closures[start] = bits
+        # Longest first, so "spring boot" wins over a shorter term it contains
+        terms = sorted(closures, key=len, reverse=True)
+        pattern = re.compile(r"(?<![a-z0-9])(?:" + "|".join(re.escape(t) for t in terms) + r")(?![a-z0-9])") \
+            if terms else None
+        names = {t.lower(): t for t in SKILL_HIERARCHY}
+        names.update((name.lower(), name) for name in skill_ids(version))
+        _implied_index[:] = [version, (pattern, closures, names)]
+    return _implied_index[1]
+
+_implied_index = [None, None]
+
+def input_fingerprint(resume_text_clean):
+    """Short hash of the cleaned resume text: identical resumes give the same fingerprint."""
+    return hashlib.blake2b(resume_text_clean.encode(), digest_size=8).hexdigest()
+
+def analyze_profile(job_title, resume_file, country, budget=None, keep_text=False):
     """
     Analyzes the resume against the target job title using keyword matching.
+    `budget` overrides resource_governor.DEFAULT_BUDGET for the PDF extraction.
+    With keep_text the normalized text is returned under "resume_text" so the
+    caller can store it (it is not part of the saved analysis); analyzing it
+    again with analyze_text gives the same result.
     """
-    resume_text = extract_text_from_pdf(resume_file)
+    resume_text, extraction = extract_text_with_budget(resume_file, budget)
+    resume_text = normalize_resume_text(resume_text)
     if not resume_text:
-        return {"error": "Could not extract text from resume. Please ensure it is a valid PDF."}
-    
-    # Normalize text - replace common ligatures or unusual whitespace
-    resume_text_clean = re.sub(r'(?<=[a-zA-Z])\s(?=[a-zA-Z]\s)', '', resume_text)
-    resume_text_clean = re.sub(r'\s+', ' ', resume_text_clean).lower()
-    
-    # Determine which skill set to use
-    db = get_job_skills_database()
+        reason = describe_outcome(extraction) or "Could not extract text from resume."
+        return {"error": f"{reason} Please ensure it is a valid PDF.", "extraction": extraction}
+    result = analyze_text(job_title, resume_text, country, extraction)
+    if keep_text and result.get("success"):
+        result["resume_text"] = resume_text
+    return result
+
+def detect_role(job_title):
+    """Maps a free-form job title to one of the roles in the skills database ("General" if none fits)."""
     target_role = "General"
     best_match_score = 0
     
@@ -76,7 +212,7 @@ def analyze_profile(job_title, resume_file, country):
     job_tokens = set(re.findall(r'\w+', job_title.lower()))
     role_modifier_tokens = {"engineer", "developer", "specialist", "manager", "lead", "senior", "junior"}
     
-    for role in db.keys():
+    for role in get_job_skills_database().keys():
         if role == "General": continue
         role_tokens = set(re.findall(r'\w+', role.lower()))
         matches = job_tokens.intersection(role_tokens)
@@ -91,69 +227,87 @@ def analyze_profile(job_title, resume_file, country):
         if score > best_match_score:
             target_role = role
             best_match_score = score
-            
+    return target_role
+
+@lru_cache(maxsize=None)
+def _skill_pattern(skill_lower):
+    # 1. Broad regex - handles 'Python', 'Python3', 'C++', '.NET'
+    if not re.search(r'[a-zA-Z0-9]', skill_lower[-1]):
+         pattern = r'\b' + re.escape(skill_lower)
+    elif not re.search(r'[a-zA-Z0-9]', skill_lower[0]):
+         pattern = re.escape(skill_lower) + r'\b'
+    else:
+         # Match word boundaries but allow versioning or attached punctuation
+         pattern = r'\b' + re.escape(skill_lower) + r'(?:\d+)?\b'
+    return re.compile(pattern)
+
+def check_skill(skill_name, text):
+    """True if the cleaned (lowercase) resume text mentions the skill or one of its synonyms."""
+    skill_lower = skill_name.lower()
+    if _skill_pattern(skill_lower).search(text):
+        return True
+        
+    # 2. Comprehensive Synonym and common variation check
+    if skill_lower in SKILL_SYNONYMS:
+        for syn in SKILL_SYNONYMS[skill_lower]:
+            if syn in text:
+                return True
+                
+    # 3. Permissive substring check for technical terms
+    # Lower threshold for critical short skills like SQL, AWS, API
+    threshold = 3
+    if skill_lower in ["sql", "aws", "git", "api"]:
+        threshold = 2
+        
+    # The skill anywhere in the text, also inside longer words
+    return len(skill_lower) > threshold and skill_lower in text
+
+def clean_resume_text(resume_text):
+    """Lowercase, whitespace-collapsed text the skills are matched against."""
+    # Normalize text - replace common ligatures or unusual whitespace
+    resume_text_clean = re.sub(r'(?<=[a-zA-Z])\s(?=[a-zA-Z]\s)', '', resume_text)
+    return re.sub(r'\s+', ' ', resume_text_clean).lower()
+
+def match_skills(target_role, resume_text_clean, version=None):
+    """
+    Matches the role's skills against cleaned resume text.
+    Returns (match_score, missing_skills, all_required_skills, implied_skills).
+    """
+    db = get_job_skills_database()
     required_skills = db[target_role]["critical"]
     nice_to_have_skills = db[target_role]["nice_to_have"]
     
     missing_skills_list = []
     matched_skills = []
-    
-    def check_skill(skill_name, text):
-        skill_lower = skill_name.lower()
-        
-        # 1. Broad regex - handles 'Python', 'Python3', 'C++', '.NET'
-        if not re.search(r'[a-zA-Z0-9]', skill_lower[-1]):
-             pattern = r'\b' + re.escape(skill_lower)
-        elif not re.search(r'[a-zA-Z0-9]', skill_lower[0]):
-             pattern = re.escape(skill_lower) + r'\b'
-        else:
-             # Match word boundaries but allow versioning or attached punctuation
-             pattern = r'\b' + re.escape(skill_lower) + r'(?:\d+)?\b'
-        
-        if re.search(pattern, text):
-            return True
-            
-        # 2. Comprehensive Synonym and common variation check
-        synonyms = {
-            "sql": ["postgresql", "mysql", "oracle", "mariadb", "sqlite", "t-sql", "nosql", "dynamodb", "mongodb", "pl/sql", "databases", "querying"],
-            "python": ["python3", "py3", "django", "flask", "fastapi", "pandas", "numpy", "matplotlib", "scripting"],
-            "javascript": ["js", "es6", "typescript", "ts", "node", "react", "nextjs", "vue", "angular", "front-end"],
-            "aws": ["amazon web services", "ec2", "s3", "lambda", "cloudfront", "route53", "cloud computing"],
-            "ci/cd": ["cicd", "continuous integration", "continuous deployment", "pipelines", "actions", "github actions", "gitlab ci", "automation"],
-            "rest api": ["restful", "apis", "endpoint", "openapi", "swagger", "backend integration", "integrations"],
-            "git": ["github", "gitlab", "bitbucket", "version control", "svn", "mercurial", "branching"],
-            "docker": ["containers", "containerization", "dockerfile", "docker-compose"],
-            "kubernetes": ["k8s", "orchestration", "helm", "eks", "aks", "gke"],
-            "java": ["spring", "springboot", "hibernate", "maven", "gradle"]
-        }
-        
-        if skill_lower in synonyms:
-            for syn in synonyms[skill_lower]:
-                if syn in text:
-                    return True
-                    
-        # 3. Permissive substring check for technical terms
-        # Lower threshold for critical short skills like SQL, AWS, API
-        threshold = 3
-        if skill_lower in ["sql", "aws", "git", "api"]:
-            threshold = 2
-            
-        if len(skill_lower) > threshold:
-            # Check if skill exists as a substring surrounded by non-word chars or start/end
-            if re.search(r'(?i)[^a-z0-9]?' + re.escape(skill_lower) + r'[^a-z0-9]?', text):
-                return True
-            
-        return False
 
-    # Check for skills
+    # Check for skills: literal mentions and synonyms first, then skills the
+    # mentioned terms imply through the hierarchy (one OR of precomputed closures)
+    version = version or taxonomy_version()
+    direct = {skill for skill in required_skills + nice_to_have_skills if check_skill(skill, resume_text_clean)}
+    pattern, closures, names = implied_skill_index(version)
+    mentioned = set(pattern.findall(resume_text_clean)) if pattern else set()
+    mentioned.update(skill.lower() for skill in direct)
+    implied_bits = 0
+    for term in mentioned:
+        implied_bits |= closures.get(term, 0)
+    ids = skill_ids(version)
+    implied_skills = []
+    for skill in required_skills + nice_to_have_skills:
+        if skill not in direct and implied_bits >> ids[skill] & 1:
+            # Credited to the most specific mentioned term (fewest implied skills)
+            via = min((t for t in mentioned if closures.get(t, 0) >> ids[skill] & 1),
+                      key=lambda t: (bin(closures[t]).count("1"), t))
+            implied_skills.append({"skill": skill, "via": names.get(via, via)})
+    implied = {s["skill"] for s in implied_skills}
+
     for skill in required_skills:
-        if check_skill(skill, resume_text_clean):
+        if skill in direct or skill in implied:
             matched_skills.append(skill)
         else:
             missing_skills_list.append({"skill": skill, "severity": "High"})
             
     for skill in nice_to_have_skills:
-        if not check_skill(skill, resume_text_clean):
+        if skill not in direct and skill not in implied:
             missing_skills_list.append({"skill": skill, "severity": "Medium"})
         else:
             matched_skills.append(skill)
@@ -181,17 +335,36 @@ def analyze_profile(job_title, resume_file, country):
             "Skill": skill, "Category": "Technical", "Priority": "Medium",
             "Status": "Completed" if skill in matched_skills else "To Do"
         })
+    return match_score, missing_skills_list, all_required_skills, implied_skills
 
-    # Salary & Companies
+def fallback_salary_range(country, match_score):
+    """Salary range without a salary index: a per-country table scaled by the match score."""
+    # Annual USD, like the index
     base_salaries = {
         "USA": [90000, 160000], "Canada": [75000, 130000], "Germany": [65000, 110000],
         "UK": [55000, 100000], "Australia": [80000, 140000], "UAE": [100000, 150000],
-        "India": [500000, 2500000]
+        "India": [6000, 30000]
     }
     salary_range = base_salaries.get(country, [50000, 100000])
-    salary_range = [int(s * (0.85 + match_score/200)) for s in salary_range]
+    return [int(s * (0.85 + match_score/200)) for s in salary_range]
 
-    return {
+def analyze_text(job_title, resume_text, country, extraction=None):
+    """
+    Analyzes already-extracted resume text against the target job title.
+    Returns the same result schema as analyze_profile.
+    """
+    if not resume_text or not resume_text.strip():
+        return {"error": "The resume text is empty."}
+    
+    resume_text_clean = clean_resume_text(resume_text)
+    
+    # Determine which skill set to use
+    target_role = detect_role(job_title)
+    version = taxonomy_version()
+    match_score, missing_skills_list, all_required_skills, implied_skills = \
+        match_skills(target_role, resume_text_clean, version)
+
+    result = {
         "success": True,
         "match_score": match_score,
         "missing_skills": missing_skills_list,
@@ -199,12 +372,78 @@ def analyze_profile(job_title, resume_file, country):
         "job_title": job_title,
         "target_role_detected": target_role,
         "target_country": country,
+        "extraction": extraction or {"outcome": "ok", "source": "text"},
+        "implied_skills": implied_skills,
+        "input_fingerprint": input_fingerprint(resume_text_clean),
+        "taxonomy_version": version
+    }
+    result.update(market_fields(target_role, country, job_title, match_score, missing_skills_list))
+    return result
+
+def market_fields(target_role, country, job_title, match_score, missing_skills_list):
+    """
+    The parts of an analysis that do not depend on the resume text beyond its
+    score and gaps: salary, demand, hiring companies and the roadmap, whose
+    dates start at the current quarter.
+    """
+    # Salary & Companies: p25-p75 from the salary index when one is built
+    from services import salary_index
+    salary_band = salary_index.salary_band(target_role, country, salary_index.seniority_from_text(job_title))
+    if salary_band:
+        salary_range = [salary_band["p25"], salary_band["p75"]]
+    else:
+        salary_range = fallback_salary_range(country, match_score)
+
+    # Demand from the job postings feed, when its counters are built
+    from services import market_demand
+    demand = market_demand.market_demand(target_role, country)
+
+    return {
         "salary_range": salary_range,
-        "market_demand_score": 85, 
+        "salary_band": salary_band,
+        "market_demand_score": demand["score"] if demand else 85,
+        "market_demand": demand,
         "hiring_companies": get_companies_by_region_and_role(country, target_role),
-        "roadmap": generate_roadmap(missing_skills_list)
+        "roadmap": generate_roadmap(missing_skills_list),
     }
 
+def refresh(prior, job_title, extraction=None):
+    """
+    `prior`, the analysis of the same resume text for the same role, country
+    and seniority, with its market_fields recomputed: salary, demand and the
+    roadmap's dates are current, not those of when `prior` was analyzed.
+    """
+    result = dict(prior)
+    result.update({
+        "job_title": job_title,
+        "extraction": extraction or {"outcome": "ok", "source": "text"},
+    })
+    result.update(market_fields(prior["target_role_detected"], prior["target_country"], job_title,
+                                prior["match_score"], prior["missing_skills"]))
+    return result
+
+def rematch(prior, job_title, resume_text, extraction=None):
+    """
+    Adjusts `prior`, the analysis of a near-identical resume for the same
+    role, country and seniority, to `resume_text`: skills and score are
+    matched again, and salary, demand, companies and roadmap recomputed.
+    Returns the same result schema as analyze_text.
+    """
+    resume_text_clean = clean_resume_text(resume_text)
+    version = taxonomy_version()
+    match_score, missing_skills_list, all_required_skills, implied_skills = \
+        match_skills(prior["target_role_detected"], resume_text_clean, version)
+    result = dict(prior)
+    result.update({
+        "match_score": match_score,
+        "missing_skills": missing_skills_list,
+        "all_required_skills": all_required_skills,
+        "implied_skills": implied_skills,
+        "input_fingerprint": input_fingerprint(resume_text_clean),
+        "taxonomy_version": version
+    })
+    return refresh(result, job_title, extraction)
+
 def get_companies_by_region_and_role(country, role):
     """
     Returns a curated list of companies based on research for specific regions.
@@ -1,63 +1,347 @@
 import streamlit as st
 import boto3
+import copy
 import json
 import time
 import hashlib
-from botocore.exceptions import ClientError
+import random
+import secrets
+import threading
+import zlib
+from decimal import Decimal
+from boto3.dynamodb.types import Binary
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from services import profile_cache, region_router, score_ranks
+from utils import metrics, tracing
+from utils.rate_limit import TokenBucket
 
-def get_db_client():
+# Table resources are cached per process (and region) once they are known to
+# exist, so DescribeTable is paid once instead of on every call.
+# With several [aws] regions, writes go to each user's home region and reads
+# to the nearest replica; see services/region_router.py.
+_table_cache = {}
+
+# Sort key prefix of analysis items in the history table
+HISTORY_PREFIX = "a#"
+# Small top-level copies of the analysis, enough for history lists and charts
+SUMMARY_FIELDS = ("match_score", "job_title", "target_country", "target_role_detected")
+
+# Stored resume texts: one compressed blob per distinct text (pk "t#<sha256>",
+# sk "blob", refcounted) and one reference per user holding it
+# (pk "u#<user_id>", sk "t#<sha256>"). Users keep at most [aws] resume_text_keep
+# texts, each for [aws] resume_text_retention_days after it was last used.
+TEXT_PREFIX = "t#"
+TEXT_OWNER_PREFIX = "u#"
+DEFAULT_RESUME_TEXT_KEEP = 3
+DEFAULT_RESUME_TEXT_RETENTION_DAYS = 365
+
+# Error codes DynamoDB uses when a request was rejected for capacity reasons
+THROTTLE_CODES = ("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded")
+# Transient server-side errors that are retried the same way
+RETRYABLE_CODES = THROTTLE_CODES + ("InternalServerError", "ServiceUnavailable")
+
+# Defaults for the [aws] retry/limiter settings
+DEFAULT_REQUESTS_PER_SECOND = 40
+DEFAULT_MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 2.0
+# How long a batch read keeps asking again for its unprocessed keys
+DEFAULT_BATCH_DEADLINE_SECONDS = 10.0
+
+# The app's own resource does not retry inside botocore: _call does, so every
+# retry goes through the limiter and shows up in metrics. A short connect
+# timeout lets reads move on quickly from an unreachable region.
+APP_BOTO_CONFIG = Config(retries={"total_max_attempts": 1, "mode": "standard"}, connect_timeout=2)
+
+_limiter_lock = threading.Lock()
+_limiter = None
+
+def _get_limiter():
+    """Process-wide token bucket shared by every session's DynamoDB requests."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            rate = float(st.secrets["aws"].get("max_requests_per_second", DEFAULT_REQUESTS_PER_SECOND))
+            _limiter = TokenBucket(rate, capacity=rate)
+        return _limiter
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response['Error']['Code'] in THROTTLE_CODES
+
+def _call(op, fn, region=None, **kwargs):
+    """
+    Performs one DynamoDB request. Every request goes through here so the
+    number of round trips per action is visible in metrics.
+    Each attempt takes a token from the shared limiter; throttled and
+    transient failures are retried with jittered exponential backoff.
+    The whole call, retries included, is one span of the current rerun, and
+    each attempt's latency is recorded for `region` (default: the local one).
+    """
+    max_attempts = int(st.secrets["aws"].get("max_attempts", DEFAULT_MAX_ATTEMPTS))
+    limiter = _get_limiter()
+    region = region or region_router.local_region()
+    with tracing.span(f"dynamodb.{op}"):
+        for attempt in range(max_attempts):
+            waited = limiter.acquire(1)
+            if waited:
+                metrics.observe("dynamodb.limiter_wait", waited)
+            metrics.incr("dynamodb.round_trips")
+            metrics.incr(f"dynamodb.calls.{op}")
+            started = time.perf_counter()
+            try:
+                return fn(**kwargs)
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code not in RETRYABLE_CODES:
+                    raise
+                if code in THROTTLE_CODES:
+                    metrics.incr("dynamodb.throttles")
+                    metrics.incr(f"dynamodb.throttles.{op}")
+                if attempt == max_attempts - 1:
+                    metrics.incr("dynamodb.retries_exhausted")
+                    raise
+                delay = backoff_delay(attempt)
+                metrics.incr("dynamodb.retries")
+                metrics.observe("dynamodb.backoff_wait", delay)
+                time.sleep(delay)
+            finally:
+                region_router.observe(region, time.perf_counter() - started)
+
+def _user_message(prefix, error):
+    """Error text for st.error: throttling gets a retry hint instead of the raw exception."""
+    if is_throttle(error):
+        return "The database is busy right now. Please try again in a moment."
+    return f"{prefix}: {error}"
+
+def new_db_resource(config=None, region=None):
+    """
+    Creates a fresh DynamoDB resource from secrets.toml, for `region` (default:
+    the local [aws] region_name). boto3 resources are not thread-safe, so
+    background jobs create one per worker thread.
+    Without `config` botocore's default retry behaviour applies.
+    """
+    region = region or st.secrets["aws"]["region_name"]
+    return boto3.Session(
+        aws_access_key_id=st.secrets["aws"]["aws_access_key_id"],
+        aws_secret_access_key=st.secrets["aws"]["aws_secret_access_key"],
+        region_name=region
+    ).resource('dynamodb', config=config, endpoint_url=region_router.endpoint_for(region))
+
+def get_db_client(region=None):
     """
     Initializes and returns a DynamoDB client using credentials from secrets.toml.
     Returns None if secrets are missing.
     """
     if "aws" not in st.secrets:
         return None
+    region = region or st.secrets["aws"]["region_name"]
+    key = ("__resource__", region)
+    if key in _table_cache:
+        return _table_cache[key]
     
     try:
-        session = boto3.Session(
-            aws_access_key_id=st.secrets["aws"]["aws_access_key_id"],
-            aws_secret_access_key=st.secrets["aws"]["aws_secret_access_key"],
-            region_name=st.secrets["aws"]["region_name"]
-        )
-        return session.resource('dynamodb')
+        _table_cache[key] = new_db_resource(APP_BOTO_CONFIG, region)
+        return _table_cache[key]
     except Exception as e:
         st.error(f"AWS Connection Error: {e}")
         return None
 
-def create_table_if_missing():
+def profile_table_name():
+    return st.secrets["aws"].get("dynamo_table_name", "user_profiles")
+
+def history_table_name():
+    return st.secrets["aws"].get("history_table_name", "analysis_history")
+
+def resume_text_table_name():
+    return st.secrets["aws"].get("resume_text_table_name", "resume_texts")
+
+def score_stats_table_name():
+    return st.secrets["aws"].get("score_stats_table_name", "score_stats")
+
+def table_specs():
+    """Key schema and TTL attribute of every table the app uses, by table name."""
+    return {
+        profile_table_name(): {
+            'key_schema': [{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+            'attribute_definitions': [{'AttributeName': 'user_id', 'AttributeType': 'S'}],
+        },
+        # One item per analysis: user_id (partition) + sk (time-ordered sort key).
+        # Items carry an expires_at TTL attribute when [aws] history_ttl_days is set.
+        history_table_name(): {
+            'key_schema': [{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                           {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            'attribute_definitions': [{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                      {'AttributeName': 'sk', 'AttributeType': 'S'}],
+            'ttl_attribute': 'expires_at',
+        },
+        # Deduplicated resume texts and the per-user references to them
+        resume_text_table_name(): {
+            'key_schema': [{'AttributeName': 'pk', 'KeyType': 'HASH'},
+                           {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            'attribute_definitions': [{'AttributeName': 'pk', 'AttributeType': 'S'},
+                                      {'AttributeName': 'sk', 'AttributeType': 'S'}],
+        },
+        # Match score histograms: pk "r#<role>#<country>", sk = the region writing it
+        # (see services/score_ranks.py)
+        score_stats_table_name(): {
+            'key_schema': [{'AttributeName': 'pk', 'KeyType': 'HASH'},
+                           {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            'attribute_definitions': [{'AttributeName': 'pk', 'AttributeType': 'S'},
+                                      {'AttributeName': 'sk', 'AttributeType': 'S'}],
+        },
+    }
+
+def bootstrap_tables(billing_mode="PROVISIONED", read_capacity=5, write_capacity=5, dynamodb=None, region=None):
+    """
+    Creates any missing tables and waits until they are active. This is a
+    deploy/admin step (see the __main__ block); the request path never creates
+    tables. billing_mode is "PROVISIONED" or "PAY_PER_REQUEST" (on-demand).
+    Returns {table_name: "exists" | "created"}.
+    """
+    dynamodb = dynamodb or new_db_resource(region=region)
+    client = dynamodb.meta.client
+    status = {}
+    for name, spec in table_specs().items():
+        try:
+            client.describe_table(TableName=name)
+            status[name] = "exists"
+            continue
+        except client.exceptions.ResourceNotFoundException:
+            pass
+        kwargs = {
+            'TableName': name,
+            'KeySchema': spec['key_schema'],
+            'AttributeDefinitions': spec['attribute_definitions'],
+            'BillingMode': billing_mode,
+        }
+        if billing_mode == "PROVISIONED":
+            kwargs['ProvisionedThroughput'] = {'ReadCapacityUnits': read_capacity,
+                                               'WriteCapacityUnits': write_capacity}
+        dynamodb.create_table(**kwargs).wait_until_exists()
+        if spec.get('ttl_attribute'):
+            client.update_time_to_live(
+                TableName=name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': spec['ttl_attribute']}
+            )
+        status[name] = "created"
+    return status
+
+def _get_table(table_name, region=None):
     """
-    Checks if the table exists, creates it if not.
-    Returns the Table resource or None on failure.
+    Returns the Table resource in `region` (default: the local one) once it is
+    known to exist, or None.
+    Missing tables are reported, not created: run the bootstrap step.
     """
-    dynamodb = get_db_client()
+    region = region or st.secrets["aws"]["region_name"]
+    dynamodb = get_db_client(region)
     if not dynamodb:
         return None
-        
-    table_name = st.secrets["aws"].get("dynamo_table_name", "user_profiles")
+
+    if (region, table_name) in _table_cache:
+        return _table_cache[(region, table_name)]
     table = dynamodb.Table(table_name)
     
     try:
-        table.load()
+        _call("DescribeTable", table.load, region=region)
+        _table_cache[(region, table_name)] = table
         return table
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceNotFoundException':
-            try:
-                # Create the table
-                table = dynamodb.create_table(
-                    TableName=table_name,
-                    KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
-                    AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'}],
-                    ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-                )
-                # Wait until the table exists.
-                table.wait_until_exists()
-                return table
-            except ClientError as create_error:
-                st.error(f"Failed to create table: {create_error}")
-                return None
+            st.error(f"Table '{table_name}' does not exist in {region}. Run `python -m services.db_handler bootstrap` first.")
         else:
-            st.error(f"Database Error: {e}")
-            return None
+            st.error(_user_message("Database Error", e))
+        return None
+    except BotoCoreError as e:
+        print(f"DynamoDB in {region} is unreachable: {e}")
+        return None
+
+def create_table_if_missing(region=None):
+    """
+    Returns the user table resource, or None if it is unavailable.
+    (Kept under its old name; the table itself is created by bootstrap_tables.)
+    """
+    if "aws" not in st.secrets:
+        return None
+    return _get_table(profile_table_name(), region)
+
+def get_history_table(region=None):
+    """Returns the analysis history table resource, or None if it is unavailable."""
+    if "aws" not in st.secrets:
+        return None
+    return _get_table(history_table_name(), region)
+
+def get_resume_text_table(region=None):
+    """Returns the stored resume text table resource, or None if it is unavailable."""
+    if "aws" not in st.secrets:
+        return None
+    return _get_table(resume_text_table_name(), region)
+
+def get_score_stats_table(region=None):
+    """Returns the match score histogram table resource, or None if it is unavailable."""
+    if "aws" not in st.secrets:
+        return None
+    return _get_table(score_stats_table_name(), region)
+
+def _routed_read(key, read):
+    """
+    Runs read(region) for the user `key` on the nearest replica first. When a
+    region fails, or returns None because a replica does not have the item yet,
+    the read moves on to the home region and then the remaining ones.
+    Returns None when no region has the item; re-raises the last failure when
+    no region answered at all.
+    """
+    order = region_router.read_order(key)
+    home = region_router.home_region(key)
+    error = None
+    for i, region in enumerate(order):
+        try:
+            result = read(region)
+        except (ClientError, BotoCoreError) as e:
+            if isinstance(e, ClientError) and e.response['Error']['Code'] not in RETRYABLE_CODES:
+                raise
+            error = e
+            metrics.incr(f"region.fallbacks.{region}")
+            continue
+        if result is None and region != home and home in order[i + 1:]:
+            metrics.incr(f"region.replica_misses.{region}")
+            continue
+        return result
+    if error is not None:
+        raise error
+    return None
+
+class RegionUnavailable(BotoCoreError):
+    fmt = "The DynamoDB tables in {region} are unavailable."
+
+class UnprocessedKeys(BotoCoreError):
+    fmt = "DynamoDB in {region} still had unprocessed keys after {seconds:g} s."
+
+def _require(table, region):
+    """Inside a routed read: a region whose table is unavailable counts as failed."""
+    if table is None:
+        raise RegionUnavailable(region=region)
+    return table
+
+def make_history_key(timestamp_ms=None):
+    """Sort key for an analysis: lexicographic order == time order."""
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    return f"{HISTORY_PREFIX}{timestamp_ms:013d}#{secrets.token_hex(2)}"
+
+def to_plain(value):
+    """Converts DynamoDB Decimals (recursively) back to int/float for JSON."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, set, tuple)):
+        return [to_plain(v) for v in value]
+    return value
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -65,21 +349,15 @@ def hash_password(password):
 def create_user(email, password):
     """
     Creates a new user with email and hashed password.
+    A single conditional put in the user's home region: the existence check
+    happens server-side.
     Returns (Success, Message).
     """
-    table = create_table_if_missing()
+    region = region_router.home_region(email)
+    table = create_table_if_missing(region)
     if not table:
         return False, "Database connection failed."
 
-    # Check if user exists
-    try:
-        response = table.get_item(Key={'user_id': email})
-        if 'Item' in response:
-            return False, "User already exists. Please login."
-    except ClientError:
-        pass # Proceed
-
-    # Create user
     try:
         item = {
             'user_id': email,
@@ -87,78 +365,601 @@ def create_user(email, password):
             'created_at': int(time.time()),
             'data': "{}" # Empty profile data initially
         }
-        table.put_item(Item=item)
+        _call("PutItem", table.put_item, region=region,
+              Item=item,
+              ConditionExpression="attribute_not_exists(user_id)")
         return True, "Account created successfully!"
     except ClientError as e:
-        return False, f"Error creating account: {e}"
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False, "User already exists. Please login."
+        return False, _user_message("Error creating account", e)
+
+def load_login(email, cached=True):
+    """
+    (password hash, latest_sk) of an account, or None when it does not exist.
+    With `cached` the profile cache may answer; raises ClientError/BotoCoreError.
+    """
+    login = profile_cache.get_login(email) if cached else None
+    if login:
+        profile_cache.reads_saved()
+        return login
+
+    def read(region):
+        table = _require(create_table_if_missing(region), region)
+        return _call("GetItem", table.get_item, region=region,
+                     Key={'user_id': email},
+                     ProjectionExpression="#p, latest_sk",
+                     ExpressionAttributeNames={'#p': 'password'}).get('Item')
+
+    item = _routed_read(email, read)
+    if item is None:
+        return None
+    login = item.get('password'), item.get('latest_sk')
+    profile_cache.put_login(email, *login)
+    return login
 
 def verify_user(email, password):
     """
     Verifies user credentials.
-    Returns (Success, Message/Data).
+    Only the password hash and the latest-analysis pointer are read (and
+    cached, see profile_cache); the profile is hydrated separately (see
+    hydrate_user).
+    Returns (Success, Message) or, on success, (True, {"latest_sk": ...}).
     """
-    table = create_table_if_missing()
-    if not table:
+    try:
+        login = load_login(email)
+    except RegionUnavailable:
         return False, "Database connection failed."
+    except (ClientError, BotoCoreError) as e:
+        return False, _user_message("Login error", e)
+    if login is None:
+        return False, "User not found."
+    saved_pass, latest_sk = login
 
+    if saved_pass == hash_password(password):
+        return True, {"latest_sk": latest_sk}
+    else:
+        return False, "Incorrect password."
+
+def _decode_data(data_str):
     try:
-        response = table.get_item(Key={'user_id': email})
-        if 'Item' not in response:
-            return False, "User not found."
-        
-        saved_pass = response['Item'].get('password')
-        if saved_pass == hash_password(password):
-            # Load stored profile data too
-            profile_data_str = response['Item'].get('data', '{}')
-            try:
-                profile_data = json.loads(profile_data_str)
-            except:
-                profile_data = {}
-            return True, profile_data
+        return json.loads(data_str or '{}') or None
+    except ValueError:
+        return None
+
+def hydrate_user(user_id, latest_sk=None):
+    """
+    Loads everything the app needs after login in one BatchGetItem: the latest
+    analysis (from the history table when latest_sk is known, else the legacy
+    'data' attribute) and the avatar. A cached copy of that exact analysis
+    version is used instead of reading it again.
+    Returns (profile_data, avatar_hash, avatar_bytes); missing parts are None.
+    Raises ClientError/BotoCoreError when no region could be read completely
+    (UnprocessedKeys once [aws] batch_deadline_seconds have passed), so a
+    failed read is never taken for a user without a stored analysis.
+    """
+    cached = profile_cache.get_profile(user_id, version=latest_sk) if latest_sk else None
+    if cached:
+        profile_cache.reads_saved()
+    want_history = bool(latest_sk) and not cached
+
+    def read(region):
+        table = _require(create_table_if_missing(region), region)
+        history = _require(get_history_table(region), region) if want_history else None
+        request = {
+            table.name: {
+                'Keys': [{'user_id': user_id}],
+                'ProjectionExpression': "#d, avatar, avatar_hash",
+                'ExpressionAttributeNames': {'#d': 'data'}
+            }
+        }
+        if history:
+            request[history.name] = {
+                'Keys': [{'user_id': user_id, 'sk': latest_sk}],
+                'ProjectionExpression': "#d",
+                'ExpressionAttributeNames': {'#d': 'data'}
+            }
+
+        responses = {}
+        deadline_seconds = float(st.secrets["aws"].get("batch_deadline_seconds", DEFAULT_BATCH_DEADLINE_SECONDS))
+        deadline = time.monotonic() + deadline_seconds
+        attempt = 0
+        while True:
+            response = _call("BatchGetItem", get_db_client(region).batch_get_item, region=region,
+                             RequestItems=request)
+            for name, items in response.get('Responses', {}).items():
+                responses.setdefault(name, []).extend(items)
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+            # Unprocessed keys are partial throttling: back off before asking again
+            metrics.incr("dynamodb.throttles")
+            delay = backoff_delay(attempt)
+            if time.monotonic() + delay > deadline:
+                # A part of the user's items is not a missing profile: fail the read instead
+                metrics.incr("dynamodb.retries_exhausted")
+                raise UnprocessedKeys(region=region, seconds=deadline_seconds)
+            time.sleep(delay)
+            attempt += 1
+        if not responses.get(table.name):
+            return None
+        if history and not responses.get(history.name) and region != region_router.home_region(user_id):
+            return None  # not replicated here yet; the home region decides
+        history_item = (responses.get(history.name) or [None])[0] if history else None
+        return responses[table.name][0], history_item
+
+    found = _routed_read(user_id, read)
+    if found is None:
+        return (cached[1] if cached else None), None, None
+
+    user_item, history_item = found
+    profile_data = cached[1] if cached else None
+    if history_item:
+        profile_data = _decode_data(history_item.get('data'))
+        if profile_data is not None:
+            profile_cache.put_profile(user_id, latest_sk, profile_data)
+    if profile_data is None:
+        profile_data = _decode_data(user_item.get('data'))
+
+    if 'avatar' in user_item and 'avatar_hash' in user_item:
+        return profile_data, user_item['avatar_hash'], bytes(user_item['avatar'])
+    return profile_data, None, None
+
+def compress_text(text):
+    return Binary(zlib.compress(text.encode("utf-8"), 6))
+
+def decompress_text(blob):
+    return zlib.decompress(bytes(blob)).decode("utf-8")
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def blob_key(digest, region):
+    """
+    Key of a stored text's blob. With several regions each home region keeps
+    its own copy, so a refcount is only ever updated in one region (global
+    tables resolve concurrent writes to an item by last writer wins).
+    """
+    if len(region_router.regions()) > 1:
+        return {'pk': f"{TEXT_PREFIX}{digest}@{region}", 'sk': "blob"}
+    return {'pk': f"{TEXT_PREFIX}{digest}", 'sk': "blob"}
+
+def _release_resume_text(table, region, user_id, digest):
+    """Drops a user's reference to a text; the blob goes with its last reference."""
+    response = _call("DeleteItem", table.delete_item, region=region,
+                     Key={'pk': f"{TEXT_OWNER_PREFIX}{user_id}", 'sk': f"{TEXT_PREFIX}{digest}"},
+                     ReturnValues="ALL_OLD")
+    if 'Attributes' not in response:
+        return
+    key = blob_key(digest, region)
+    response = _call("UpdateItem", table.update_item, region=region,
+                     Key=key,
+                     UpdateExpression="add refs :dec",
+                     ExpressionAttributeValues={':dec': -1},
+                     ReturnValues="UPDATED_NEW")
+    if response.get('Attributes', {}).get('refs', 0) <= 0:
+        try:
+            # Skipped if someone stored the same text in the meantime
+            _call("DeleteItem", table.delete_item, region=region, Key=key,
+                  ConditionExpression="refs <= :zero", ExpressionAttributeValues={':zero': 0})
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    metrics.incr("resume_text.released")
+
+def _retained(table, region, user_id, refs):
+    """Applies the retention limits to a user's references, releasing the rest."""
+    aws = st.secrets["aws"]
+    keep = int(aws.get("resume_text_keep", DEFAULT_RESUME_TEXT_KEEP))
+    cutoff = time.time() - float(aws.get("resume_text_retention_days", DEFAULT_RESUME_TEXT_RETENTION_DAYS)) * 86400
+    kept = []
+    for ref in sorted(refs, key=lambda r: -r['last_used']):
+        if len(kept) < keep and ref['last_used'] >= cutoff:
+            kept.append(ref)
         else:
-            return False, "Incorrect password."
+            _release_resume_text(table, region, user_id, ref['hash'])
+    return kept
+
+def list_resume_texts(user_id):
+    """
+    Returns the user's stored texts, most recently used first, as
+    [{"hash", "last_used", "chars"}]. Texts past the retention limits are
+    released on the way (in the user's home region, like every text write).
+    """
+    region = region_router.home_region(user_id)
+    table = get_resume_text_table(region)
+    if not table:
+        return []
+    try:
+        response = _call("Query", table.query, region=region,
+                         KeyConditionExpression="pk = :u",
+                         ExpressionAttributeValues={':u': f"{TEXT_OWNER_PREFIX}{user_id}"})
+        refs = [{'hash': item['sk'][len(TEXT_PREFIX):], 'last_used': int(item['last_used']),
+                 'chars': int(item.get('chars', 0))} for item in response.get('Items', [])]
+        return _retained(table, region, user_id, refs)
+    except (ClientError, BotoCoreError) as e:
+        print(f"Failed to list stored resume texts: {e}")
+        return []
+
+def store_resume_text(user_id, text):
+    """
+    Stores the normalized resume text for the user. Identical texts share one
+    compressed blob whoever uploaded them; storing a text the user already
+    has only marks it as used. Returns the text's hash, or None on failure.
+    """
+    region = region_router.home_region(user_id)
+    table = get_resume_text_table(region)
+    if not table:
+        return None
+
+    digest = text_digest(text)
+    now = int(time.time())
+    ref_key = {'pk': f"{TEXT_OWNER_PREFIX}{user_id}", 'sk': f"{TEXT_PREFIX}{digest}"}
+    try:
+        try:
+            _call("PutItem", table.put_item, region=region,
+                  Item=dict(ref_key, last_used=now, chars=len(text)),
+                  ConditionExpression="attribute_not_exists(pk)")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            touch_resume_text(user_id, digest)
+            metrics.incr("resume_text.reused")
+        else:
+            # New reference: count it on the blob, writing the blob if nobody holds it yet
+            response = _call("UpdateItem", table.update_item, region=region,
+                             Key=blob_key(digest, region),
+                             UpdateExpression="set text_z = if_not_exists(text_z, :z), chars = :n add refs :inc",
+                             ExpressionAttributeValues={':z': compress_text(text), ':n': len(text), ':inc': 1},
+                             ReturnValues="UPDATED_NEW")
+            metrics.incr("resume_text.deduplicated" if response['Attributes']['refs'] > 1 else "resume_text.stored")
+        list_resume_texts(user_id)  # enforce the retention limits
+        return digest
+    except (ClientError, BotoCoreError) as e:
+        print(f"Failed to store resume text: {e}")
+        return None
+
+def touch_resume_text(user_id, digest):
+    """Marks a stored text as used now, restarting its retention period."""
+    region = region_router.home_region(user_id)
+    table = get_resume_text_table(region)
+    if not table:
+        return
+    try:
+        _call("UpdateItem", table.update_item, region=region,
+              Key={'pk': f"{TEXT_OWNER_PREFIX}{user_id}", 'sk': f"{TEXT_PREFIX}{digest}"},
+              UpdateExpression="set last_used = :t",
+              ConditionExpression="attribute_exists(pk)",
+              ExpressionAttributeValues={':t': int(time.time())})
     except ClientError as e:
-        return False, f"Login error: {e}"
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Failed to update stored resume text: {e}")
+    except BotoCoreError as e:
+        print(f"Failed to update stored resume text: {e}")
+
+def load_resume_text(user_id, digest):
+    """Returns one of the user's stored texts by hash, or None if it is gone."""
+    home = region_router.home_region(user_id)
+
+    def read(region):
+        table = _require(get_resume_text_table(region), region)
+        response = _call("GetItem", table.get_item, region=region,
+                         Key=blob_key(digest, home),
+                         ProjectionExpression="text_z")
+        return response.get('Item')
+
+    try:
+        item = _routed_read(user_id, read)
+        return decompress_text(item['text_z']) if item else None
+    except (ClientError, BotoCoreError) as e:
+        st.error(_user_message("Failed to load your stored resume", e))
+        return None
 
-def save_profile(user_id, analysis_data):
+def save_profile(user_id, analysis_data, resume_text=None, text_hash=None):
     """
     Saves the user's analysis result to DynamoDB.
+    Each analysis becomes its own history item; the user item only keeps a
+    small pointer (latest_sk) and summary of the newest one.
+    The extracted resume text, when given, is stored deduplicated (see
+    store_resume_text) and the analysis records its hash, so it can be
+    re-targeted or re-scored later without the PDF. Pass text_hash instead
+    for an analysis of an already stored text.
+    Returns the new history sort key, or False on failure.
     """
-    table = create_table_if_missing()
-    if not table:
+    region = region_router.home_region(user_id)
+    table = create_table_if_missing(region)
+    history = get_history_table(region)
+    if not table or not history:
         return False
+
+    now = int(time.time())
+    sk = make_history_key()
+    summary = {f: analysis_data.get(f) for f in SUMMARY_FIELDS if analysis_data.get(f) is not None}
+    item = dict(summary, user_id=user_id, sk=sk, created_at=now, data=json.dumps(analysis_data))
+    if resume_text:
+        text_hash = store_resume_text(user_id, resume_text)
+    elif text_hash:
+        touch_resume_text(user_id, text_hash)
+    if text_hash:
+        item['text_hash'] = text_hash
+    ttl_days = st.secrets["aws"].get("history_ttl_days")
+    if ttl_days:
+        item['expires_at'] = now + int(ttl_days) * 86400
     
     try:
-        # Preserve existing password/created_at if simple put overwrite (DynamoDB PUT replaces whole item)
-        # Better: UpdateItem. But for simplicity, we get then put, or just update 'data' attribute.
-        # Let's use UpdateItem to only update 'data'
-        table.update_item(
+        _call("PutItem", history.put_item, region=region, Item=item)
+        # Point the user at the new analysis and drop the legacy inline copy
+        response = _call("UpdateItem", table.update_item, region=region,
             Key={'user_id': user_id},
-            UpdateExpression="set #d = :v",
+            UpdateExpression="set latest_sk = :sk, latest_summary = :s remove #d",
             ExpressionAttributeNames={'#d': 'data'},
-            ExpressionAttributeValues={':v': json.dumps(analysis_data)}
+            ExpressionAttributeValues={':sk': sk, ':s': dict(summary, created_at=now)},
+            ReturnValues="UPDATED_OLD"
         )
-        return True
-    except ClientError as e:
-        st.error(f"Failed to save to database: {e}")
+        # The caller's dict stays in its session state; cache a copy of its own
+        profile_cache.saved(user_id, sk, copy.deepcopy(analysis_data))
+        _record_score(region, response.get('Attributes', {}).get('latest_summary'), summary)
+        return sk
+    except (ClientError, BotoCoreError) as e:
+        st.error(_user_message("Failed to save to database", e))
         return False
 
 def load_profile(user_id):
     """
-    Loads a user's profile from DynamoDB.
+    Loads a user's latest analysis, through the profile cache.
     """
-    table = create_table_if_missing()
-    if not table:
+    cached = profile_cache.get_profile(user_id)
+    if cached:
+        profile_cache.reads_saved(2 if cached[0] else 1)
+        return cached[1]
+
+    def read(region):
+        table = _require(create_table_if_missing(region), region)
+        response = _call("GetItem", table.get_item, region=region,
+                         Key={'user_id': user_id},
+                         ProjectionExpression="#d, latest_sk",
+                         ExpressionAttributeNames={'#d': 'data'})
+        if 'Item' not in response:
+            return None
+        item = response['Item']
+        if item.get('latest_sk'):
+            history = get_history_table(region)
+            if history:
+                response = _call("GetItem", history.get_item, region=region,
+                                 Key={'user_id': user_id, 'sk': item['latest_sk']},
+                                 ProjectionExpression="#d",
+                                 ExpressionAttributeNames={'#d': 'data'})
+                if 'Item' in response:
+                    return item['latest_sk'], _decode_data(response['Item'].get('data'))
+                if region != region_router.home_region(user_id):
+                    return None  # not replicated here yet
+        # Parse the legacy JSON string back to a dict
+        return "", _decode_data(item.get('data'))
+
+    try:
+        found = _routed_read(user_id, read)
+    except (ClientError, BotoCoreError) as e:
+        st.error(_user_message("Failed to load from database", e))
         return None
-    
+    if found is None:
+        return None
+    version, profile = found
+    profile_cache.put_profile(user_id, version, profile)
+    return profile
+
+def list_history(user_id, limit=20, cursor=None, include_data=False):
+    """
+    Returns one page of a user's analyses, newest first, as (items, next_cursor).
+    Without include_data only the summary attributes are read, which keeps
+    charts cheap. Pass next_cursor back in to get the following page; it is
+    None after the last page.
+    """
+    if "aws" not in st.secrets:
+        return [], None
+
+    names = {'#u': 'user_id'}
+    projection = ["sk", "created_at"] + list(SUMMARY_FIELDS)
+    if include_data:
+        names['#d'] = 'data'
+        projection.append("#d")
+    kwargs = {
+        'KeyConditionExpression': "#u = :u AND begins_with(sk, :p)",
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {':u': user_id, ':p': HISTORY_PREFIX},
+        'ProjectionExpression': ", ".join(projection),
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if cursor:
+        kwargs['ExclusiveStartKey'] = {'user_id': user_id, 'sk': cursor}
+
+    def read(region):
+        history = _require(get_history_table(region), region)
+        response = _call("Query", history.query, region=region, **kwargs)
+        # An empty page from a replica may just be replication lag
+        return response if response.get('Items') or region == region_router.home_region(user_id) else None
+
     try:
-        response = table.get_item(Key={'user_id': user_id})
-        if 'Item' in response:
-            # Parse the JSON string back to a dict
-            data_str = response['Item'].get('data', '{}')
-            return json.loads(data_str)
-        else:
-            return None
+        response = _routed_read(user_id, read) or {}
+    except (ClientError, BotoCoreError) as e:
+        print(f"Failed to load analysis history: {e}")
+        return [], None
+
+    items = []
+    for item in response.get('Items', []):
+        if include_data:
+            item['data'] = _decode_data(item.get('data'))
+        if 'match_score' in item:
+            item['match_score'] = int(item['match_score'])
+        items.append(item)
+    next_cursor = response.get('LastEvaluatedKey', {}).get('sk')
+    return items, next_cursor
+
+def save_avatar(user_id, digest, avatar_bytes):
+    """
+    Stores the encoded avatar with the user's profile.
+    The write is skipped server-side when the same picture is already stored.
+    """
+    region = region_router.home_region(user_id)
+    table = create_table_if_missing(region)
+    if not table:
+        return False
+
+    try:
+        _call("UpdateItem", table.update_item, region=region,
+            Key={'user_id': user_id},
+            UpdateExpression="set avatar = :a, avatar_hash = :h",
+            ConditionExpression="attribute_not_exists(avatar_hash) OR avatar_hash <> :h",
+            ExpressionAttributeValues={':a': Binary(avatar_bytes), ':h': digest}
+        )
+        return True
     except ClientError as e:
-        st.error(f"Failed to load from database: {e}")
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return True # Same picture already stored
+        st.error(_user_message("Failed to save profile photo", e))
+        return False
+
+def load_avatar(user_id):
+    """
+    Loads the user's stored avatar.
+    Returns (digest, bytes) or (None, None) if the user has no photo.
+    """
+    if "aws" not in st.secrets:
+        return None, None
+
+    def read(region):
+        table = _require(create_table_if_missing(region), region)
+        return _call("GetItem", table.get_item, region=region,
+                     Key={'user_id': user_id},
+                     ProjectionExpression="avatar, avatar_hash").get('Item')
+
+    try:
+        item = _routed_read(user_id, read) or {}
+        if 'avatar' in item and 'avatar_hash' in item:
+            return item['avatar_hash'], bytes(item['avatar'])
+        return None, None
+    except (ClientError, BotoCoreError) as e:
+        print(f"Failed to load profile photo: {e}")
+        return None, None
+
+def update_score_histogram(stats, region, old_summary, new_summary):
+    """
+    Moves a user between match score histogram bins (see score_ranks.deltas),
+    on the items `region` owns. `stats` is the score stats table in `region`.
+    """
+    for pk, bins in score_ranks.deltas(old_summary, new_summary).items():
+        values = {f":d{b}": d for b, d in bins.items()}
+        names = {f"#s{b}": f"s{b}" for b in bins}
+        total = sum(bins.values())
+        expression = ", ".join(f"#s{b} :d{b}" for b in bins)
+        if total:
+            expression += ", n :n"
+            values[':n'] = total
+        _call("UpdateItem", stats.update_item, region=region, Key={'pk': pk, 'sk': region},
+              UpdateExpression="ADD " + expression,
+              ExpressionAttributeNames=names, ExpressionAttributeValues=values)
+
+def _record_score(region, old_summary, new_summary):
+    # The save itself already succeeded: a failure here only skews the ranks
+    # until the next score_ranks rebuild
+    try:
+        stats = get_score_stats_table(region)
+        if stats:
+            update_score_histogram(stats, region, old_summary, new_summary)
+    except (ClientError, BotoCoreError) as e:
+        metrics.incr("score_ranks.update_failures")
+        print(f"Could not update the match score histogram: {e}")
+
+def load_score_histogram(role, country):
+    """
+    The match score histogram of a role and country, merged over the items of
+    every region. With replicated tables any one replica holds all of them;
+    otherwise each region holds its own and all are read.
+    """
+    pk = score_ranks.stats_key(role, country)
+
+    def query(region):
+        stats = _require(get_score_stats_table(region), region)
+        response = _call("Query", stats.query, region=region,
+                         KeyConditionExpression="pk = :pk", ExpressionAttributeValues={':pk': pk})
+        return [score_ranks.from_item(item) for item in response.get('Items', [])]
+
+    if region_router.replicated():
+        return score_ranks.combine(_routed_read(pk, query) or [])
+    return score_ranks.combine(h for region in region_router.regions() for h in query(region))
+
+def match_score_rank(role, country, score):
+    """
+    {"top_percent", "population"} of `score` among the users whose latest
+    analysis targets the same role and country, or None when there are too
+    few of them or the histogram is unavailable.
+    """
+    if "aws" not in st.secrets or not role or not country:
+        return None
+    try:
+        histogram = score_ranks.cached(score_ranks.stats_key(role, country),
+                                       lambda: load_score_histogram(role, country))
+    except (ClientError, BotoCoreError) as e:
+        print(f"Could not load the match score histogram: {e}")
         return None
+    return score_ranks.rank(histogram, score)
+
+def _delete_items(table, keys):
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+
+def delete_user(user_id):
+    """
+    Deletes an account: the user's stored resume texts (blobs nobody else
+    holds go with them), every analysis in the history and the user item.
+    Returns (Success, Message).
+    """
+    region = region_router.home_region(user_id)
+    table = create_table_if_missing(region)
+    if not table:
+        return False, "Database connection failed."
+    history = get_history_table(region)
+    texts = get_resume_text_table(region)
+
+    try:
+        if texts:
+            for ref in list_resume_texts(user_id):
+                _release_resume_text(texts, region, user_id, ref['hash'])
+        if history:
+            kwargs = {'KeyConditionExpression': "user_id = :u",
+                      'ExpressionAttributeValues': {':u': user_id},
+                      'ProjectionExpression': "user_id, sk"}
+            while True:
+                response = _call("Query", history.query, region=region, **kwargs)
+                if response.get('Items'):
+                    _call("BatchWriteItem", _delete_items, region=region, table=history, keys=response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        response = _call("DeleteItem", table.delete_item, region=region, Key={'user_id': user_id},
+                         ReturnValues="ALL_OLD")
+        profile_cache.invalidate(user_id)
+        _record_score(region, response.get('Attributes', {}).get('latest_summary'), None)
+        return True, "Your account and stored data have been deleted."
+    except (ClientError, BotoCoreError) as e:
+        return False, _user_message("Could not delete the account", e)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="One-time DynamoDB setup for the app.")
+    parser.add_argument("command", choices=["bootstrap"])
+    parser.add_argument("--on-demand", action="store_true", help="create tables with PAY_PER_REQUEST billing")
+    parser.add_argument("--rcu", type=int, default=5, help="read capacity for provisioned tables")
+    parser.add_argument("--wcu", type=int, default=5, help="write capacity for provisioned tables")
+    parser.add_argument("--region", action="append",
+                        help="create the tables in this region (repeatable; default: every [aws] regions entry)")
+    args = parser.parse_args()
+    # Replicated setups usually bootstrap one region and add the others as
+    # global-table replicas; stand-in or partitioned setups bootstrap them all.
+    for region in args.region or region_router.regions():
+        result = bootstrap_tables("PAY_PER_REQUEST" if args.on_demand else "PROVISIONED", args.rcu, args.wcu,
+                                  region=region)
+        for name, state in result.items():
+            print(f"{region} {name}: {state}")
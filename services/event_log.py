@@ -0,0 +1,366 @@
+"""
+Append-only event log: one structured record per analysis, for offline
+analytics, replaying real traffic in benchmarks and debugging.
+
+emit() only appends the event to an in-memory buffer (a few microseconds).
+A background writer wakes up every flush_seconds, or as soon as batch_size
+events are waiting. It encodes the batch as JSON lines, compresses it as one
+gzip member and appends that to the process's open segment. A segment is
+sealed (renamed with its last timestamp) once it reaches segment_bytes or
+the process exits, and the oldest segments are deleted while the directory
+holds more than max_bytes. When the disk falls behind, events beyond max_pending are dropped
+and counted under event_log.dropped rather than growing the buffer.
+
+    <dir>/events-<first_ms>-<writer>.jsonl.gz             open segment of a running process
+    <dir>/events-<first_ms>-<last_ms>-<writer>.jsonl.gz   sealed segment
+
+<writer> is "<pid>.<random hex>", drawn when the process starts writing: pids
+repeat across containers sharing the directory and across restarts, and
+read() relies on one writer's segments being in time order.
+
+A concatenation of gzip members is a gzip file, so every segment reads with
+zcat or gzip.open. A crash loses at most the unwritten batch; a torn last
+member ends that segment's events for read(). Each process (the app, every
+API worker) writes its own segments, and read() merges them by timestamp.
+
+Analysis events (see analysis_event) carry:
+
+    ts, kind        epoch seconds, "analysis"
+    source          "app" (in-process), "retarget" or "api"
+    input           fingerprint of the resume text (career_analyzer), None when no text was extracted
+    role, country, job_title, score
+    matched         ids of the role's skills found in the resume (career_analyzer.skill_ids)
+    implied         the matched ones credited through the skill hierarchy, not mentioned directly
+    missing         ids of the role's skills not found
+    taxonomy        taxonomy version the skill ids belong to
+    outcome         extraction outcome ("ok", "page_limit", ...) or "error"
+    ms              stage timings: extract, analyze and total
+    duplicate       near_duplicate of a reused analysis (services/near_duplicates.py), else None
+
+    python -m services.event_log read --since 2024-05-01 --until 2024-05-02T12:00 --kind analysis
+    python -m services.event_log stats
+"""
+import argparse
+import atexit
+import datetime
+import glob
+import gzip
+import heapq
+import itertools
+import json
+import os
+import secrets
+import threading
+import time
+import zlib
+
+from utils import metrics
+from utils.config import get_section
+
+DEFAULT_POLICY = {
+    "enabled": True,
+    "dir": "logs/events",
+    "batch_size": 512,
+    "flush_seconds": 2.0,
+    "segment_bytes": 8 * 1024 * 1024,
+    "max_bytes": 512 * 1024 * 1024,
+    "max_pending": 20_000,
+}
+
+PREFIX, SUFFIX = "events-", ".jsonl.gz"
+
+_lock = threading.Condition()
+_pending = []  # (ts, kind, fields)
+# Held while writing, so flush() from atexit does not interleave with the writer thread
+_write_lock = threading.Lock()
+_writer = None
+_writer_pid = None
+_writer_id = None  # the <writer> part of this process's segment names
+_policy = None
+_segment = None  # [path, first_ms, size] of this process's open segment
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("event_log").items() if k in policy})
+    return policy
+
+
+def emit(kind, fields):
+    """
+    Queues one event. `fields` must be JSON serializable and is not copied,
+    so pass a dict the caller no longer changes.
+    """
+    global _policy
+    if _policy is None:
+        _policy = get_policy()
+    if not _policy["enabled"]:
+        return
+    with _lock:
+        if _writer_pid != os.getpid():
+            _start_writer()
+        # Taken under the lock, so each process's events are queued (and written) in time order
+        ts = time.time()
+        if len(_pending) >= _policy["max_pending"]:
+            metrics.incr("event_log.dropped")
+            return
+        _pending.append((ts, kind, fields))
+        if len(_pending) >= _policy["batch_size"]:
+            _lock.notify()
+
+
+def _start_writer():
+    # Also after a fork (API workers): the parent's writer thread does not exist in the child
+    global _writer, _writer_pid, _writer_id, _segment
+    _pending.clear()
+    _segment = None
+    _writer_id = f"{os.getpid()}.{secrets.token_hex(4)}"
+    _writer = threading.Thread(target=_run_writer, name="event-log", daemon=True)
+    _writer_pid = os.getpid()
+    _writer.start()
+    atexit.register(close)
+
+
+def _run_writer():
+    while True:
+        with _lock:
+            if len(_pending) < _policy["batch_size"]:
+                _lock.wait(float(_policy["flush_seconds"]))
+        flush()
+
+
+def _segment_name(first_ms, last_ms=None):
+    middle = f"{first_ms}-{last_ms}" if last_ms is not None else f"{first_ms}"
+    return f"{PREFIX}{middle}-{_writer_id}{SUFFIX}"
+
+
+def _parse_name(name):
+    """(first_ms, last_ms or None, writer) of a segment file name, or None."""
+    if not (name.startswith(PREFIX) and name.endswith(SUFFIX)):
+        return None
+    parts = name[len(PREFIX):-len(SUFFIX)].split("-")
+    try:
+        if len(parts) == 2:
+            return int(parts[0]), None, parts[1]
+        if len(parts) == 3:
+            return int(parts[0]), int(parts[1]), parts[2]
+    except ValueError:
+        pass
+    return None
+
+
+def _seal(directory, last_ms):
+    global _segment
+    path, first_ms, _ = _segment
+    _segment = None
+    try:
+        os.replace(path, os.path.join(directory, _segment_name(first_ms, last_ms)))
+    except OSError as e:
+        print(f"Could not seal event segment {path}: {e}")
+
+
+def _prune(directory, max_bytes):
+    """Deletes the oldest segments, but not this process's open one, while the directory is over max_bytes."""
+    segments = []
+    for name in os.listdir(directory):
+        parsed = _parse_name(name)
+        if parsed is None:
+            continue
+        try:
+            segments.append((parsed[0], name, os.path.getsize(os.path.join(directory, name))))
+        except OSError:
+            continue
+    total = sum(s[2] for s in segments)
+    own = os.path.basename(_segment[0]) if _segment else None
+    for first_ms, name, size in sorted(segments):
+        if total <= max_bytes:
+            break
+        if name == own:
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            metrics.incr("event_log.segments_deleted")
+        except OSError:
+            pass
+        total -= size
+
+
+def _write_batch(directory, batch):
+    global _segment
+    lines = []
+    for ts, kind, fields in batch:
+        record = {"ts": round(ts, 3), "kind": kind}
+        record.update(fields)
+        try:
+            lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        except ValueError:
+            metrics.incr("event_log.unserializable")
+    if not lines:
+        return
+    member = gzip.compress(("\n".join(lines) + "\n").encode(), compresslevel=6)
+    os.makedirs(directory, exist_ok=True)
+    if _segment is None:
+        first_ms = int(batch[0][0] * 1000)
+        _segment = [os.path.join(directory, _segment_name(first_ms)), first_ms, 0]
+    with metrics.timed("event_log.write"):
+        with open(_segment[0], "ab") as f:
+            f.write(member)
+    _segment[2] += len(member)
+    metrics.incr("event_log.events", len(lines))
+    if _segment[2] >= int(_policy["segment_bytes"]):
+        _seal(directory, int(batch[-1][0] * 1000))
+        _prune(directory, int(_policy["max_bytes"]))
+
+
+def flush():
+    """Writes every queued event now (the writer thread and close() use this)."""
+    global _segment
+    with _write_lock:
+        with _lock:
+            queued = _pending[:]
+            del _pending[:]
+        if not queued or _policy is None:
+            return
+        # One gzip member per batch_size events, so segments end close to segment_bytes
+        size = int(_policy["batch_size"])
+        for start in range(0, len(queued), size):
+            try:
+                _write_batch(_policy["dir"], queued[start:start + size])
+            except OSError as e:
+                metrics.incr("event_log.write_failures")
+                metrics.incr("event_log.dropped", len(queued) - start)
+                print(f"Could not write the event log: {e}")
+                _segment = None
+                return
+
+
+def close():
+    """Writes the queued events and seals the open segment (at exit)."""
+    flush()
+    with _write_lock:
+        if _segment is not None:
+            _seal(_policy["dir"], int(time.time() * 1000))
+
+
+def _to_epoch(value):
+    """Epoch seconds from None, a number, a datetime/date or an ISO string."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.timestamp()
+
+
+def _read_segment(path, since, until, kinds):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                ts = record.get("ts", 0)
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts >= until:
+                    # Events of one process are appended in time order
+                    return
+                if kinds is None or record.get("kind") in kinds:
+                    yield record
+    except (OSError, EOFError, zlib.error):
+        # A torn last member (crash, or a batch being appended right now)
+        metrics.incr("event_log.torn_segments")
+
+
+def segments(directory=None):
+    """Segment files as (first_ms, last_ms or None while open, writer, path), oldest first."""
+    directory = directory or get_policy()["dir"]
+    found = []
+    for path in glob.glob(os.path.join(directory, PREFIX + "*" + SUFFIX)):
+        parsed = _parse_name(os.path.basename(path))
+        if parsed is not None:
+            found.append(parsed + (path,))
+    return sorted(found, key=lambda s: (s[0], s[3]))
+
+
+def read(since=None, until=None, kinds=None, directory=None):
+    """
+    Streams events with since <= ts < until (epoch seconds, datetimes or ISO
+    strings; None for open-ended) in timestamp order, optionally only the
+    given kinds. Segments outside the range are not opened, and only one
+    segment per writing process is open at a time.
+    """
+    since, until = _to_epoch(since), _to_epoch(until)
+    kinds = set(kinds) if kinds else None
+    by_process = {}
+    for first_ms, last_ms, writer, path in segments(directory):
+        if until is not None and first_ms / 1000 >= until:
+            continue
+        if since is not None and last_ms is not None and last_ms / 1000 < since:
+            continue
+        by_process.setdefault(writer, []).append(path)
+    streams = [itertools.chain.from_iterable(_read_segment(p, since, until, kinds) for p in paths)
+               for paths in by_process.values()]
+    return heapq.merge(*streams, key=lambda record: record.get("ts", 0))
+
+
+def analysis_event(source, result, started, extraction=None):
+    """
+    Queues the event of one analysis. `result` is the analyzer's result
+    (success or error), `started` the perf_counter() value taken before it ran.
+    """
+    from services.career_analyzer import skill_ids
+
+    total = time.perf_counter() - started
+    extraction = extraction or result.get("extraction") or {}
+    extract = float(extraction.get("elapsed") or 0.0)
+    fields = {"source": source, "input": result.get("input_fingerprint"),
+              "outcome": extraction.get("outcome", "ok") if result.get("success") else "error",
+              "duplicate": result.get("near_duplicate"),
+              "ms": {"extract": round(extract * 1000, 2), "analyze": round((total - extract) * 1000, 2),
+                     "total": round(total * 1000, 2)}}
+    if result.get("success"):
+        ids = skill_ids(result.get("taxonomy_version"))
+        missing = {m["skill"] for m in result.get("missing_skills", [])}
+        required = [s["Skill"] for s in result.get("all_required_skills", [])]
+        fields.update({
+            "role": result.get("target_role_detected"), "country": result.get("target_country"),
+            "job_title": result.get("job_title"), "score": result.get("match_score"),
+            "matched": [ids[s] for s in required if s not in missing and s in ids],
+            "missing": [ids[s] for s in required if s in missing and s in ids],
+            "implied": [ids[s["skill"]] for s in result.get("implied_skills", []) if s["skill"] in ids],
+            "taxonomy": result.get("taxonomy_version"),
+        })
+    elif extraction.get("outcome") not in (None, "ok"):
+        fields["outcome"] = extraction["outcome"]
+    emit("analysis", fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=None, help="defaults to [event_log] dir")
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("read", help="print events as JSON lines")
+    r.add_argument("--since", help="epoch seconds or ISO date/time")
+    r.add_argument("--until", help="epoch seconds or ISO date/time (exclusive)")
+    r.add_argument("--kind", action="append", help="only these kinds (repeatable)")
+    sub.add_parser("stats", help="segments, bytes and events per kind")
+    args = parser.parse_args()
+
+    number = lambda v: float(v) if v and v.replace(".", "", 1).isdigit() else v
+    if args.command == "read":
+        for record in read(number(args.since), number(args.until), args.kind, args.dir):
+            print(json.dumps(record))
+        return
+    found = segments(args.dir)
+    kinds = {}
+    for record in read(directory=args.dir):
+        kinds[record.get("kind")] = kinds.get(record.get("kind"), 0) + 1
+    print(json.dumps({"segments": len(found), "open": sum(1 for s in found if s[1] is None),
+                      "bytes": sum(os.path.getsize(s[3]) for s in found), "events": kinds}))
+
+
+if __name__ == "__main__":
+    main()
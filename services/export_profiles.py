@@ -0,0 +1,181 @@
+"""
+Streaming export of stored profiles for analytics.
+
+Runs a DynamoDB parallel scan (one thread per segment), decodes each item's
+JSON `data` payload into flat columns and writes one part file per scanned
+page, so memory stays bounded by segments x page size. Read capacity is
+drawn from a shared token bucket (--rcu per second) so the export does not
+throttle live traffic. Progress is checkpointed per segment in
+<out>/_export_state.json; rerunning with --resume continues from the last
+segment cursor.
+
+    python -m services.export_profiles --out exports/2026-10 --segments 4 --format parquet
+    python -m services.export_profiles --out exports/2026-10 --resume
+    python -m services.export_profiles --source history --format jsonl --rcu 2
+
+Password hashes and avatar bytes are never exported.
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+
+from services.db_handler import to_plain
+from utils import metrics
+from utils.checkpoint import SegmentCheckpoint
+from utils.rate_limit import TokenBucket
+
+STATE_FILE = "_export_state.json"
+
+# Flat export schema (column -> pyarrow type name)
+COLUMNS = {
+    "user_id": "string",
+    "sk": "string",
+    "created_at": "int64",
+    "match_score": "int64",
+    "job_title": "string",
+    "target_country": "string",
+    "target_role_detected": "string",
+    "missing_skill_count": "int64",
+    "salary_min": "int64",
+    "salary_max": "int64",
+    "avatar_hash": "string",
+    "data": "string",
+}
+
+EXCLUDED_ATTRIBUTES = ("password", "avatar")
+
+
+def decode_item(item):
+    """Turns one DynamoDB item (profile or history) into a flat export row."""
+    item = {k: v for k, v in item.items() if k not in EXCLUDED_ATTRIBUTES}
+    try:
+        data = json.loads(item.get("data") or "{}")
+    except ValueError:
+        data = {}
+    if not data and item.get("latest_summary"):
+        data = to_plain(item["latest_summary"])
+
+    salary = data.get("salary_range") or [None, None]
+    row = {
+        "user_id": item.get("user_id"),
+        "sk": item.get("sk") or item.get("latest_sk"),
+        "created_at": to_plain(item.get("created_at")),
+        "match_score": data.get("match_score"),
+        "job_title": data.get("job_title"),
+        "target_country": data.get("target_country"),
+        "target_role_detected": data.get("target_role_detected"),
+        "missing_skill_count": len(data["missing_skills"]) if "missing_skills" in data else None,
+        "salary_min": salary[0] if len(salary) > 0 else None,
+        "salary_max": salary[1] if len(salary) > 1 else None,
+        "avatar_hash": item.get("avatar_hash"),
+        "data": json.dumps(data) if data else None,
+    }
+    return row
+
+
+def _write_part(path, rows, fmt):
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in COLUMNS.items()])
+        pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp, compression="zstd")
+    else:
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    os.replace(tmp, path)
+
+
+def _scan_segment(index, args, table_name, bucket, state, errors):
+    from services.db_handler import new_db_resource
+    table = new_db_resource(region=args.region).Table(table_name)  # one resource per thread
+    seg = state.segment(index)
+    cursor = seg["cursor"]
+    ext = "parquet" if args.format == "parquet" else "jsonl.gz"
+
+    try:
+        while not seg["done"]:
+            # Pay for the page after it is read (ConsumedCapacity), but never start
+            # a page while the bucket is in debt.
+            waited = bucket.acquire(1)
+            metrics.observe("export.rcu_wait", waited)
+            kwargs = {
+                "Segment": index,
+                "TotalSegments": args.segments,
+                "Limit": args.page_size,
+                "ReturnConsumedCapacity": "TOTAL",
+            }
+            if cursor:
+                kwargs["ExclusiveStartKey"] = cursor
+            response = table.scan(**kwargs)
+            consumed = float(response.get("ConsumedCapacity", {}).get("CapacityUnits", 1))
+            bucket.charge(max(consumed - 1, 0))
+            metrics.incr("export.rcu", consumed)
+
+            rows = [decode_item(item) for item in response.get("Items", [])]
+            cursor = to_plain(response.get("LastEvaluatedKey"))
+            if rows:
+                part = os.path.join(args.out, f"segment-{index:03d}-part-{seg['pages']:06d}.{ext}")
+                _write_part(part, rows, args.format)
+            state.advance(index, cursor, len(rows))
+            metrics.incr("export.rows", len(rows))
+    except Exception as e:
+        errors.append((index, e))
+
+
+def run_export(args):
+    from services.db_handler import profile_table_name, history_table_name
+
+    os.makedirs(args.out, exist_ok=True)
+    config = {"source": args.source, "segments": args.segments, "format": args.format}
+    state = SegmentCheckpoint(os.path.join(args.out, STATE_FILE), config)
+    if args.resume and state.exists():
+        # The segment layout must match the original run for the cursors to be valid
+        config = state.load()
+        args.source, args.segments, args.format = config["source"], config["segments"], config["format"]
+    elif state.exists():
+        raise SystemExit(f"{state.path} exists: pass --resume or choose an empty --out directory.")
+
+    table_name = history_table_name() if args.source == "history" else profile_table_name()
+    bucket = TokenBucket(rate=args.rcu, capacity=max(args.rcu, 1.0))
+    errors = []
+    started = time.time()
+    threads = [
+        threading.Thread(target=_scan_segment, args=(i, args, table_name, bucket, state, errors), daemon=True)
+        for i in range(args.segments) if not state.segment(i)["done"]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    rows = state.totals().get("rows", 0)
+    print(f"Exported {rows} rows from {table_name} in {time.time() - started:.1f}s "
+          f"({metrics.get_counter('export.rcu'):.1f} RCU consumed)")
+    for index, e in errors:
+        print(f"Segment {index} stopped: {e} (rerun with --resume to continue)")
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--source", choices=["profiles", "history"], default="profiles")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default="jsonl")
+    parser.add_argument("--rcu", type=float, default=2.0,
+                        help="read capacity units per second to spend (the default table has 5)")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--region", help="region to run against (default: [aws] region_name); "
+                        "run once per region when [aws] replicated is false")
+    args = parser.parse_args()
+    raise SystemExit(0 if run_export(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Offline job-postings index behind the dashboard's "Matching Jobs" list.
+
+Postings come from local JSONL dumps, one object per line:
+
+    {"id": "...", "title": "...", "company": "...", "country": "Germany",
+     "description": "...", "skills": ["Docker", ...], "posted_at": "2026-09-30", "url": "..."}
+
+Only title/country are required; skills found in the title and description
+are added to any listed under "skills". The index only knows our own skill
+vocabulary (the role skills and synonyms in career_analyzer), so a posting is
+the bag of skills it mentions.
+
+Layout (all arrays are .npy files opened with mmap_mode="r", so every worker
+process shares one copy through the page cache):
+
+    <index>/manifest.json             vocabulary, countries, segments, ingested files
+    <index>/seg-00001/offsets.npy     int64 [V+1]  CSR row pointers per skill
+                     /postings.npy    int32        doc ids, ascending per skill
+                     /tf.npy          uint16       term frequency per posting
+                     /weights.npy     float32      BM25 tf component per posting
+                     /doc_len.npy     uint16       skill mentions per doc
+                     /doc_terms.npy   uint16       distinct skills per doc
+                     /doc_country.npy uint16       index into manifest countries
+                                                   (doc ids are grouped by country, see _write_segment)
+                     /meta.jsonl + meta_offsets.npy   display fields, read for the top-k only
+
+Builds are incremental: each run ingests only input files it has not seen
+into a new segment. Changed files or a taxonomy change need --rebuild.
+
+    python -m services.job_index build --index data/job_index dumps/*.jsonl
+    python -m services.job_index query --index data/job_index --country Germany --have Docker Git --missing Kubernetes
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+
+import numpy as np
+
+from services.career_analyzer import SKILL_SYNONYMS, get_job_skills_database, taxonomy_version
+from services.salary_index import normalize_country
+from utils import metrics
+from utils.config import get_section
+
+DEFAULT_INDEX_DIR = "data/job_index"
+MANIFEST = "manifest.json"
+
+# BM25 parameters and the weight of the skill-fit bonus
+K1 = 1.2
+B = 0.75
+MISSING_WEIGHT = 0.5  # postings that also teach a missing skill rank a little higher
+FIT_WEIGHT = 2.0      # share of the posting's skills the user already has
+
+META_FIELDS = ("id", "title", "company", "country", "posted_at", "url")
+
+
+def skill_vocabulary():
+    """Canonical skill names (as shown in analyses), sorted - term id = position."""
+    skills = set()
+    for role in get_job_skills_database().values():
+        skills.update(role["critical"])
+        skills.update(role["nice_to_have"])
+    return sorted(skills)
+
+
+class SkillExtractor:
+    """Finds vocabulary skills (and their synonyms) in free text with one regex pass."""
+
+    def __init__(self, vocabulary):
+        self.term_ids = {name.lower(): i for i, name in enumerate(vocabulary)}
+        surface = {}
+        for name, i in self.term_ids.items():
+            surface.setdefault(name, set()).add(i)
+        for skill, synonyms in SKILL_SYNONYMS.items():
+            if skill not in self.term_ids:
+                continue
+            for syn in synonyms:
+                surface.setdefault(syn, set()).add(self.term_ids[skill])
+        self.surface = {k: tuple(sorted(v)) for k, v in surface.items()}
+        # Longest first so "github actions" wins over "github"
+        alternation = "|".join(re.escape(s) for s in sorted(self.surface, key=len, reverse=True))
+        self.pattern = re.compile(r"(?<![a-z0-9])(?:" + alternation + r")(?![a-z0-9])")
+
+    def counts(self, text, listed=()):
+        """Returns {term_id: mentions} for the text plus any explicitly listed skills."""
+        found = {}
+        for m in self.pattern.findall(text.lower()):
+            for i in self.surface[m]:
+                found[i] = found.get(i, 0) + 1
+        for name in listed:
+            i = self.term_ids.get(str(name).lower())
+            if i is not None:
+                found[i] = found.get(i, 0) + 1
+        return found
+
+
+def _load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(index_dir, manifest):
+    tmp = os.path.join(index_dir, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(index_dir, MANIFEST))
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def _write_segment(seg_dir, postings, doc_len, doc_terms, doc_country, meta_offsets, vocab_size):
+    """
+    Writes the segment arrays. Documents are renumbered so each country is a
+    contiguous doc-id range: a country-filtered query only touches the slice
+    of each posting list that belongs to that country.
+    Returns {country_id: [first_doc, end_doc]}.
+    """
+    country = np.frombuffer(doc_country, dtype=np.int32)
+    order = np.argsort(country, kind="stable")  # new id -> old id
+    new_id = np.empty_like(order, dtype=np.int32)
+    new_id[order] = np.arange(len(order), dtype=np.int32)
+
+    offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+    for term, (ids, _) in postings.items():
+        offsets[term + 1] = len(ids)
+    np.cumsum(offsets, out=offsets)
+    all_ids = np.empty(offsets[-1], dtype=np.int32)
+    all_tf = np.empty(offsets[-1], dtype=np.uint16)
+    for term, (ids, tfs) in postings.items():
+        ids = new_id[np.frombuffer(ids, dtype=np.int32)]
+        by_doc = np.argsort(ids, kind="stable")
+        all_ids[offsets[term]:offsets[term + 1]] = ids[by_doc]
+        all_tf[offsets[term]:offsets[term + 1]] = np.minimum(np.frombuffer(tfs, dtype=np.int32), 65535)[by_doc]
+
+    lengths = np.minimum(np.frombuffer(doc_len, dtype=np.int32), 65535)[order].astype(np.uint16)
+    # The BM25 tf/length part is fixed once the segment is written (it uses the
+    # segment's own average length), so queries only multiply by idf.
+    avgdl = float(lengths.mean()) if len(lengths) else 1.0
+    tf = all_tf.astype(np.float32)
+    norm = K1 * (1 - B + B * lengths[all_ids].astype(np.float32) / avgdl)
+    np.save(os.path.join(seg_dir, "weights.npy"), (tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+    np.save(os.path.join(seg_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(seg_dir, "postings.npy"), all_ids)
+    np.save(os.path.join(seg_dir, "tf.npy"), all_tf)
+    np.save(os.path.join(seg_dir, "doc_len.npy"), lengths)
+    np.save(os.path.join(seg_dir, "doc_terms.npy"), np.frombuffer(doc_terms, dtype=np.int32)[order].astype(np.uint16))
+    np.save(os.path.join(seg_dir, "doc_country.npy"), country[order].astype(np.uint16))
+    np.save(os.path.join(seg_dir, "meta_offsets.npy"), np.frombuffer(meta_offsets, dtype=np.int64)[order])
+
+    ranges = {}
+    sorted_country = country[order]
+    for cid in np.unique(sorted_country):
+        lo, hi = np.searchsorted(sorted_country, [cid, cid + 1])
+        ranges[str(int(cid))] = [int(lo), int(hi)]
+    return ranges
+
+
+def build(index_dir, inputs, rebuild=False):
+    """
+    Ingests input files not indexed yet into a new segment.
+    Returns a summary dict (files, docs, seconds).
+    """
+    started = time.time()
+    manifest = None if rebuild else _load_manifest(index_dir)
+    if manifest and manifest["taxonomy_version"] != taxonomy_version():
+        raise SystemExit("The skill taxonomy changed since this index was built: rerun with --rebuild.")
+    if rebuild and os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    if manifest is None:
+        manifest = {"taxonomy_version": taxonomy_version(), "vocabulary": skill_vocabulary(),
+                    "countries": [], "segments": [], "files": {}}
+
+    pending, changed = [], []
+    for path in inputs:
+        known = manifest["files"].get(os.path.abspath(path))
+        if known is None:
+            pending.append(path)
+        elif known["signature"] != _file_signature(path):
+            changed.append(path)
+    if changed:
+        # Their old postings live in an earlier segment; re-adding would duplicate them
+        raise SystemExit(f"Already indexed files changed ({', '.join(changed)}): rerun with --rebuild.")
+    if not pending:
+        return {"files": 0, "docs": 0, "seconds": 0.0}
+
+    vocab = manifest["vocabulary"]
+    extractor = SkillExtractor(vocab)
+    country_ids = {c.lower(): i for i, c in enumerate(manifest["countries"])}
+    seg_name = f"seg-{len(manifest['segments']) + 1:05d}"
+    seg_dir = os.path.join(index_dir, seg_name)
+    os.makedirs(seg_dir, exist_ok=True)
+
+    postings = {}  # term -> (array of doc ids, array of tf)
+    doc_len, doc_terms, doc_country = array("i"), array("i"), array("i")
+    meta_offsets = array("q")
+    doc = 0
+    with open(os.path.join(seg_dir, "meta.jsonl"), "wb") as meta:
+        for path in pending:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        metrics.incr("job_index.bad_rows")
+                        continue
+                    if not row.get("title") or not row.get("country"):
+                        metrics.incr("job_index.bad_rows")
+                        continue
+                    counts = extractor.counts(f"{row['title']} {row.get('description', '')}", row.get("skills") or ())
+                    if not counts:
+                        continue  # nothing in our vocabulary - never matchable
+                    for term, tf in counts.items():
+                        ids, tfs = postings.setdefault(term, (array("i"), array("i")))
+                        ids.append(doc)
+                        tfs.append(tf)
+                    # "US", "usa" and "United States" are one country, as in the salary index
+                    country = normalize_country(row["country"])
+                    if country.lower() not in country_ids:
+                        country_ids[country.lower()] = len(manifest["countries"])
+                        manifest["countries"].append(country)
+                    doc_len.append(sum(counts.values()))
+                    doc_terms.append(len(counts))
+                    doc_country.append(country_ids[country.lower()])
+                    meta_offsets.append(meta.tell())
+                    meta.write((json.dumps({k: row.get(k) for k in META_FIELDS}) + "\n").encode("utf-8"))
+                    doc += 1
+            manifest["files"][os.path.abspath(path)] = {"signature": _file_signature(path), "segment": seg_name}
+
+    ranges = _write_segment(seg_dir, postings, doc_len, doc_terms, doc_country, meta_offsets, len(vocab))
+    manifest["segments"].append({"name": seg_name, "docs": doc, "total_len": int(sum(doc_len)),
+                                 "countries": ranges})
+    _save_manifest(index_dir, manifest)
+    metrics.incr("job_index.docs_indexed", doc)
+    return {"files": len(pending), "docs": doc, "seconds": round(time.time() - started, 2)}
+
+
+class Segment:
+    def __init__(self, seg_dir, info):
+        load = lambda name: np.load(os.path.join(seg_dir, name), mmap_mode="r")
+        self.dir = seg_dir
+        self.docs = info["docs"]
+        self.country_ranges = {int(c): r for c, r in info["countries"].items()}
+        self.offsets = load("offsets.npy")
+        self.postings = load("postings.npy")
+        self.tf = load("tf.npy")
+        self.weights = load("weights.npy")
+        self.doc_len = load("doc_len.npy")
+        self.doc_terms = load("doc_terms.npy")
+        self.doc_country = load("doc_country.npy")
+        self.meta_offsets = load("meta_offsets.npy")
+
+    def df(self, term):
+        return int(self.offsets[term + 1] - self.offsets[term])
+
+    def term(self, term, first=0, end=None):
+        """Postings of `term` restricted to doc ids in [first, end)."""
+        lo, hi = self.offsets[term], self.offsets[term + 1]
+        ids = self.postings[lo:hi]
+        if first or end is not None:
+            a, b = np.searchsorted(ids, [first, self.docs if end is None else end])
+            return ids[a:b], self.weights[lo + a:lo + b]
+        return ids, self.weights[lo:hi]
+
+    def meta(self, doc):
+        with open(os.path.join(self.dir, "meta.jsonl"), "rb") as f:
+            f.seek(int(self.meta_offsets[doc]))
+            return json.loads(f.readline())
+
+
+class JobIndex:
+    """Read side: memory-mapped segments plus the manifest's vocabulary."""
+
+    def __init__(self, index_dir):
+        self.dir = index_dir
+        self.manifest = _load_manifest(index_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No job index in {index_dir}")
+        self.term_ids = {name.lower(): i for i, name in enumerate(self.manifest["vocabulary"])}
+        self.country_ids = {c.lower(): i for i, c in enumerate(self.manifest["countries"])}
+        self.segments = [Segment(os.path.join(index_dir, s["name"]), s) for s in self.manifest["segments"]]
+        self.total_docs = sum(s["docs"] for s in self.manifest["segments"])
+
+    def _idf(self, term):
+        df = sum(seg.df(term) for seg in self.segments)
+        return np.log(1 + (self.total_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, have_skills, missing_skills=(), country=None, k=10):
+        """
+        Top-k postings by BM25 over the user's skills (missing ones at
+        MISSING_WEIGHT) plus FIT_WEIGHT x the share of the posting's skills the
+        user already has. `country` is normalized like the indexed countries
+        (aliases, case-insensitive) and filters exactly.
+        """
+        query = {}
+        for name in missing_skills:
+            if name.lower() in self.term_ids:
+                query[self.term_ids[name.lower()]] = (MISSING_WEIGHT, False)
+        for name in have_skills:
+            if name.lower() in self.term_ids:
+                query[self.term_ids[name.lower()]] = (1.0, True)
+        if not query or not self.total_docs:
+            return []
+        country_id = None
+        if country:
+            country_id = self.country_ids.get(normalize_country(country).lower())
+            if country_id is None:
+                return []
+
+        idf = {term: self._idf(term) for term in query}
+        candidates = []  # (score, skill fit, segment, doc); at most k per segment
+        for seg in self.segments:
+            first, end = 0, seg.docs
+            if country_id is not None:
+                if country_id not in seg.country_ranges:
+                    continue
+                first, end = seg.country_ranges[country_id]
+            # One bincount over all query postings is much cheaper than a
+            # fancy-indexed += per term
+            id_parts, weight_parts, have_parts = [], [], []
+            for term, (weight, have) in query.items():
+                ids, tf_weight = seg.term(term, first, end)
+                if not len(ids):
+                    continue
+                id_parts.append(ids - first)
+                weight_parts.append(tf_weight * np.float32(weight * idf[term]))
+                if have:
+                    have_parts.append(id_parts[-1])
+            if not id_parts:
+                continue
+            scores = np.bincount(np.concatenate(id_parts), np.concatenate(weight_parts), minlength=end - first)
+            local = np.flatnonzero(scores)
+            if have_parts:
+                have_hits = np.bincount(np.concatenate(have_parts), minlength=end - first)[local]
+            else:
+                have_hits = np.zeros(len(local))
+            fit = have_hits / np.maximum(seg.doc_terms[first:end][local], 1)
+            total = scores[local] + FIT_WEIGHT * fit
+            top = np.argsort(-total)[:k] if len(local) <= k else np.argpartition(-total, k)[:k]
+            for i in top:
+                candidates.append((float(total[i]), float(fit[i]), seg, first + int(local[i])))
+
+        candidates.sort(key=lambda c: -c[0])
+        results = []
+        for score, fit, seg, doc in candidates[:k]:
+            row = seg.meta(doc)
+            row["score"] = round(score, 3)
+            row["skill_fit"] = round(fit, 2)
+            results.append(row)
+        return results
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_stamp = None
+
+
+def get_index():
+    """
+    Per-process JobIndex, reopened when the manifest changes (a new segment
+    was built). Returns None when no index has been built.
+    """
+    global _index, _index_stamp
+    index_dir = get_section("job_index").get("path", DEFAULT_INDEX_DIR)
+    path = os.path.join(index_dir, MANIFEST)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or _index_stamp != stamp or _index.dir != index_dir:
+            _index = JobIndex(index_dir)
+            _index_stamp = stamp
+        return _index
+
+
+def matching_jobs(analysis_result, k=10):
+    """Top-k indexed postings for an analysis, or [] when no index is available."""
+    index = get_index()
+    if index is None:
+        return []
+    have = [s["Skill"] for s in analysis_result.get("all_required_skills", []) if s.get("Status") == "Completed"]
+    missing = [s["skill"] for s in analysis_result.get("missing_skills", [])]
+    with metrics.timed("job_index.search"):
+        return index.search(have, missing, analysis_result.get("target_country"), k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="ingest new JSONL files")
+    b.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    b.add_argument("--rebuild", action="store_true", help="drop the index and ingest every input again")
+    b.add_argument("inputs", nargs="+", help="JSONL files or globs")
+    q = sub.add_parser("query")
+    q.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    q.add_argument("--have", nargs="*", default=[])
+    q.add_argument("--missing", nargs="*", default=[])
+    q.add_argument("--country")
+    q.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        inputs = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+        print(json.dumps(build(args.index, inputs, rebuild=args.rebuild)))
+    else:
+        index = JobIndex(args.index)
+        started = time.perf_counter()
+        results = index.search(args.have, args.missing, args.country, args.k)
+        for row in results:
+            print(json.dumps(row))
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
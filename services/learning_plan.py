@@ -0,0 +1,203 @@
+import functools
+import json
+import os
+import threading
+
+from utils import metrics
+from utils.config import get_section
+
+# Learning plan: a small set of resources that together cover a user's
+# missing skills, from a catalogue of resources tagged with the skills they
+# teach, a cost (USD) and a duration (hours).
+#
+# This is weighted set cover. A resource's weight is its cost plus its hours
+# at hour_value USD each, so a plan trades money against time. Resources
+# costing more than the budget are never picked.
+#   - Up to exact_max_skills coverable skills, a dynamic program over subsets
+#     of the missing skills finds the minimum-weight cover. Resources that
+#     cover the same subset are reduced to the lightest one first.
+#   - Above that, or when the exact cover costs more than the budget, the
+#     greedy rule repeatedly takes the resource with the lowest weight per
+#     newly covered skill that still fits the budget. Its weight is within
+#     H(k) = 1 + 1/2 + ... + 1/k of the optimum for k skills when the budget
+#     does not bind.
+# Skills no catalogue resource teaches, or that the budget cannot reach, are
+# reported as uncovered.
+#
+# Candidates come from a skill -> resources index, so a plan only looks at
+# the resources touching the missing skills, however large the catalogue.
+# Plans are cached per (missing-skill set, budget, catalogue version, policy).
+# [learning_plan] catalog points at a larger catalogue (.json with an "items"
+# list, or .jsonl with one item per line); it is reloaded when the file changes.
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "data", "learning_catalog.json")
+
+DEFAULT_POLICY = {
+    "catalog": DEFAULT_CATALOG,
+    "hour_value": 10,        # USD per hour of study
+    "exact_max_skills": 10,  # the exact solver visits up to 2^k subsets
+}
+
+# Keeps the number of resources down among otherwise equal (e.g. free) plans
+ITEM_WEIGHT = 0.01
+
+_lock = threading.Lock()
+_catalog = None
+_catalog_stamp = None
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("learning_plan").items() if k in policy})
+    return policy
+
+
+def normalize_skill(skill):
+    return str(skill).strip().lower()
+
+
+class Catalog:
+    def __init__(self, path):
+        self.path = path
+        if path.endswith(".jsonl"):
+            with open(path) as f:
+                self.items = [json.loads(line) for line in f if line.strip()]
+        else:
+            with open(path) as f:
+                self.items = json.load(f)["items"]
+        self.by_skill = {}
+        for i, item in enumerate(self.items):
+            for skill in item.get("skills", []):
+                self.by_skill.setdefault(normalize_skill(skill), []).append(i)
+
+
+def get_catalog():
+    """Per-process Catalog, reloaded when the file changes."""
+    global _catalog, _catalog_stamp
+    path = get_policy()["catalog"]
+    stamp = (path, os.stat(path).st_mtime_ns)
+    with _lock:
+        if _catalog is None or _catalog_stamp != stamp:
+            _catalog = Catalog(path)
+            _catalog_stamp = stamp
+        return _catalog
+
+
+def _exact(best, limit):
+    """Minimum-weight cover of `limit` (bitmask) from {mask: (weight, cost, item)}; None if impossible."""
+    full = limit
+    inf = float("inf")
+    weight = [inf] * (full + 1)
+    parent = [None] * (full + 1)
+    weight[0] = 0.0
+    choices = list(best.items())
+    # Every transition goes to a superset, i.e. a larger number
+    for mask in range(full + 1):
+        if weight[mask] == inf:
+            continue
+        for cover, (w, _, i) in choices:
+            target = mask | cover
+            if target != mask and weight[mask] + w < weight[target]:
+                weight[target] = weight[mask] + w
+                parent[target] = (mask, i)
+    if weight[full] == inf:
+        return None
+    chosen, mask = [], full
+    while mask:
+        mask, i = parent[mask]
+        chosen.append(i)
+    return chosen[::-1]
+
+
+def _greedy(best, limit, budget):
+    chosen, covered, spent = [], 0, 0.0
+    while covered != limit:
+        pick = None
+        for cover, (w, cost, i) in best.items():
+            gain = bin(cover & ~covered).count("1")
+            if not gain or (budget is not None and spent + cost > budget):
+                continue
+            ratio = w / gain
+            if pick is None or ratio < pick[0]:
+                pick = (ratio, cover, cost, i)
+        if pick is None:
+            break
+        _, cover, cost, i = pick
+        chosen.append(i)
+        covered |= cover
+        spent += cost
+    return chosen
+
+
+# Keyed by the catalogue object and the policy too, so a reloaded catalogue
+# or a changed setting gets fresh plans
+@functools.lru_cache(maxsize=1024)
+def _plan(catalog, skills, budget, hour_value, exact_max_skills):
+    bit = {skill: 1 << n for n, skill in enumerate(skills)}
+
+    # The lightest resource per distinct covered subset
+    best = {}
+    considered = set()
+    for skill in skills:
+        for i in catalog.by_skill.get(skill, ()):
+            if i in considered:
+                continue
+            considered.add(i)
+            item = catalog.items[i]
+            cost = float(item.get("cost_usd", 0))
+            if budget is not None and cost > budget:
+                continue
+            cover = 0
+            for s in item.get("skills", []):
+                cover |= bit.get(normalize_skill(s), 0)
+            w = cost + float(item.get("hours", 0)) * hour_value + ITEM_WEIGHT
+            if cover not in best or w < best[cover][0]:
+                best[cover] = (w, cost, i)
+
+    limit = 0
+    for cover in best:
+        limit |= cover
+    chosen, method = None, "greedy"
+    if bin(limit).count("1") <= exact_max_skills:
+        chosen = _exact(best, limit)
+        if chosen is not None and budget is not None and \
+                sum(float(catalog.items[i].get("cost_usd", 0)) for i in chosen) > budget:
+            chosen = None
+        method = "exact" if chosen is not None else method
+    if chosen is None:
+        chosen = _greedy(best, limit, budget)
+
+    plan_items, covered = [], set()
+    for i in chosen:
+        item = catalog.items[i]
+        covers = [s for s in item.get("skills", []) if normalize_skill(s) in bit and normalize_skill(s) not in covered]
+        covered.update(normalize_skill(s) for s in covers)
+        plan_items.append(dict(item, covers=covers))
+    return {
+        "items": plan_items,
+        "cost_usd": sum(float(item.get("cost_usd", 0)) for item in plan_items),
+        "hours": sum(float(item.get("hours", 0)) for item in plan_items),
+        "uncovered": [s for s in skills if s not in covered],
+        "method": method,
+        "considered": len(considered),
+    }
+
+
+def plan(missing_skills, budget=None):
+    """
+    Learning plan covering `missing_skills` (names as in the skill taxonomy)
+    within `budget` USD (None for no limit):
+    {"items": [catalogue item + "covers"], "cost_usd", "hours", "uncovered",
+     "method": "exact" | "greedy", "considered"}.
+    Plans are cached and shared: do not mutate them.
+    """
+    names = {normalize_skill(s): s for s in missing_skills}
+    skills = tuple(sorted(names))
+    budget = None if budget is None else float(budget)
+    hits = _plan.cache_info().hits
+    with metrics.timed("learning_plan.plan"):
+        policy = get_policy()
+        result = _plan(get_catalog(), skills, budget, float(policy["hour_value"]), int(policy["exact_max_skills"]))
+    metrics.incr("learning_plan.cache_hits" if _plan.cache_info().hits > hits else "learning_plan.cache_misses")
+    return dict(result, uncovered=[names[s] for s in result["uncovered"]])
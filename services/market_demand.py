@@ -0,0 +1,286 @@
+"""
+Market demand per role and country, from the dated job postings feed.
+
+Reads the same JSONL dumps as services/job_index.py (title, country and
+posted_at "YYYY-MM-DD" per line). Titles are mapped to the analyzer's roles
+(career_analyzer.detect_role) and countries to the names the app uses.
+
+The state is a daily counter per role x country, so ingesting a file only
+adds its postings to their days: history is never rescanned, and postings
+that arrive late still land on the day they were posted. After every ingest
+the windows are recomputed from the counters, relative to the newest posting
+date (as_of):
+
+    postings_30d    postings in the 30 days up to as_of
+    postings_90d    postings in the 90 days up to as_of
+    mom_change_pct  postings_30d against the 30 days before them (None when those had none)
+    score           0-100, log-scaled so the busiest role/country in the feed scores 100
+
+    <index>/manifest.json          roles, countries, first day, as_of, ingested files
+    <index>/counts-<build>.npy     int32   [roles, countries, days]
+    <index>/summary-<build>.npy    float32 [roles, countries, 4] (the four values above)
+
+A lookup is an index into the summary array. Like job_index, each run only
+ingests files it has not seen; changed files need --rebuild. The arrays of
+the previous build are kept until the next one.
+
+    python -m services.market_demand build --index data/market_demand dumps/*.jsonl
+    python -m services.market_demand query --index data/market_demand --role "DevOps Engineer" --country Germany
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from array import array
+
+import numpy as np
+
+from services.career_analyzer import detect_role, get_job_skills_database
+from services.salary_index import normalize_country
+from utils import metrics
+from utils.config import get_section
+
+DEFAULT_INDEX_DIR = "data/market_demand"
+MANIFEST = "manifest.json"
+
+WINDOW_DAYS = 30
+LONG_WINDOW_DAYS = 90
+SUMMARY_FIELDS = ("postings_30d", "postings_90d", "mom_change_pct", "score")
+EARLIEST = datetime.date(2000, 1, 1)
+
+
+def _load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def summarize(counts, as_of):
+    """The SUMMARY_FIELDS per role x country from daily counts, for windows ending on day `as_of`."""
+    cum = np.zeros(counts.shape[:2] + (counts.shape[2] + 1,), dtype=np.int64)
+    np.cumsum(counts, axis=2, out=cum[:, :, 1:])
+    window = lambda start, end: cum[:, :, min(max(end, 0), counts.shape[2])] - cum[:, :, min(max(start, 0), counts.shape[2])]
+    end = as_of + 1
+    recent = window(end - WINDOW_DAYS, end)
+    previous = window(end - 2 * WINDOW_DAYS, end - WINDOW_DAYS)
+    summary = np.zeros(counts.shape[:2] + (len(SUMMARY_FIELDS),), dtype=np.float32)
+    summary[:, :, 0] = recent
+    summary[:, :, 1] = window(end - LONG_WINDOW_DAYS, end)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary[:, :, 2] = np.where(previous > 0, (recent - previous) * 100.0 / previous, np.nan)
+    busiest = recent.max() if recent.size else 0
+    if busiest > 0:
+        summary[:, :, 3] = np.round(100 * np.log1p(recent) / np.log1p(busiest))
+    return summary
+
+
+def build(index_dir, inputs, rebuild=False):
+    """
+    Adds the postings of input files not ingested yet to the daily counters
+    and recomputes the windows. Returns a summary dict (files, rows, seconds).
+    """
+    started = time.time()
+    manifest = None if rebuild else _load_manifest(index_dir)
+    if rebuild and os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    counts = None
+    if manifest is None:
+        manifest = {"roles": list(get_job_skills_database().keys()), "countries": [], "first_day": None,
+                    "as_of": None, "files": {}, "rows": 0}
+    else:
+        if manifest["roles"] != list(get_job_skills_database().keys()):
+            raise SystemExit("The analyzer's roles changed since the counters were built: rerun with --rebuild.")
+        counts = np.load(os.path.join(index_dir, manifest["arrays"]["counts"]))
+
+    pending, changed = [], []
+    for path in inputs:
+        known = manifest["files"].get(os.path.abspath(path))
+        if known is None:
+            pending.append(path)
+        elif known["signature"] != _file_signature(path):
+            changed.append(path)
+    if changed:
+        # Their postings are already counted; adding them again would double count
+        raise SystemExit(f"Already ingested files changed ({', '.join(changed)}): rerun with --rebuild.")
+    if not pending:
+        return {"files": 0, "rows": 0, "seconds": 0.0}
+
+    role_ids = {r: i for i, r in enumerate(manifest["roles"])}
+    country_ids = {c: i for i, c in enumerate(manifest["countries"])}
+    role_of, day_of = {}, {}
+    # Dates outside this range are data errors and would only stretch the counters
+    first_valid, last_valid = EARLIEST.toordinal(), datetime.date.today().toordinal() + 1
+    roles, countries, days = array("i"), array("i"), array("i")
+    rows = 0
+    for path in pending:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    title, country, posted = row["title"], row["country"], row["posted_at"]
+                except (ValueError, KeyError, TypeError):
+                    metrics.incr("market_demand.bad_rows")
+                    continue
+                role = role_of.get(title)
+                if role is None:
+                    role = role_of[title] = role_ids[detect_role(str(title))]
+                day = day_of.get(posted)
+                if day is None:
+                    try:
+                        day = datetime.date.fromisoformat(str(posted)[:10]).toordinal()
+                    except ValueError:
+                        day = -1
+                    day = day_of[posted] = day if first_valid <= day <= last_valid else -1
+                country = normalize_country(country)
+                if day < 0 or not country:
+                    metrics.incr("market_demand.bad_rows")
+                    continue
+                if country not in country_ids:
+                    country_ids[country] = len(manifest["countries"])
+                    manifest["countries"].append(country)
+                roles.append(role)
+                countries.append(country_ids[country])
+                days.append(day)
+                rows += 1
+        manifest["files"][os.path.abspath(path)] = {"signature": _file_signature(path)}
+
+    # Grow the counters to the new countries and days, then add the new postings
+    n_roles, n_countries = len(manifest["roles"]), len(manifest["countries"])
+    new_days = np.frombuffer(days, dtype=np.int32)
+    first = manifest["first_day"]
+    old_days = counts.shape[2] if counts is not None else 0
+    bounds = [first, first + old_days] if first is not None else []
+    if rows:
+        bounds += [int(new_days.min()), int(new_days.max()) + 1]
+    lo, hi = (min(bounds), max(bounds)) if bounds else (0, 0)
+    grown = np.zeros((n_roles, n_countries, max(hi - lo, 0)), dtype=np.int32)
+    if counts is not None:
+        shift = first - lo
+        grown[:, :counts.shape[1], shift:shift + old_days] = counts
+    if rows:
+        flat = (np.frombuffer(roles, dtype=np.int32).astype(np.int64) * n_countries
+                + np.frombuffer(countries, dtype=np.int32)) * grown.shape[2] + (new_days - lo)
+        grown += np.bincount(flat, minlength=grown.size).astype(np.int32).reshape(grown.shape)
+    manifest["first_day"] = lo
+
+    # Windows end at the newest day with any posting
+    nonzero = np.flatnonzero(grown.sum(axis=(0, 1)))
+    as_of = int(nonzero[-1]) if len(nonzero) else 0
+    manifest["as_of"] = datetime.date.fromordinal(lo + as_of).isoformat() if len(nonzero) else None
+    manifest["rows"] += rows
+
+    # Unique even for two builds in the same second
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4)}"
+    arrays = {"counts": grown, "summary": summarize(grown, as_of)}
+    previous = manifest.get("arrays", {})
+    manifest["arrays"] = {}
+    for name, values in arrays.items():
+        manifest["arrays"][name] = f"{name}-{build_id}.npy"
+        np.save(os.path.join(index_dir, manifest["arrays"][name]), values)
+    tmp = os.path.join(index_dir, f"{MANIFEST}.{build_id}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(index_dir, MANIFEST))
+    # Keep the previous build too: a process that read the old manifest may
+    # not have opened its arrays yet. Anything older is no longer referenced.
+    keep = set(manifest["arrays"].values()) | set(previous.values())
+    for name in os.listdir(index_dir):
+        if name.endswith(".npy") and name not in keep:
+            os.remove(os.path.join(index_dir, name))
+    metrics.incr("market_demand.rows_ingested", rows)
+    return {"files": len(pending), "rows": rows, "as_of": manifest["as_of"], "seconds": round(time.time() - started, 2)}
+
+
+class DemandIndex:
+    def __init__(self, index_dir):
+        self.dir = index_dir
+        self.manifest = _load_manifest(index_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No market demand index in {index_dir}")
+        self.summary = np.load(os.path.join(index_dir, self.manifest["arrays"]["summary"]), mmap_mode="r")
+        self.role_ids = {r: i for i, r in enumerate(self.manifest["roles"])}
+        self.country_ids = {c: i for i, c in enumerate(self.manifest["countries"])}
+
+    def demand(self, role, country):
+        """The windows of a role and country, or None when it had no postings in the last 90 days."""
+        r = self.role_ids.get(role)
+        c = self.country_ids.get(normalize_country(country))
+        if r is None or c is None:
+            return None
+        postings_30d, postings_90d, mom, score = (float(v) for v in self.summary[r, c])
+        if not postings_90d:
+            return None
+        return {"score": int(score), "postings_30d": int(postings_30d), "postings_90d": int(postings_90d),
+                "mom_change_pct": None if np.isnan(mom) else round(mom, 1), "as_of": self.manifest["as_of"]}
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_stamp = None
+
+
+def get_index():
+    """
+    Per-process DemandIndex, reopened when the manifest changes (new files
+    were ingested). Returns None when nothing has been ingested.
+    """
+    global _index, _index_stamp
+    index_dir = get_section("market_demand").get("path", DEFAULT_INDEX_DIR)
+    path = os.path.join(index_dir, MANIFEST)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or _index_stamp != stamp or _index.dir != index_dir:
+            _index = DemandIndex(index_dir)
+            _index_stamp = stamp
+        return _index
+
+
+def market_demand(role, country):
+    """Demand windows for an analyzed role/country, or None without data."""
+    index = get_index()
+    if index is None:
+        return None
+    with metrics.timed("market_demand.lookup"):
+        return index.demand(role, country)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="ingest new JSONL files")
+    b.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    b.add_argument("--rebuild", action="store_true", help="drop the counters and ingest every input again")
+    b.add_argument("inputs", nargs="+", help="JSONL files or globs")
+    q = sub.add_parser("query")
+    q.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    q.add_argument("--role", required=True, help="a role or any job title")
+    q.add_argument("--country", required=True)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        inputs = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+        print(json.dumps(build(args.index, inputs, rebuild=args.rebuild)))
+    else:
+        index = DemandIndex(args.index)
+        role = args.role if args.role in index.role_ids else detect_role(args.role)
+        print(json.dumps(index.demand(role, args.country)))
+
+
+if __name__ == "__main__":
+    main()
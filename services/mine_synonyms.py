@@ -0,0 +1,339 @@
+"""
+Offline synonym / implied-skill mining from a corpus of extracted resume texts.
+
+Input is one or more JSONL files (optionally .gz) with the text under
+"resume_text" or "text" - e.g. the output of a batch run - or plain .txt files,
+one resume each. Two streaming passes are made over the corpus:
+
+  1. document frequencies of unigrams and bigrams, which fix the vocabulary;
+  2. chunk by chunk, a sparse doc x term matrix X and a doc x skill matrix A
+     (literal mentions of our skills) are built and multiplied into
+     skill x term co-occurrence counts A'X and term x context counts X'X[:, ctx].
+
+Memory is bounded by the vocabulary (--max-vocab) and the chunk size, not by
+the number of documents. For each skill two kinds of candidates are reported:
+
+  implies  resumes that mention the term usually mention the skill too
+           (P(skill | term) >= --min-confidence and lift >= --min-lift)
+  variant  the term appears in the same contexts as the skill (cosine of PPMI
+           context vectors >= --min-similarity) but next to it no more often
+           than chance (lift < --max-variant-lift), e.g. spellings or abbreviations
+
+The output is a review file. Mark entries "approved" (or "rejected") and run
+apply; approved terms are merged into the versioned data/skill_synonyms.json
+that career_analyzer loads at import. check_skill matches synonyms as plain
+substrings, so very short terms ("ml" also matches "html") need care.
+Applying changes taxonomy_version(), so services/rescore_profiles.py picks
+the stored analyses up afterwards.
+
+    python -m services.mine_synonyms mine --out synonym_candidates.json corpus/*.jsonl.gz
+    python -m services.mine_synonyms apply synonym_candidates.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from services.career_analyzer import SKILL_SYNONYMS, SYNONYMS_FILE, taxonomy_version
+from services.job_index import skill_vocabulary
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+# Sentence/list punctuation (a "." only when followed by whitespace, so "node.js" survives)
+FRAGMENT_RE = re.compile(r"[,;:|()\[\]\n\u2022]|\.(?=\s)")
+STOPWORDS = frozenset("""
+a an and are as at be been by for from has have in into is it its of on or our that the their this to was
+were will with within using used use work worked working experience years year team teams project projects
+including include various etc new strong good knowledge skills skill responsible ability
+""".split())
+MIN_TERM_LEN = 2
+# A bigram candidate must rank this much (relatively) above its best word
+BIGRAM_MARGIN = 0.2
+
+
+def iter_texts(paths):
+    """Yields resume texts from JSONL(.gz) and .txt inputs."""
+    for path in paths:
+        if path.endswith(".txt"):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield f.read()
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                text = row.get("resume_text") or row.get("text")
+                if text:
+                    yield text
+
+
+def doc_terms(text):
+    """Distinct unigrams and bigrams of a resume (punctuation and stopwords break bigrams)."""
+    terms = set()
+    for fragment in FRAGMENT_RE.split(text.lower()):
+        prev = None
+        for tok in TOKEN_RE.findall(fragment):
+            if tok in STOPWORDS or tok.isdigit():
+                prev = None
+                continue
+            if len(tok) >= MIN_TERM_LEN:
+                terms.add(tok)
+            if prev is not None:
+                terms.add(f"{prev} {tok}")
+            prev = tok
+    return terms
+
+
+class SkillMatcher:
+    """Literal (synonym-free) mentions of the canonical skills."""
+
+    def __init__(self, skills):
+        self.skills = [s.lower() for s in skills]
+        self.patterns = [re.compile(r"(?<![a-z0-9])" + re.escape(s) + r"(?![a-z0-9])") for s in self.skills]
+
+    def find(self, text):
+        text = re.sub(r"\s+", " ", text).lower()
+        return [i for i, p in enumerate(self.patterns) if p.search(text)]
+
+
+def count_document_frequencies(paths):
+    df = Counter()
+    docs = 0
+    for text in iter_texts(paths):
+        df.update(doc_terms(text))
+        docs += 1
+    return df, docs
+
+
+def build_vocabulary(df, docs, min_df, max_df_ratio, max_vocab):
+    eligible = [(t, n) for t, n in df.items() if n >= min_df and n <= max_df_ratio * docs]
+    eligible.sort(key=lambda kv: (-kv[1], kv[0]))
+    return [t for t, _ in eligible[:max_vocab]]
+
+
+def accumulate(paths, vocab, matcher, context_size, chunk_size):
+    """Second pass: sparse co-occurrence counts, one chunk of documents at a time."""
+    term_ids = {t: i for i, t in enumerate(vocab)}
+    n_terms, n_skills = len(vocab), len(matcher.skills)
+    # Context = the most frequent unigrams (vocab is sorted by df); bigrams
+    # would tie a context to one exact spelling of the skill
+    context = np.array([i for i, t in enumerate(vocab) if " " not in t][:context_size], dtype=np.int64)
+    skill_term = np.zeros((n_skills, n_terms))
+    term_ctx = np.zeros((n_terms, len(context)))
+    skill_ctx = np.zeros((n_skills, len(context)))
+    term_df = np.zeros(n_terms)
+    skill_df = np.zeros(n_skills)
+
+    def flush(rows, cols, skill_rows, skill_cols, n):
+        if not n:
+            return
+        X = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, n_terms))
+        A = sparse.csr_matrix((np.ones(len(skill_rows), dtype=np.float32), (skill_rows, skill_cols)),
+                              shape=(n, n_skills))
+        Xc = X[:, context]
+        skill_term[:] += (A.T @ X).toarray()
+        term_ctx[:] += (X.T @ Xc).toarray()
+        skill_ctx[:] += (A.T @ Xc).toarray()
+        term_df[:] += np.asarray(X.sum(axis=0)).ravel()
+        skill_df[:] += np.asarray(A.sum(axis=0)).ravel()
+
+    rows, cols, skill_rows, skill_cols, n = [], [], [], [], 0
+    for text in iter_texts(paths):
+        for t in doc_terms(text):
+            i = term_ids.get(t)
+            if i is not None:
+                rows.append(n)
+                cols.append(i)
+        for s in matcher.find(text):
+            skill_rows.append(n)
+            skill_cols.append(s)
+        n += 1
+        if n == chunk_size:
+            flush(rows, cols, skill_rows, skill_cols, n)
+            rows, cols, skill_rows, skill_cols, n = [], [], [], [], 0
+    flush(rows, cols, skill_rows, skill_cols, n)
+    return skill_term, term_ctx, skill_ctx, term_df, skill_df, context
+
+
+def _ppmi(counts, row_df, ctx_df, docs):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pmi = np.log(counts * docs / np.outer(np.maximum(row_df, 1), np.maximum(ctx_df, 1)))
+    return np.nan_to_num(np.maximum(pmi, 0), nan=0.0, posinf=0.0)
+
+
+def _normalize(m):
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+def score_candidates(vocab, skills, skill_term, term_ctx, skill_ctx, term_df, skill_df, context, docs, args):
+    ctx_df = term_df[context]
+    # A term always co-occurs with itself; drop those cells so a skill and its
+    # variant are compared on their shared neighbours only
+    term_ctx[context, np.arange(len(context))] = 0
+    ctx_pos = {vocab[t]: j for j, t in enumerate(context)}
+    for s, skill in enumerate(skills):
+        if skill in ctx_pos:
+            skill_ctx[s, ctx_pos[skill]] = 0
+    similarity = _normalize(_ppmi(skill_ctx, skill_df, ctx_df, docs)) @ _normalize(
+        _ppmi(term_ctx, term_df, ctx_df, docs)).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        confidence = np.nan_to_num(skill_term / term_df)
+        lift = np.nan_to_num(skill_term * docs / np.outer(np.maximum(skill_df, 1), np.maximum(term_df, 1)))
+
+    implies = ((skill_term >= args.min_support) & (confidence >= args.min_confidence) & (lift >= args.min_lift))
+    # Variants share the skill's contexts but rarely appear next to it (below chance)
+    variant = (similarity >= args.min_similarity) & (lift < args.max_variant_lift) & ~implies
+
+    term_ids = {t: i for i, t in enumerate(vocab)}
+    out = {}
+    for s, skill in enumerate(skills):
+        # Parts of the skill's own name ("learning" for "machine learning") are not candidates
+        excluded = {skill} | set(SKILL_SYNONYMS.get(skill, [])) | set(skill.split())
+        contains_skill = re.compile(r"(?<![a-z0-9])" + re.escape(skill) + r"(?![a-z0-9])")
+        found = []
+        for kind, mask, rank in (("implies", implies[s], confidence[s] * np.log1p(skill_term[s])),
+                                 ("variant", variant[s], similarity[s])):
+            taken = 0
+            # Unigrams first, so bigrams that only add a neighbouring word to an
+            # accepted term are dropped below
+            for t in sorted(np.flatnonzero(mask), key=lambda t: (" " in vocab[t], -rank[t])):
+                term = vocab[t]
+                if term in excluded or contains_skill.search(term):
+                    continue
+                if " " in term:
+                    parts = term.split()
+                    if excluded.intersection(parts):
+                        continue
+                    # A bigram must say markedly more than its words do on their own
+                    best_part = max(rank[term_ids[p]] if p in term_ids else 0 for p in parts)
+                    if rank[t] < best_part + BIGRAM_MARGIN * abs(best_part):
+                        continue
+                excluded.add(term)
+                found.append({
+                    "term": term,
+                    "kind": kind,
+                    "support": int(skill_term[s, t]),
+                    "term_docs": int(term_df[t]),
+                    "confidence": round(float(confidence[s, t]), 3),
+                    "lift": round(float(lift[s, t]), 2),
+                    "similarity": round(float(similarity[s, t]), 3),
+                    "status": "pending",
+                })
+                taken += 1
+                if taken == args.top:
+                    break
+        if found:
+            out[skill] = found
+    return out
+
+
+def run_mine(args):
+    started = time.time()
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    df, docs = count_document_frequencies(paths)
+    vocab = build_vocabulary(df, docs, args.min_df, args.max_df, args.max_vocab)
+    skills = [s.lower() for s in skill_vocabulary()]
+    matcher = SkillMatcher(skills)
+    counts = accumulate(paths, vocab, matcher, args.context, args.chunk_size)
+    candidates = score_candidates(vocab, skills, *counts, docs, args)
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "base_taxonomy_version": taxonomy_version(),
+        "corpus": {"inputs": paths, "documents": docs, "vocabulary": len(vocab)},
+        "params": {k: getattr(args, k) for k in ("min_df", "max_df", "max_vocab", "context", "min_support",
+                                                  "min_confidence", "min_lift", "min_similarity", "max_variant_lift",
+                                                  "top")},
+        "candidates": candidates,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    total = sum(len(v) for v in candidates.values())
+    print(f"{docs} documents, {len(vocab)} terms: {total} candidates for {len(candidates)} skills "
+          f"written to {args.out} in {time.time() - started:.1f}s")
+
+
+def load_synonym_file(path=SYNONYMS_FILE):
+    if not os.path.exists(path):
+        return {"version": 0, "synonyms": {}, "history": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_apply(args):
+    with open(args.candidates) as f:
+        report = json.load(f)
+    current = load_synonym_file(args.synonyms)
+    synonyms = {k: list(v) for k, v in current["synonyms"].items()}
+    added = {}
+    for skill, entries in report["candidates"].items():
+        for entry in entries:
+            if entry.get("status") != "approved":
+                continue
+            if entry["term"] in synonyms.get(skill, []) or entry["term"] in SKILL_SYNONYMS.get(skill, []):
+                continue
+            synonyms.setdefault(skill, []).append(entry["term"])
+            added.setdefault(skill, []).append(entry["term"])
+    if not added:
+        print("No approved candidates to apply.")
+        return
+
+    version = current["version"] + 1
+    updated = {
+        "version": version,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "synonyms": {k: sorted(v) for k, v in sorted(synonyms.items())},
+        "history": current.get("history", []) + [{
+            "version": version, "added": added, "source": os.path.basename(args.candidates),
+            "corpus_documents": report.get("corpus", {}).get("documents"),
+        }],
+    }
+    os.makedirs(os.path.dirname(args.synonyms) or ".", exist_ok=True)
+    tmp = args.synonyms + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(updated, f, indent=2)
+    os.replace(tmp, args.synonyms)
+    for skill, terms in added.items():
+        print(f"{skill}: + {', '.join(terms)}")
+    print(f"{args.synonyms} is now version {version}. Restart the app, then run services.rescore_profiles.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    m = sub.add_parser("mine", help="write a candidate review file")
+    m.add_argument("inputs", nargs="+", help="JSONL(.gz) / .txt files or globs")
+    m.add_argument("--out", default="synonym_candidates.json")
+    m.add_argument("--min-df", type=int, default=5, help="minimum documents per term")
+    m.add_argument("--max-df", type=float, default=0.5, help="drop terms in more than this share of documents")
+    m.add_argument("--max-vocab", type=int, default=30000)
+    m.add_argument("--context", type=int, default=300, help="context terms for the similarity vectors")
+    m.add_argument("--chunk-size", type=int, default=5000, help="documents per sparse chunk")
+    m.add_argument("--min-support", type=int, default=5)
+    m.add_argument("--min-confidence", type=float, default=0.7)
+    m.add_argument("--min-lift", type=float, default=1.5)
+    m.add_argument("--min-similarity", type=float, default=0.6)
+    m.add_argument("--max-variant-lift", type=float, default=0.3)
+    m.add_argument("--top", type=int, default=10, help="candidates per skill and kind")
+    a = sub.add_parser("apply", help="merge approved candidates into the synonym file")
+    a.add_argument("candidates")
+    a.add_argument("--synonyms", default=SYNONYMS_FILE)
+    args = parser.parse_args()
+    if args.command == "mine":
+        run_mine(args)
+    else:
+        run_apply(args)
+
+
+if __name__ == "__main__":
+    main()
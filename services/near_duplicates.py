@@ -0,0 +1,225 @@
+import copy
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from services import career_analyzer, salary_index
+from services.resource_governor import describe_outcome, read_upload, resolve_budget
+from utils import metrics
+from utils.config import get_section
+
+# Near-duplicate resumes: the same CV uploaded again, or with trivial edits
+# (a date, a typo, one more bullet), reuses the analysis of the first one.
+#
+# Every analyzed text gets a 64-bit SimHash over word 3-shingles of its
+# cleaned text (career_analyzer.clean_resume_text). Texts that differ in a
+# few shingles differ in a few bits (trivial edits of one-page CVs: mostly 2-4,
+# rarely up to 9), unrelated texts in 15 or more, typically around 25. The index
+# splits the hash into max_distance + 1 bands: two hashes within
+# max_distance bits agree on at least one band (pigeonhole), so a lookup
+# only compares the entries sharing a band value. Entries are grouped by
+# role, country, seniority and taxonomy version, which the skill match
+# depends on besides the text. Salary, demand, companies and the roadmap's
+# quarter change with the salary and demand rebuilds and the calendar, so
+# they are never reused: every reuse recomputes them
+# (career_analyzer.market_fields), which costs a few index lookups.
+#
+#   same text (fingerprint)        skills and score are reused ("exact")
+#   within max_distance bits       skills and score are matched again on the
+#                                  new text ("adjusted")
+#   same upload bytes              the extracted text is reused too, so the
+#                                  PDF is not parsed again ("file": true; reuse
+#                                  is "text" when the analysis itself was new)
+#
+# Reused results carry near_duplicate = {of, distance, reuse, file}. The
+# index is per process and bounded (max_entries analyses, max_files texts).
+
+DEFAULT_POLICY = {
+    "enabled": True,
+    "max_distance": 6,
+    "max_entries": 2000,
+    "max_files": 500,
+}
+
+SHINGLE = 3
+_TOKEN = re.compile(r"[a-z0-9+#./-]+")
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("near_duplicates").items() if k in policy})
+    return policy
+
+
+def simhash(resume_text_clean):
+    """64-bit SimHash of cleaned resume text over word 3-shingles."""
+    tokens = _TOKEN.findall(resume_text_clean)
+    shingles = [" ".join(tokens[i:i + SHINGLE]) for i in range(max(len(tokens) - SHINGLE + 1, 1))]
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+                          for s in shingles), dtype=np.uint64, count=len(shingles))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance=6, max_entries=2000, max_files=500):
+        self.max_distance = int(max_distance)
+        self.max_entries = int(max_entries)
+        self.max_files = int(max_files)
+        bands = self.max_distance + 1
+        width = 64 // bands
+        self.bands = [(i * width, 64 if i == bands - 1 else (i + 1) * width) for i in range(bands)]
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # id -> (key, simhash, fingerprint, result), oldest first
+        self.buckets = {}  # (key, band, band value) -> [entry id]
+        self.files = OrderedDict()  # upload digest -> (text, extraction report)
+        self.next_id = 0
+
+    def _band_keys(self, key, value):
+        for n, (lo, hi) in enumerate(self.bands):
+            yield key, n, (value >> lo) & ((1 << (hi - lo)) - 1)
+
+    def nearest(self, key, value, fingerprint=None):
+        """
+        The closest entry within max_distance as (fingerprint, result, distance),
+        or None. An entry with the same fingerprint wins over other ones at distance 0.
+        """
+        with self.lock:
+            best = None
+            seen = set()
+            for band_key in self._band_keys(key, value):
+                for entry_id in self.buckets.get(band_key, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    _, other, other_fingerprint, result = self.entries[entry_id]
+                    if other_fingerprint == fingerprint:
+                        return other_fingerprint, result, 0
+                    distance = hamming(value, other)
+                    if distance <= self.max_distance and (best is None or distance < best[2]):
+                        best = (other_fingerprint, result, distance)
+            return best
+
+    def add(self, key, value, fingerprint, result):
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = (key, value, fingerprint, result)
+            for band_key in self._band_keys(key, value):
+                self.buckets.setdefault(band_key, []).append(entry_id)
+            while len(self.entries) > self.max_entries:
+                old_id, (old_key, old_value, _, _) = self.entries.popitem(last=False)
+                for band_key in self._band_keys(old_key, old_value):
+                    bucket = self.buckets[band_key]
+                    bucket.remove(old_id)
+                    if not bucket:
+                        del self.buckets[band_key]
+
+    def file_text(self, digest):
+        with self.lock:
+            cached = self.files.get(digest)
+            if cached is not None:
+                self.files.move_to_end(digest)
+            return cached
+
+    def add_file(self, digest, text, extraction):
+        with self.lock:
+            self.files[digest] = (text, extraction)
+            self.files.move_to_end(digest)
+            while len(self.files) > self.max_files:
+                self.files.popitem(last=False)
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """Per-process index, or None when [near_duplicates] enabled is false."""
+    global _index
+    policy = get_policy()
+    if not policy["enabled"]:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(policy["max_distance"], policy["max_entries"], policy["max_files"])
+        return _index
+
+
+def analyze_text(job_title, resume_text, country, extraction=None, index=None):
+    """career_analyzer.analyze_text, reusing the analysis of a near-duplicate text."""
+    index = index or get_index()
+    if index is None or not resume_text or not resume_text.strip():
+        return career_analyzer.analyze_text(job_title, resume_text, country, extraction)
+
+    clean = career_analyzer.clean_resume_text(resume_text)
+    fingerprint = career_analyzer.input_fingerprint(clean)
+    value = simhash(clean)
+    key = (career_analyzer.detect_role(job_title), country, salary_index.seniority_from_text(job_title),
+           career_analyzer.taxonomy_version())
+    match = index.nearest(key, value, fingerprint)
+    if match is None:
+        metrics.incr("near_duplicates.misses")
+        result = career_analyzer.analyze_text(job_title, resume_text, country, extraction)
+        if result.get("success"):
+            index.add(key, value, fingerprint, result)
+        return copy.deepcopy(result)
+
+    prior_fingerprint, prior, distance = match
+    if prior_fingerprint == fingerprint:
+        reuse = "exact"
+        result = career_analyzer.refresh(copy.deepcopy(prior), job_title, extraction)
+    else:
+        reuse = "adjusted"
+        result = career_analyzer.rematch(copy.deepcopy(prior), job_title, resume_text, extraction)
+        index.add(key, value, fingerprint, result)
+        result = copy.deepcopy(result)
+    metrics.incr(f"near_duplicates.{reuse}")
+    result["near_duplicate"] = {"of": prior_fingerprint, "distance": distance, "reuse": reuse, "file": False}
+    return result
+
+
+def analyze(job_title, resume_file, country, budget=None, keep_text=False, index=None):
+    """
+    career_analyzer.analyze_profile with near-duplicate reuse. An upload with
+    the same bytes as a recent one is not extracted again.
+    """
+    index = index or get_index()
+    if index is None:
+        return career_analyzer.analyze_profile(job_title, resume_file, country, budget=budget, keep_text=keep_text)
+
+    # Read within the upload budget; a larger file goes through the extractor, which rejects it
+    data = read_upload(resume_file, resolve_budget(budget)["max_bytes"])
+    resume_file.seek(0)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest() if data is not None else None
+    cached = index.file_text(digest) if digest else None
+    if cached is not None:
+        metrics.incr("near_duplicates.files")
+        resume_text, extraction = cached
+        extraction = dict(extraction, elapsed=0.0)
+    else:
+        resume_text, extraction = career_analyzer.extract_text_with_budget(
+            io.BytesIO(data) if data is not None else resume_file, budget)
+        resume_text = career_analyzer.normalize_resume_text(resume_text)
+        if resume_text and digest:
+            index.add_file(digest, resume_text, dict(extraction))
+    if not resume_text:
+        reason = describe_outcome(extraction) or "Could not extract text from resume."
+        return {"error": f"{reason} Please ensure it is a valid PDF.", "extraction": extraction}
+
+    result = analyze_text(job_title, resume_text, country, extraction, index=index)
+    if cached is not None and result.get("success"):
+        result.setdefault("near_duplicate", {"of": result["input_fingerprint"], "distance": 0, "reuse": "text"})
+        result["near_duplicate"]["file"] = True
+    if keep_text and result.get("success"):
+        result["resume_text"] = resume_text
+    return result
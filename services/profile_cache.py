@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import metrics
+from utils.config import get_section
+
+# Read-through cache for the user reads done at login and on reconnect.
+#
+# Two kinds of entries, both keyed by user_id and shared by every session of
+# the process:
+#   login   - password hash and latest_sk, as read by verify_user
+#   profile - the decoded latest analysis, as read by load_profile/hydrate_user
+# Entries expire after ttl_seconds and the least recently used ones are
+# evicted beyond max_entries. Profiles can also go to a host-wide tier
+# (host_dir, e.g. on /dev/shm) shared by all server processes on the machine,
+# stored as JSON so a file planted there is never more than data; password
+# hashes never leave the process.
+#
+# Every entry carries a version: the user's latest_sk, which is time ordered.
+# A put never replaces a newer version, so a read that started before a
+# save_profile (here or in another process on the host) cannot overwrite what
+# the save wrote. Writes made on other hosts become visible after at most
+# ttl_seconds.
+#
+# Cached profiles are shared between sessions: callers must not mutate them,
+# and deep-copy a profile before keeping it in session state.
+
+DEFAULT_POLICY = {
+    "ttl_seconds": 60,
+    "max_entries": 2048,
+    "host_dir": "",
+}
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (kind, user_id) -> (version, expires_at, value)
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("profile_cache").items() if k in policy})
+    return policy
+
+
+def _get_local(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return entry
+
+
+def _put_local(key, version, value, policy):
+    with _lock:
+        current = _entries.get(key)
+        if current is not None and current[0] > version and current[1] >= time.time():
+            metrics.incr("profile_cache.stale_puts")
+            return
+        _entries[key] = (version, time.time() + float(policy["ttl_seconds"]), value)
+        _entries.move_to_end(key)
+        while len(_entries) > int(policy["max_entries"]):
+            _entries.popitem(last=False)
+            metrics.incr("profile_cache.evictions")
+
+
+def _host_path(host_dir, user_id):
+    return os.path.join(host_dir, hashlib.sha1(user_id.encode()).hexdigest() + ".json")
+
+
+def _read_host(path):
+    try:
+        with open(path) as f:
+            version, expires_at, value = json.load(f)
+    except (OSError, ValueError, TypeError):
+        return None
+    return version, expires_at, value
+
+
+def _get_host(user_id, policy):
+    entry = _read_host(_host_path(policy["host_dir"], user_id))
+    if entry is None or entry[1] < time.time():
+        return None
+    return entry
+
+
+def _put_host(user_id, entry, policy):
+    import fcntl
+    path = _host_path(policy["host_dir"], user_id)
+    try:
+        os.makedirs(policy["host_dir"], mode=0o700, exist_ok=True)
+        # The lock file serializes the version check and the replace across processes
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = _read_host(path)
+            if current is not None and current[0] > entry[0] and current[1] >= time.time():
+                metrics.incr("profile_cache.stale_puts")
+                return
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write the host profile cache: {e}")
+
+
+def get_login(user_id):
+    """Returns (password_hash, latest_sk) or None."""
+    entry = _get_local(("login", user_id))
+    metrics.incr("profile_cache.hits" if entry else "profile_cache.misses")
+    return entry[2] if entry else None
+
+
+def put_login(user_id, password_hash, latest_sk):
+    _put_local(("login", user_id), latest_sk or "", (password_hash, latest_sk), get_policy())
+
+
+def get_profile(user_id, version=None):
+    """
+    Returns (version, profile) or None. With `version` only an entry of exactly
+    that version is returned.
+    """
+    policy = get_policy()
+    entry = _get_local(("profile", user_id))
+    tier = "local"
+    if entry is None and policy["host_dir"]:
+        entry = _get_host(user_id, policy)
+        tier = "host"
+        if entry is not None:
+            _put_local(("profile", user_id), entry[0], entry[2], policy)
+    if entry is None or (version is not None and entry[0] != version):
+        metrics.incr("profile_cache.misses")
+        return None
+    metrics.incr("profile_cache.hits")
+    metrics.incr(f"profile_cache.hits.{tier}")
+    return entry[0], entry[2]
+
+
+def put_profile(user_id, version, profile):
+    """Caches a decoded profile unless a newer version is already cached."""
+    policy = get_policy()
+    version = version or ""
+    _put_local(("profile", user_id), version, profile, policy)
+    if policy["host_dir"]:
+        _put_host(user_id, (version, time.time() + float(policy["ttl_seconds"]), profile), policy)
+
+
+def saved(user_id, latest_sk, profile):
+    """Called after save_profile: the new analysis becomes the cached one."""
+    with _lock:
+        login = _entries.get(("login", user_id))
+    if login is not None:
+        put_login(user_id, login[2][0], latest_sk)
+    put_profile(user_id, latest_sk, profile)
+
+
+def invalidate(user_id):
+    """Drops every cached entry of the user (e.g. when the account is deleted)."""
+    with _lock:
+        _entries.pop(("login", user_id), None)
+        _entries.pop(("profile", user_id), None)
+    host_dir = get_policy()["host_dir"]
+    if host_dir:
+        try:
+            os.remove(_host_path(host_dir, user_id))
+        except OSError:
+            pass
+
+
+def reads_saved(count=1):
+    """Records DynamoDB item reads a cache hit made unnecessary."""
+    metrics.incr("profile_cache.reads_saved", count)
+
+
+def stats():
+    hits = metrics.get_counter("profile_cache.hits")
+    misses = metrics.get_counter("profile_cache.misses")
+    with _lock:
+        size = len(_entries)
+    return {
+        "entries": size,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "reads_saved": metrics.get_counter("profile_cache.reads_saved"),
+    }
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+
+from utils import metrics
+from utils.config import get_section
+
+# Region routing for DynamoDB.
+#
+# [aws] regions lists the regions holding the app's tables (default: just
+# [aws] region_name, the region this server runs in). Every user has a
+# deterministic home region, chosen by rendezvous hashing of the user id over
+# that list, so adding a region only moves the users it wins.
+#
+# Writes for a user always go to the home region: one writer per user keeps
+# conditional writes (e.g. account creation) correct. With replicated tables
+# ([aws] replicated, default true - DynamoDB global tables) reads go to the
+# nearest replica first: the local region when it holds a replica, otherwise
+# the one with the lowest observed latency. When a replica fails or does not
+# have the item yet (replication lags the home region), the read falls back
+# to the home region and then to the rest. With replicated = false every
+# region holds only its own users, so reads go straight home.
+#
+# [aws.endpoints] maps a region to an endpoint URL, which lets several local
+# stand-ins (DynamoDB Local, moto) play the regions during development.
+# Request latency is tracked per region as region.<name>.
+
+EWMA_ALPHA = 0.2
+
+_lock = threading.Lock()
+_latency = {}  # region -> exponentially weighted mean latency (seconds)
+
+
+def local_region():
+    return get_section("aws").get("region_name")
+
+
+def regions():
+    aws = get_section("aws")
+    return list(aws.get("regions") or [aws.get("region_name")])
+
+
+def replicated():
+    return bool(get_section("aws").get("replicated", True))
+
+
+def endpoint_for(region):
+    """Endpoint URL override for a region, or None for the AWS default."""
+    return dict(get_section("aws").get("endpoints", {})).get(region)
+
+
+def home_region(key):
+    """The region owning `key` (a user id); stable as long as the region list is."""
+    return max(regions(), key=lambda r: hashlib.sha1(f"{r}:{key}".encode()).digest())
+
+
+def _by_latency(candidates):
+    # Unmeasured regions sort first so each one gets measured once
+    with _lock:
+        return sorted(candidates, key=lambda r: _latency.get(r, 0.0))
+
+
+def nearest_region():
+    all_regions = regions()
+    local = local_region()
+    if local in all_regions:
+        return local
+    return _by_latency(all_regions)[0]
+
+
+def read_order(key):
+    """Regions to read `key` from, in order of preference."""
+    home = home_region(key)
+    all_regions = regions()
+    if len(all_regions) == 1 or not replicated():
+        return [home]
+    nearest = nearest_region()
+    order = [nearest] if nearest == home else [nearest, home]
+    return order + [r for r in _by_latency(all_regions) if r not in order]
+
+
+def observe(region, seconds):
+    """Records the latency of one request to `region`."""
+    metrics.observe(f"region.{region}", seconds)
+    with _lock:
+        previous = _latency.get(region)
+        _latency[region] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+
+
+def region_table(snapshot):
+    """Per-region request latency, fallbacks and role, as flat rows."""
+    local = local_region()
+    with _lock:
+        ewma = dict(_latency)
+    rows = []
+    for region in regions():
+        stat = snapshot["timings"].get(f"region.{region}")
+        rows.append({
+            "region": region,
+            "local": region == local,
+            "requests": stat["count"] if stat else 0,
+            "p50_ms": round(stat["p50"] * 1000, 1) if stat else None,
+            "p90_ms": round(stat["p90"] * 1000, 1) if stat else None,
+            "ewma_ms": round(ewma[region] * 1000, 1) if region in ewma else None,
+            "fallbacks": snapshot["counters"].get(f"region.fallbacks.{region}", 0),
+            "replica_misses": snapshot["counters"].get(f"region.replica_misses.{region}", 0),
+        })
+    return rows
@@ -0,0 +1,277 @@
+"""
+Background re-analysis of stored profiles after the skill taxonomy changes.
+
+Every analysis records the taxonomy_version it was scored with (see
+career_analyzer.taxonomy_version). This job scans the user table with a
+parallel scan, loads each user's latest analysis together with the
+resume text it was made from (the stored text it references by text_hash, or
+the compressed copy older analyses carry inline), and re-scores it with the
+current taxonomy. No PDF is needed. Analyses saved before the text was stored are
+reported as "no_text" and left alone.
+
+Writes draw from a token bucket (--wcu per second), reads from another
+(--rcu). Every request goes through db_handler._call, so throttled and
+transient failures are retried with backoff instead of stopping a segment. Progress is checkpointed per segment, so an interrupted run
+continues with --resume. Segments can be split across machines with
+--only-segments while keeping the same --segments total.
+
+    python -m services.rescore_profiles --dry-run
+    python -m services.rescore_profiles --segments 8 --wcu 2 --resume
+    python -m services.rescore_profiles --segments 8 --only-segments 0-3
+"""
+import argparse
+import json
+import threading
+import time
+
+from services.career_analyzer import analyze_text, taxonomy_version
+from services.db_handler import blob_key, decompress_text, to_plain
+from services.region_router import home_region, local_region
+from utils import metrics
+from utils.checkpoint import SegmentCheckpoint
+from utils.rate_limit import TokenBucket
+
+# Fields recomputed from the text; everything else (e.g. hiring_companies) is kept
+RESCORED_FIELDS = ("match_score", "missing_skills", "all_required_skills", "target_role_detected",
+                   "salary_range", "salary_band", "implied_skills", "roadmap", "taxonomy_version")
+
+SAMPLE_CHANGES = 20
+
+
+def rescore(old, resume_text):
+    """Returns a copy of `old` with the taxonomy-dependent fields recomputed."""
+    fresh = analyze_text(old.get("job_title", ""), resume_text, old.get("target_country", ""))
+    if not fresh.get("success"):
+        return None
+    new = dict(old)
+    for field in RESCORED_FIELDS:
+        new[field] = fresh[field]
+    return new
+
+
+def _missing_set(result):
+    return {s["skill"] for s in result.get("missing_skills", [])}
+
+
+def _parse_segments(spec, total):
+    if not spec:
+        return list(range(total))
+    out = []
+    for part in spec.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            out.extend(range(int(lo), int(hi) + 1))
+        else:
+            out.append(int(part))
+    return [i for i in out if 0 <= i < total]
+
+
+class Report:
+    """Aggregated dry-run / run report shared by the segment threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.score_deltas = {}
+        self.samples = []
+
+    def record(self, user_id, old, new):
+        delta = new["match_score"] - old.get("match_score", 0)
+        with self.lock:
+            self.score_deltas[delta] = self.score_deltas.get(delta, 0) + 1
+            if len(self.samples) < SAMPLE_CHANGES:
+                self.samples.append({
+                    "user_id": user_id,
+                    "old_score": old.get("match_score"),
+                    "new_score": new["match_score"],
+                    "newly_matched": sorted(_missing_set(old) - _missing_set(new)),
+                    "newly_missing": sorted(_missing_set(new) - _missing_set(old)),
+                })
+
+
+def _process_segment(index, args, current, buckets, state, report, errors):
+    from services.db_handler import (_call, new_db_resource, profile_table_name, history_table_name,
+                                     resume_text_table_name, score_stats_table_name, update_score_histogram)
+    dynamodb = new_db_resource(region=args.region)  # one resource per thread
+    users = dynamodb.Table(profile_table_name())
+    history = dynamodb.Table(history_table_name())
+    texts = dynamodb.Table(resume_text_table_name())
+    stats = dynamodb.Table(score_stats_table_name())
+    region = args.region or local_region()
+    rcu, wcu = buckets
+    seg = state.segment(index)
+    cursor = seg["cursor"]
+
+    try:
+        while not seg["done"]:
+            rcu.acquire(1)
+            kwargs = {
+                "Segment": index,
+                "TotalSegments": args.segments,
+                "Limit": args.page_size,
+                "ProjectionExpression": "user_id, latest_sk",
+                "ReturnConsumedCapacity": "TOTAL",
+            }
+            if cursor:
+                kwargs["ExclusiveStartKey"] = cursor
+            page = _call("Scan", users.scan, region=region, **kwargs)
+            rcu.charge(max(float(page.get("ConsumedCapacity", {}).get("CapacityUnits", 1)) - 1, 0))
+
+            counts = {"current": 0, "no_text": 0, "unchanged": 0, "changed": 0, "written": 0, "failed": 0,
+                      "skipped": 0}
+            for user in page.get("Items", []):
+                if not user.get("latest_sk"):
+                    counts["no_text"] += 1  # legacy inline profile, never had text stored
+                    continue
+                key = {"user_id": user["user_id"], "sk": user["latest_sk"]}
+                rcu.acquire(1)
+                response = _call(
+                    "GetItem", history.get_item, region=region, Key=key, ProjectionExpression="#d, resume_text_z, text_hash",
+                    ExpressionAttributeNames={"#d": "data"}, ReturnConsumedCapacity="TOTAL"
+                )
+                rcu.charge(max(float(response.get("ConsumedCapacity", {}).get("CapacityUnits", 1)) - 1, 0))
+                item = response.get("Item")
+                if not item:
+                    continue
+                old = json.loads(item.get("data") or "{}")
+                if old.get("taxonomy_version") == current:
+                    counts["current"] += 1
+                    continue
+                blob = item.get("resume_text_z")
+                if blob is None and item.get("text_hash"):
+                    rcu.acquire(1)
+                    text_item = _call("GetItem", texts.get_item, region=region,
+                                      Key=blob_key(item["text_hash"], home_region(user["user_id"])),
+                                      ProjectionExpression="text_z").get("Item")
+                    blob = text_item and text_item["text_z"]
+                if blob is None:
+                    counts["no_text"] += 1  # never stored, or released by the retention limits
+                    continue
+
+                new = rescore(old, decompress_text(blob))
+                if new is None:
+                    counts["failed"] += 1
+                    continue
+                changed = (new["match_score"] != old.get("match_score")
+                           or _missing_set(new) != _missing_set(old))
+                if changed:
+                    counts["changed"] += 1
+                    report.record(user["user_id"], old, new)
+                else:
+                    counts["unchanged"] += 1
+                if args.dry_run:
+                    continue
+
+                # Also stamp unchanged analyses with the new version so they are not revisited
+                wcu.acquire(1)
+                try:
+                    response = _call(
+                        "UpdateItem", history.update_item, region=region, Key=key,
+                        UpdateExpression="set #d = :d, match_score = :m, target_role_detected = :r, rescored_at = :t",
+                        # A deleted account must not get its analysis back
+                        ConditionExpression="attribute_exists(sk)",
+                        ExpressionAttributeNames={"#d": "data"},
+                        ExpressionAttributeValues={":d": json.dumps(new), ":m": new["match_score"],
+                                                   ":r": new["target_role_detected"], ":t": int(time.time())},
+                        ReturnConsumedCapacity="TOTAL"
+                    )
+                except history.meta.client.exceptions.ConditionalCheckFailedException:
+                    counts["skipped"] += 1
+                    continue
+                wcu.charge(max(float(response.get("ConsumedCapacity", {}).get("CapacityUnits", 1)) - 1, 0))
+                moved = new["target_role_detected"] != old.get("target_role_detected")
+                if changed or moved:
+                    # Keep the user's summary in sync unless a newer analysis landed meanwhile
+                    wcu.acquire(1)
+                    try:
+                        _call(
+                            "UpdateItem", users.update_item, region=region, Key={"user_id": user["user_id"]},
+                            UpdateExpression="set latest_summary.match_score = :m, "
+                                             "latest_summary.target_role_detected = :r",
+                            ConditionExpression="latest_sk = :sk",
+                            ExpressionAttributeValues={":m": new["match_score"], ":r": new["target_role_detected"],
+                                                       ":sk": user["latest_sk"]}
+                        )
+                        # A re-detected role moves the user to that role's histogram
+                        fields = ("match_score", "target_role_detected", "target_country")
+                        wcu.acquire(2 if moved else 1)
+                        update_score_histogram(stats, region, {f: old.get(f) for f in fields},
+                                               {f: new.get(f) for f in fields})
+                    except users.meta.client.exceptions.ConditionalCheckFailedException:
+                        pass
+                counts["written"] += 1
+
+            cursor = to_plain(page.get("LastEvaluatedKey"))
+            state.advance(index, cursor, len(page.get("Items", [])), **counts)
+            for name, value in counts.items():
+                metrics.incr(f"rescore.{name}", value)
+    except Exception as e:
+        errors.append((index, e))
+
+
+def run_rescore(args):
+    current = taxonomy_version()
+    if not args.checkpoint:
+        args.checkpoint = "rescore_dryrun_state.json" if args.dry_run else "rescore_state.json"
+    config = {"segments": args.segments, "taxonomy_version": current, "dry_run": args.dry_run}
+    state = SegmentCheckpoint(args.checkpoint, config)
+    if args.resume and state.exists():
+        previous = state.load()
+        if previous["taxonomy_version"] != current:
+            raise SystemExit("The taxonomy changed since this checkpoint was written; start a new run.")
+        args.segments = previous["segments"]
+    elif state.exists():
+        raise SystemExit(f"{args.checkpoint} exists: pass --resume or choose another --checkpoint.")
+
+    buckets = (TokenBucket(args.rcu, max(args.rcu, 1.0)), TokenBucket(args.wcu, max(args.wcu, 1.0)))
+    report = Report()
+    errors = []
+    started = time.time()
+    threads = [
+        threading.Thread(target=_process_segment,
+                         args=(i, args, current, buckets, state, report, errors), daemon=True)
+        for i in _parse_segments(args.only_segments, args.segments) if not state.segment(i)["done"]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    totals = state.totals()
+    summary = {
+        "taxonomy_version": current,
+        "dry_run": args.dry_run,
+        "users_scanned": totals.get("rows", 0),
+        "already_current": totals.get("current", 0),
+        "no_stored_text": totals.get("no_text", 0),
+        "scores_changed": totals.get("changed", 0),
+        "unchanged": totals.get("unchanged", 0),
+        "written": totals.get("written", 0),
+        "failed": totals.get("failed", 0),
+        "skipped_deleted": totals.get("skipped", 0),
+        "score_delta_histogram": dict(sorted(report.score_deltas.items())),
+        "sample_changes": report.samples,
+        "elapsed_seconds": round(time.time() - started, 1),
+        "errors": [f"segment {i}: {e}" for i, e in errors],
+    }
+    print(json.dumps(summary, indent=2))
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only report how many scores would change")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--only-segments", help="e.g. 0-3 or 4,5 to split a run across workers")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rcu", type=float, default=2.0, help="read capacity units per second")
+    parser.add_argument("--wcu", type=float, default=2.0, help="write capacity units per second")
+    parser.add_argument("--checkpoint", help="state file (default rescore_state.json / rescore_dryrun_state.json)")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--region", help="region to run against (default: [aws] region_name); "
+                        "run once per region when [aws] replicated is false")
+    args = parser.parse_args()
+    raise SystemExit(0 if run_rescore(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
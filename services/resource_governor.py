@@ -0,0 +1,299 @@
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from utils import metrics
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Per-analysis budgets. Override any of these through the [analysis_budget]
+# section of secrets.toml (see views/home.py).
+DEFAULT_BUDGET = {
+    "max_bytes": 10 * 1024 * 1024,   # Uploads larger than this are rejected unread
+    "max_pages": 30,                 # Extra pages are ignored (partial result)
+    "max_seconds": 20,               # Wall-clock budget for text extraction
+    "max_memory_mb": 512,            # Extra address space the extractor may use
+    "isolation": "process",          # "process" (killable, reused worker) or "inline"
+}
+
+# Outcomes that still carry usable (partial) text
+PARTIAL_OUTCOMES = ("page_limit", "timeout", "memory", "crashed")
+
+OUTCOME_MESSAGES = {
+    "ok": "",
+    "page_limit": "Only the first {pages_read} of {pages_total} pages were analyzed (page limit).",
+    "timeout": "Only the first {pages_read} pages were analyzed (time limit reached).",
+    "memory": "Only the first {pages_read} pages were analyzed (memory limit reached).",
+    "crashed": "Only the first {pages_read} pages could be read (the PDF parser stopped unexpectedly).",
+    "too_large": "The file is larger than the {max_mb} MB upload limit.",
+    "error": "Could not read the PDF.",
+}
+
+
+def resolve_budget(overrides=None):
+    """Merges user overrides into DEFAULT_BUDGET, ignoring unknown keys."""
+    budget = dict(DEFAULT_BUDGET)
+    for key, value in (overrides or {}).items():
+        if key in budget:
+            budget[key] = value
+    return budget
+
+
+def describe_outcome(report):
+    """Human readable message for a non-ok extraction report."""
+    template = OUTCOME_MESSAGES.get(report.get("outcome"), "")
+    return template.format(
+        pages_read=report.get("pages_read", 0),
+        pages_total=report.get("pages_total", "?"),
+        max_mb=round(report.get("max_bytes", 0) / (1024 * 1024), 1),
+    )
+
+
+def read_upload(file, max_bytes):
+    """
+    Reads an uploaded file without ever holding more than max_bytes + 1 bytes.
+    Returns the bytes, or None if the upload is over budget.
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        return None
+    if hasattr(file, "seek"):
+        file.seek(0)
+    data = file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return None
+    return data
+
+
+def _iter_page_texts(data, max_pages):
+    """Yields ("total", n) once, then ("page", text) for each page within max_pages."""
+    import pypdf
+    from services.career_analyzer import clean_page_text
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    yield "total", total
+    for index in range(min(total, max_pages)):
+        page_text = reader.pages[index].extract_text()
+        yield "page", clean_page_text(page_text) if page_text else ""
+
+
+def _address_space_bytes():
+    # First field of statm is the total program size in pages
+    try:
+        import resource
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def _worker_main():
+    """
+    Worker process entry point (python -m services.resource_governor MAX_MEMORY_MB).
+    Serves extraction jobs from stdin until it closes: a JSON header line
+    {"bytes", "max_pages"}, then the PDF. Streams one JSON line per event to
+    stdout, so the parent keeps every page produced before a kill.
+    """
+    max_memory_mb = int(sys.argv[1])
+
+    # Import the parser before the limit is applied so only the parsing is budgeted
+    import pypdf  # noqa: F401
+    import services.career_analyzer  # noqa: F401
+
+    def emit(kind, payload=None):
+        sys.stdout.write(json.dumps({"kind": kind, "payload": payload}) + "\n")
+        sys.stdout.flush()
+
+    try:
+        import resource
+        current = _address_space_bytes()
+        if current and max_memory_mb:
+            limit = current + max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass  # Platform without rlimits, the wall-clock budget still applies
+
+    stdin = sys.stdin.buffer
+    while True:
+        header = stdin.readline()
+        if not header:
+            return
+        job = json.loads(header)
+        data = stdin.read(job["bytes"])
+        try:
+            for kind, payload in _iter_page_texts(data, job["max_pages"]):
+                emit(kind, payload)
+            emit("done")
+        except MemoryError:
+            emit("memory")
+            return  # the heap may be fragmented; the parent starts a fresh worker
+        except Exception as e:
+            emit("error", str(e))
+
+
+def _pump_lines(stream, out):
+    for line in stream:
+        out.put(line)
+    out.put(None)  # EOF
+
+
+class _Worker:
+    """A long-lived extraction process with its output lines on a queue."""
+
+    def __init__(self, max_memory_mb):
+        # A plain subprocess rather than multiprocessing: spawn would re-import the
+        # Streamlit script as __main__ in the child.
+        self.max_memory_mb = max_memory_mb
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "services.resource_governor", str(max_memory_mb)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=_REPO_ROOT,
+        )
+        self.lines = queue.Queue()
+        threading.Thread(target=_pump_lines, args=(self.proc.stdout, self.lines), daemon=True).start()
+        metrics.incr("analysis.extract.workers_started")
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait(timeout=5)
+
+
+# Idle workers, reused by later extractions. A worker is only replaced when a
+# job goes over its budget (time, memory) or the worker dies.
+MAX_IDLE_WORKERS = 4
+_pool_lock = threading.Lock()
+_idle_workers = []
+
+
+def _checkout(max_memory_mb):
+    with _pool_lock:
+        for i, worker in enumerate(_idle_workers):
+            if worker.max_memory_mb == max_memory_mb and worker.proc.poll() is None:
+                return _idle_workers.pop(i)
+    return _Worker(max_memory_mb)
+
+
+def _checkin(worker):
+    with _pool_lock:
+        if len(_idle_workers) < MAX_IDLE_WORKERS:
+            _idle_workers.append(worker)
+            return
+    worker.kill()
+
+
+def _run_in_process(data, budget, report):
+    worker = _checkout(int(budget["max_memory_mb"] or 0))
+    pages = []
+    deadline = time.monotonic() + budget["max_seconds"]
+    reusable = False
+    try:
+        try:
+            header = json.dumps({"bytes": len(data), "max_pages": int(budget["max_pages"])})
+            worker.proc.stdin.write(header.encode() + b"\n" + data)
+            worker.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass  # Worker died early, reported as crashed below
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                report["outcome"] = "timeout"
+                break
+            try:
+                line = worker.lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                report["outcome"] = "crashed"
+                break
+
+            event = json.loads(line)
+            kind, payload = event["kind"], event["payload"]
+            if kind == "total":
+                report["pages_total"] = payload
+            elif kind == "page":
+                pages.append(payload)
+            elif kind == "done":
+                reusable = True
+                break
+            elif kind == "memory":
+                report["outcome"] = "memory"
+                break
+            else:
+                # The parser failed on this PDF; the worker itself is fine
+                report["outcome"] = "error" if not pages else "crashed"
+                report["detail"] = payload
+                reusable = True
+                break
+    finally:
+        if reusable:
+            _checkin(worker)
+        else:
+            worker.kill()
+    return pages
+
+
+def _run_inline(data, budget, report):
+    # Cooperative mode: the deadline is only checked between pages, and
+    # memory is not limited. Use it where spawning processes is not allowed.
+    pages = []
+    deadline = time.monotonic() + budget["max_seconds"]
+    try:
+        for kind, payload in _iter_page_texts(data, budget["max_pages"]):
+            if kind == "total":
+                report["pages_total"] = payload
+                continue
+            pages.append(payload)
+            if time.monotonic() > deadline:
+                report["outcome"] = "timeout"
+                break
+    except MemoryError:
+        report["outcome"] = "memory"
+    except Exception as e:
+        report["outcome"] = "error" if not pages else "crashed"
+        report["detail"] = str(e)
+    return pages
+
+
+def extract_pages(file, budget=None):
+    """
+    Extracts cleaned page texts from an uploaded PDF within the given budget.
+    Returns (pages, report). The report's "outcome" is one of "ok",
+    "page_limit", "timeout", "memory", "crashed", "too_large" or "error";
+    every outcome is counted under analysis.extract.<outcome>.
+    """
+    budget = resolve_budget(budget)
+    started = time.perf_counter()
+    report = {"outcome": "ok", "pages_read": 0, "pages_total": None, "max_bytes": budget["max_bytes"]}
+
+    data = read_upload(file, budget["max_bytes"])
+    if data is None:
+        report["outcome"] = "too_large"
+        pages = []
+    elif budget["isolation"] == "inline":
+        pages = _run_inline(data, budget, report)
+    else:
+        pages = _run_in_process(data, budget, report)
+
+    report["pages_read"] = len(pages)
+    if (report["outcome"] == "ok" and report["pages_total"] is not None
+            and report["pages_total"] > len(pages)):
+        report["outcome"] = "page_limit"
+    report["elapsed"] = round(time.perf_counter() - started, 3)
+
+    metrics.incr(f"analysis.extract.{report['outcome']}")
+    metrics.observe("analysis.extract", report["elapsed"])
+    if report["outcome"] != "ok":
+        print(f"PDF extraction budget hit: {report}")
+    return pages, report
+
+
+if __name__ == "__main__":
+    _worker_main()
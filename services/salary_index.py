@@ -0,0 +1,384 @@
+"""
+Salary percentile index behind salary_range and the dashboard's salary chart.
+
+Built offline from local compensation datasets (CSV or Parquet, any number
+of rows), one salary per row:
+
+    job_title, country, salary, currency[, seniority][, years_experience]
+
+Titles are mapped to the analyzer's roles (career_analyzer.detect_role),
+countries to the names the app uses, and seniority to Junior/Mid/Senior/Lead
+(from the seniority column, else years_experience, else the title). Salaries
+are annual amounts; they are converted to USD through the versioned FX table
+in data/fx_rates.json, and rows in currencies it does not list are dropped.
+
+For every role x country x seniority cell, plus an "Any" seniority rollup,
+the build stores the row count, mean and the exact p10/p25/p50/p75/p90 as
+dense columnar arrays, so a query is an index computation and a few array
+reads:
+
+    <index>/manifest.json              roles, countries, seniorities, FX version, array files
+    <index>/count-<build>.npy          int32   [roles * countries * (seniorities + 1)]
+    <index>/mean-<build>.npy           float32 [same]
+    <index>/quantiles-<build>.npy      float32 [same, 5]
+
+Every build reads all inputs again (exact quantiles need every value) and
+writes new array files before switching the manifest, so running app
+processes pick up the new index on their next query. The arrays of the
+previous build are kept until the next one.
+
+    python -m services.salary_index build --index data/salary_index comp/*.parquet comp/*.csv
+    python -m services.salary_index query --index data/salary_index --role "DevOps Engineer" --country India
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import secrets
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.career_analyzer import detect_role, get_job_skills_database
+from utils import metrics
+from utils.config import get_section
+
+DEFAULT_INDEX_DIR = "data/salary_index"
+FX_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fx_rates.json")
+MANIFEST = "manifest.json"
+
+QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+SENIORITIES = ("Junior", "Mid", "Senior", "Lead")
+ANY = "Any"
+MIN_SAMPLES = 20                  # cells with fewer salaries fall back to the Any rollup
+USD_BOUNDS = (1_000, 2_000_000)   # annual USD outside this is treated as a data error
+CHUNK_ROWS = 1_000_000
+
+COUNTRY_ALIASES = {
+    "us": "USA", "usa": "USA", "u.s.": "USA", "u.s.a.": "USA", "united states": "USA",
+    "united states of america": "USA",
+    "uk": "UK", "u.k.": "UK", "gb": "UK", "great britain": "UK", "united kingdom": "UK", "england": "UK",
+    "de": "Germany", "germany": "Germany", "deutschland": "Germany",
+    "ca": "Canada", "canada": "Canada",
+    "au": "Australia", "australia": "Australia",
+    "ae": "UAE", "uae": "UAE", "united arab emirates": "UAE",
+    "in": "India", "india": "India",
+}
+
+COUNTRY_CURRENCY = {"USA": "USD", "Canada": "CAD", "Germany": "EUR", "UK": "GBP",
+                    "Australia": "AUD", "UAE": "AED", "India": "INR"}
+
+_SENIORITY_WORDS = [
+    ("Lead", re.compile(r"\b(lead|principal|staff|head|director|architect|manager)\b")),
+    ("Senior", re.compile(r"\b(senior|sr)\b")),
+    ("Junior", re.compile(r"\b(junior|jr|intern|graduate|entry|trainee|associate)\b")),
+    ("Mid", re.compile(r"\b(mid|intermediate)\b")),
+]
+
+
+def load_fx(path=FX_FILE):
+    """The FX table: {"version", "as_of", "base", "rates": {currency: units per USD}}."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def normalize_country(name):
+    name = str(name).strip()
+    return COUNTRY_ALIASES.get(name.lower(), name)
+
+
+def seniority_from_text(text):
+    """Junior/Mid/Senior/Lead from a title or seniority label; None when it says nothing."""
+    text = str(text).lower()
+    for label, pattern in _SENIORITY_WORDS:
+        if pattern.search(text):
+            return label
+    return None
+
+
+def seniority_from_years(years):
+    return "Junior" if years < 2 else "Mid" if years < 5 else "Senior" if years < 9 else "Lead"
+
+
+def _codes(values, vocab, ids, mapper):
+    """Vocabulary codes for a string column; `mapper` runs once per distinct value."""
+    cat = pd.Categorical(values)
+    lookup = np.empty(len(cat.categories), dtype=np.int32)
+    for i, value in enumerate(cat.categories):
+        key = mapper(value)
+        if key is None:
+            lookup[i] = -1
+            continue
+        if key not in ids:
+            ids[key] = len(vocab)
+            vocab.append(key)
+        lookup[i] = ids[key]
+    return np.where(cat.codes >= 0, lookup[cat.codes], -1)
+
+
+def _iter_chunks(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in parquet.schema_arrow.names
+                   if c in ("job_title", "country", "salary", "currency", "seniority", "years_experience")]
+        for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=CHUNK_ROWS, usecols=lambda c: c in (
+            "job_title", "country", "salary", "currency", "seniority", "years_experience"))
+
+
+def build(index_dir, inputs, fx_path=FX_FILE):
+    """Builds the index from every input file; returns the build summary."""
+    started = time.time()
+    fx = load_fx(fx_path)
+    rates = fx["rates"]
+    roles = list(get_job_skills_database().keys())
+    role_ids = {r: i for i, r in enumerate(roles)}
+    countries, country_ids = [], {}
+    seniority_ids = {s: i for i, s in enumerate(SENIORITIES)}
+    role_cache, title_seniority = {}, {}
+
+    parts = {"key": [], "usd": []}
+    rows = 0
+    dropped = {"missing": 0, "currency": 0, "out_of_range": 0}
+    n_sen = len(SENIORITIES) + 1
+
+    def role_of(title):
+        if title not in role_cache:
+            role_cache[title] = detect_role(title)
+        return role_cache[title]
+
+    def seniority_of_title(title):
+        if title not in title_seniority:
+            title_seniority[title] = seniority_from_text(title)
+        return title_seniority[title]
+
+    for path in inputs:
+        for chunk in _iter_chunks(path):
+            rows += len(chunk)
+            complete = chunk[["job_title", "country", "salary", "currency"]].notna().all(axis=1)
+            dropped["missing"] += int((~complete).sum())
+            chunk = chunk[complete]
+
+            rate = chunk["currency"].astype(str).str.upper().str.strip().map(rates)
+            known = rate.notna().to_numpy()
+            dropped["currency"] += int((~known).sum())
+            usd = pd.to_numeric(chunk["salary"], errors="coerce").to_numpy(dtype=np.float64) / rate.to_numpy(dtype=np.float64)
+            in_range = known & (usd >= USD_BOUNDS[0]) & (usd <= USD_BOUNDS[1])
+            dropped["out_of_range"] += int((known & ~in_range).sum())
+
+            titles = chunk["job_title"].astype(str)
+            role = _codes(titles, roles, role_ids, role_of)
+            country = _codes(chunk["country"], countries, country_ids, normalize_country)
+
+            # Seniority: explicit label, else years of experience, else the title, else Mid
+            seniority = np.full(len(chunk), seniority_ids["Mid"], dtype=np.int32)
+            from_title = _codes(titles, list(SENIORITIES), dict(seniority_ids), seniority_of_title)
+            seniority = np.where(from_title >= 0, from_title, seniority)
+            if "years_experience" in chunk:
+                years = pd.to_numeric(chunk["years_experience"], errors="coerce").to_numpy()
+                has_years = ~np.isnan(years)
+                by_years = np.array([seniority_ids[seniority_from_years(y)] for y in range(0, 10)], dtype=np.int32)
+                seniority = np.where(has_years, by_years[np.clip(np.nan_to_num(years), 0, 9).astype(int)], seniority)
+            if "seniority" in chunk:
+                labelled = _codes(chunk["seniority"].fillna(""), list(SENIORITIES), dict(seniority_ids), seniority_from_text)
+                seniority = np.where(labelled >= 0, labelled, seniority)
+
+            keep = in_range & (role >= 0) & (country >= 0)
+            cell = (role[keep].astype(np.int64) * 65536 + country[keep]) * n_sen
+            parts["key"].append(cell + seniority[keep])
+            parts["key"].append(cell + len(SENIORITIES))  # the Any rollup
+            values = usd[keep].astype(np.float32)
+            parts["usd"].extend([values, values])
+
+    n_cells = len(roles) * max(len(countries), 1) * n_sen
+    count = np.zeros(n_cells, dtype=np.int32)
+    mean = np.zeros(n_cells, dtype=np.float32)
+    quantiles = np.zeros((n_cells, len(QUANTILES)), dtype=np.float32)
+    if parts["key"]:
+        keys = np.concatenate(parts["key"])
+        values = np.concatenate(parts["usd"])
+        # Re-key densely now that the number of countries is known
+        role_part, rest = np.divmod(keys, 65536 * n_sen)
+        country_part, sen_part = np.divmod(rest, n_sen)
+        keys = (role_part * len(countries) + country_part) * n_sen + sen_part
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        cells, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        pos = starts[:, None] + np.asarray(QUANTILES)[None, :] * (counts[:, None] - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts[:, None] + counts[:, None] - 1)
+        frac = (pos - lo).astype(np.float32)
+        quantiles[cells] = values[lo] + frac * (values[hi] - values[lo])
+        count[cells] = counts
+        mean[cells] = np.add.reduceat(values.astype(np.float64), starts) / counts
+
+    os.makedirs(index_dir, exist_ok=True)
+    # Unique even for two builds in the same second
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4)}"
+    arrays = {"count": count, "mean": mean, "quantiles": quantiles}
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f"{name}-{build_id}.npy"
+        np.save(os.path.join(index_dir, files[name]), array)
+    manifest = {
+        "build_id": build_id,
+        "built_at": int(time.time()),
+        "fx_version": fx["version"],
+        "fx_as_of": fx.get("as_of"),
+        "roles": roles,
+        "countries": countries,
+        "seniorities": list(SENIORITIES) + [ANY],
+        "quantiles": list(QUANTILES),
+        "files": files,
+        "rows": rows,
+        "indexed": int(count[len(SENIORITIES)::n_sen].sum()),
+        "dropped": dropped,
+        "inputs": [os.path.abspath(p) for p in inputs],
+    }
+    path = os.path.join(index_dir, MANIFEST)
+    try:
+        with open(path) as f:
+            previous = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        previous = {}
+    tmp = f"{path}.{build_id}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    # Keep the previous build too: a process that read the old manifest may
+    # not have opened its arrays yet. Anything older is no longer referenced.
+    keep = set(files.values()) | set(previous.values())
+    for name in os.listdir(index_dir):
+        if name.endswith(".npy") and name not in keep:
+            os.remove(os.path.join(index_dir, name))
+    return {"rows": rows, "indexed": manifest["indexed"], "dropped": dropped, "cells": int((count > 0).sum()),
+            "fx_version": fx["version"], "seconds": round(time.time() - started, 1)}
+
+
+class SalaryIndex:
+    def __init__(self, index_dir):
+        self.dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        files = self.manifest["files"]
+        self.count = np.load(os.path.join(index_dir, files["count"]), mmap_mode="r")
+        self.mean = np.load(os.path.join(index_dir, files["mean"]), mmap_mode="r")
+        self.quantiles = np.load(os.path.join(index_dir, files["quantiles"]), mmap_mode="r")
+        self.role_ids = {r: i for i, r in enumerate(self.manifest["roles"])}
+        self.country_ids = {c: i for i, c in enumerate(self.manifest["countries"])}
+        self.n_sen = len(self.manifest["seniorities"])
+
+    @property
+    def countries(self):
+        return self.manifest["countries"]
+
+    def band(self, role, country, seniority=None):
+        """
+        p10..p90 (USD) for the cell, falling back to the Any-seniority rollup
+        when the cell has fewer than MIN_SAMPLES salaries. None if neither has.
+        """
+        r = self.role_ids.get(role)
+        c = self.country_ids.get(normalize_country(country))
+        if r is None or c is None:
+            return None
+        levels = [SENIORITIES.index(seniority)] if seniority in SENIORITIES else []
+        for s in levels + [len(SENIORITIES)]:
+            cell = (r * len(self.country_ids) + c) * self.n_sen + s
+            n = int(self.count[cell])
+            if n >= MIN_SAMPLES:
+                q = self.quantiles[cell]
+                band = {f"p{int(p * 100)}": int(round(float(v))) for p, v in zip(QUANTILES, q)}
+                band.update(mean=int(round(float(self.mean[cell]))), samples=n,
+                            seniority=self.manifest["seniorities"][s], currency="USD",
+                            fx_version=self.manifest["fx_version"])
+                return band
+        return None
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_stamp = None
+
+
+def get_index():
+    """
+    Per-process SalaryIndex, reopened when the manifest changes (a new build).
+    Returns None when no index has been built.
+    """
+    global _index, _index_stamp
+    index_dir = get_section("salary_index").get("path", DEFAULT_INDEX_DIR)
+    path = os.path.join(index_dir, MANIFEST)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or _index_stamp != stamp or _index.dir != index_dir:
+            _index = SalaryIndex(index_dir)
+            _index_stamp = stamp
+            try:
+                metrics.set_gauge("salary_index.fx_stale", int(_index.manifest["fx_version"] != load_fx()["version"]))
+            except (OSError, ValueError):
+                pass
+        return _index
+
+
+def salary_band(role, country, seniority=None):
+    """Band for an analyzed role/country, or None when no index (or too little data) is available."""
+    index = get_index()
+    if index is None:
+        return None
+    with metrics.timed("salary_index.query"):
+        return index.band(role, country, seniority)
+
+
+def country_bands(role, seniority=None, first=None, limit=5):
+    """Median bands for `role` across indexed countries, `first` leading; [] without an index."""
+    index = get_index()
+    if index is None:
+        return []
+    countries = ([first] if first else []) + [c for c in index.countries if c != normalize_country(first or "")]
+    rows = []
+    for country in countries:
+        band = index.band(role, country, seniority)
+        if band:
+            rows.append(dict(band, country=normalize_country(country)))
+        if len(rows) == limit:
+            break
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="build the index from CSV/Parquet files")
+    b.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    b.add_argument("--fx", default=FX_FILE, help="FX table (default data/fx_rates.json)")
+    b.add_argument("inputs", nargs="+", help="CSV/Parquet files or globs")
+    q = sub.add_parser("query")
+    q.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    q.add_argument("--role", required=True, help="a role or any job title")
+    q.add_argument("--country", required=True)
+    q.add_argument("--seniority", choices=SENIORITIES)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        inputs = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+        print(json.dumps(build(args.index, inputs, args.fx), indent=2))
+    else:
+        index = SalaryIndex(args.index)
+        if index.manifest["fx_version"] != load_fx()["version"]:
+            print("warning: the index was built with an older FX table; rebuild it")
+        role = args.role if args.role in index.role_ids else detect_role(args.role)
+        seniority = args.seniority or seniority_from_text(args.role)
+        print(json.dumps(index.band(role, args.country, seniority), indent=2))
+
+
+if __name__ == "__main__":
+    main()
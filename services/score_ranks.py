@@ -0,0 +1,266 @@
+"""
+Percentile rank of a match score among everyone targeting the same role and
+country ("you are in the top 12%").
+
+Match scores are integers from 0 to 100, so the distribution per
+(role, country) is kept as an exact 101-bin histogram rather than an
+approximate sketch. It has the properties a t-digest or KLL sketch would be
+picked for, with no approximation:
+  - compact: one DynamoDB item per (role, country) and writing region,
+    holding a count attribute per non-empty bin (s0..s100) and the total n
+  - mergeable: histograms add bin by bin, in any order and grouping
+  - constant time: a rank is a sum over at most 101 bins
+
+Every user counts once, with the score of their latest analysis.
+save_profile moves the user from the bin of their previous analysis to the
+new one, and delete_user removes them, using atomic ADD updates. Each region
+only updates its own item of a pair (sk = the region doing the write), so
+concurrent updates never meet on one item, even on global tables, where
+concurrent writes to one item would overwrite each other. Readers merge the
+items of every region (combine). One region's item can hold negative bins,
+e.g. after a rebuild moved every user to another region's item and a user
+then left their bin from here, so items are added with their signed counts
+and only the merged histogram is clamped at zero.
+
+Rank error bounds:
+  - Within one consistent histogram the rank is exact. Users with exactly the
+    user's score count half above and half below (the mid-rank), so
+    "top X%" may differ by at most half the share of tied users from a rank
+    that breaks ties one way.
+  - Reads go through a per-process cache, which may be ttl_seconds (default
+    300) out of date. With global tables, replicas lag by replication delay
+    (usually about a second). Over those windows, any change in the rank is
+    bounded by the number of saves during that window.
+  - The ADD happens after the analysis is saved, and is not part of the same
+    transaction. A crash between the two leaves the histogram off by one user
+    until the next rebuild. A rebuild recounts everything from the users'
+    latest analysis summaries and repairs such drift. Run one once when
+    enabling this as well, so users who saved analyses before it are counted:
+
+    python -m services.score_ranks rebuild [--region us-east-1] [--dry-run]
+    python -m services.score_ranks show --role "DevOps Engineer" --country India
+
+benchmarks/check_score_ranks.py checks the ranks and merges against exact
+ranks computed from the raw scores.
+"""
+import argparse
+import math
+import threading
+import time
+
+from utils import metrics
+from utils.config import get_section
+
+BINS = 101
+KEY_PREFIX = "r#"
+
+DEFAULT_POLICY = {
+    "ttl_seconds": 300,
+    "min_population": 20,  # no rank is shown for smaller groups
+}
+
+_lock = threading.Lock()
+_cache = {}  # pk -> (expires_at, histogram)
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("score_ranks").items() if k in policy})
+    return policy
+
+
+def stats_key(role, country):
+    return f"{KEY_PREFIX}{role}#{country}"
+
+
+def score_bin(score):
+    return min(max(int(round(float(score))), 0), BINS - 1)
+
+
+def _group(summary):
+    """(pk, bin) for an analysis summary, or None when it lacks a score, role or country."""
+    if not summary or summary.get("match_score") is None:
+        return None
+    if not summary.get("target_role_detected") or not summary.get("target_country"):
+        return None
+    return stats_key(summary["target_role_detected"], summary["target_country"]), score_bin(summary["match_score"])
+
+
+def deltas(old_summary, new_summary):
+    """
+    Histogram changes for a user moving from `old_summary` to `new_summary`
+    (either may be None): {pk: {bin: delta}}, without zero entries.
+    """
+    changes = {}
+    for summary, delta in ((old_summary, -1), (new_summary, 1)):
+        group = _group(summary)
+        if group:
+            bins = changes.setdefault(group[0], {})
+            bins[group[1]] = bins.get(group[1], 0) + delta
+    return {pk: {b: d for b, d in bins.items() if d} for pk, bins in changes.items()
+            if any(bins.values())}
+
+
+def from_item(item):
+    """The signed bin counts of one region's item."""
+    return [int(item.get(f"s{b}", 0)) for b in range(BINS)]
+
+
+def to_item(histogram):
+    """Attributes of a stats item: only the non-empty bins, plus the total."""
+    item = {f"s{b}": count for b, count in enumerate(histogram) if count}
+    item["n"] = sum(histogram)
+    return item
+
+
+def merge(histograms):
+    merged = [0] * BINS
+    for histogram in histograms:
+        for b, count in enumerate(histogram):
+            merged[b] += count
+    return merged
+
+
+def combine(histograms):
+    """
+    The histogram to rank against: the merge of every region's item, with bins
+    that are still negative (drift, see rebuild) counted as empty.
+    """
+    return [max(count, 0) for count in merge(histograms)]
+
+
+def percentile(histogram, score):
+    """Mid-rank percentile (0-100) of `score`, or None for an empty histogram."""
+    b = score_bin(score)
+    total = sum(histogram)
+    if total <= 0:
+        return None
+    below = sum(histogram[:b])
+    return 100.0 * (below + histogram[b] / 2) / total
+
+
+def top_percent(histogram, score):
+    """The X in "top X%": at least 1, rounded up."""
+    p = percentile(histogram, score)
+    return None if p is None else max(1, math.ceil(100 - p))
+
+
+def cached(pk, load):
+    """The merged histogram for `pk`, from the process cache or load()."""
+    now = time.time()
+    with _lock:
+        entry = _cache.get(pk)
+    if entry and entry[0] >= now:
+        metrics.incr("score_ranks.cache_hits")
+        return entry[1]
+    metrics.incr("score_ranks.cache_misses")
+    histogram = load()
+    if histogram is not None:
+        with _lock:
+            _cache[pk] = (now + float(get_policy()["ttl_seconds"]), histogram)
+    return histogram
+
+
+def rank(histogram, score):
+    """{"top_percent", "population"} for display, or None below min_population."""
+    population = sum(histogram or [])
+    if population < int(get_policy()["min_population"]):
+        return None
+    return {"top_percent": top_percent(histogram, score), "population": population}
+
+
+def replacement(histograms, stored, target, replicated):
+    """
+    What a rebuild of `target` writes: (keys to delete, items to put), given
+    the recounted {pk: histogram} and the (pk, sk) keys of the stored items.
+    """
+    stale = [(pk, sk) for pk, sk in stored
+             if not (sk == target and pk in histograms) and (replicated or sk == target)]
+    items = [dict(to_item(histogram), pk=pk, sk=target) for pk, histogram in histograms.items()]
+    return stale, items
+
+
+def rebuild(region=None, dry_run=False):
+    """
+    Recounts every histogram from the users' latest analysis summaries and
+    replaces the stored ones. With replicated tables one region holds every
+    user: its counts go to that region's items and the other regions' items are
+    removed. Without replication every region is recounted on its own.
+    Saves that land during a rebuild can be counted twice or not at all; run it
+    when traffic is low, or run it again.
+    Returns {region: {"users": n, "groups": n, "skipped": n}}.
+    """
+    from boto3.dynamodb.conditions import Attr
+
+    from services import db_handler, region_router
+
+    targets = [region or region_router.local_region()] if region_router.replicated() else \
+        ([region] if region else region_router.regions())
+    report = {}
+    for target in targets:
+        dynamodb = db_handler.new_db_resource(region=target)
+        users = dynamodb.Table(db_handler.profile_table_name())
+        stats = dynamodb.Table(db_handler.score_stats_table_name())
+        histograms, counted, skipped = {}, 0, 0
+        kwargs = {"ProjectionExpression": "latest_summary", "FilterExpression": Attr("latest_summary").exists()}
+        while True:
+            page = db_handler._call("Scan", users.scan, region=target, **kwargs)
+            for item in page.get("Items", []):
+                group = _group(item["latest_summary"])
+                if group is None:
+                    skipped += 1
+                    continue
+                histograms.setdefault(group[0], [0] * BINS)[group[1]] += 1
+                counted += 1
+            if "LastEvaluatedKey" not in page:
+                break
+            kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+        report[target] = {"users": counted, "groups": len(histograms), "skipped": skipped}
+        if dry_run:
+            continue
+
+        stored = []
+        kwargs = {"ProjectionExpression": "pk, sk"}
+        while True:
+            page = db_handler._call("Scan", stats.scan, region=target, **kwargs)
+            stored.extend((item["pk"], item["sk"]) for item in page.get("Items", []))
+            if "LastEvaluatedKey" not in page:
+                break
+            kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+        stale, items = replacement(histograms, stored, target, region_router.replicated())
+        with stats.batch_writer() as batch:
+            for pk, sk in stale:
+                batch.delete_item(Key={"pk": pk, "sk": sk})
+            for item in items:
+                batch.put_item(Item=item)
+    with _lock:
+        _cache.clear()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("rebuild", help="recount the histograms from the users' latest analyses")
+    r.add_argument("--region", help="region to rebuild (default: the local one, or every region "
+                                    "when [aws] replicated is false)")
+    r.add_argument("--dry-run", action="store_true", help="count only, write nothing")
+    s = sub.add_parser("show", help="print the merged histogram of a role and country")
+    s.add_argument("--role", required=True)
+    s.add_argument("--country", required=True)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        for region, counts in rebuild(args.region, args.dry_run).items():
+            print(f"{region}: {counts}")
+    else:
+        from services.db_handler import load_score_histogram
+        histogram = load_score_histogram(args.role, args.country)
+        print(f"{sum(histogram)} users")
+        for b, count in enumerate(histogram):
+            if count:
+                print(f"{b:>3} {count:>8}  top {top_percent(histogram, b)}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+import weakref
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import metrics
+from utils.config import get_section
+
+# Per-session memory accounting with spill-to-disk for idle sessions.
+#
+# Every rerun, and every st.fragment body, calls touch(), which registers the
+# session, rehydrates any of its values that were spilled, and (at most every
+# sweep_interval seconds) sweeps all registered sessions: values of sessions
+# idle for longer than idle_seconds whose script is not running are pickled to
+# spill_dir. Active sessions are never spilled; a resident total still over
+# max_total_mb is reported as the session.over_budget_bytes gauge.
+#
+# Each session has a lock held while its values are rehydrated or spilled, so
+# a sweep from another session's thread never races the session's own rerun.
+
+DEFAULT_POLICY = {
+    "idle_seconds": 300,
+    "min_spill_bytes": 64 * 1024,
+    "max_total_mb": 512,
+    "sweep_interval": 30,
+    "spill_dir": ".session_spill",
+}
+
+# Only plain data values are spilled; widget-backed keys must stay in place.
+SPILLABLE_KEYS = ("analysis_result", "skill_matrix")
+
+_lock = threading.Lock()
+_sessions = {}  # session_id -> {"state": weakref to SessionState, "last_seen": float, "thread", "lock"}
+_last_sweep = 0.0
+
+
+class SpilledValue:
+    """Placeholder left in session state for a value that lives on disk."""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def __repr__(self):
+        return f"SpilledValue({self.path!r}, {self.size} bytes)"
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("session_memory").items() if k in policy})
+    return policy
+
+
+def estimate_size(value, _depth=0):
+    """Rough deep size in bytes of a session value."""
+    if isinstance(value, SpilledValue):
+        return 0
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):
+        # pandas DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if _depth > 6:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+
+def _session_state_of(ctx):
+    # The SafeSessionState wrapper is recreated on every rerun, the
+    # SessionState behind it lives as long as the browser session.
+    return ctx.session_state._state
+
+
+def _spill_path(policy, session_id, key):
+    return os.path.join(policy["spill_dir"], session_id, f"{key}.pkl")
+
+
+def _spill(state, session_id, key, policy):
+    value = state[key]
+    size = estimate_size(value)
+    path = _spill_path(policy, session_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    state[key] = SpilledValue(path, size)
+    metrics.incr("session.spills")
+    metrics.incr("session.spilled_bytes", size)
+    return size
+
+
+def rehydrate(state):
+    """Loads every spilled value of a session back into memory."""
+    for key in SPILLABLE_KEYS:
+        if key in state and isinstance(state[key], SpilledValue):
+            placeholder = state[key]
+            try:
+                with open(placeholder.path, "rb") as f:
+                    state[key] = pickle.load(f)
+                os.remove(placeholder.path)
+                metrics.incr("session.rehydrations")
+            except (OSError, pickle.UnpicklingError) as e:
+                # Losing a spilled value only costs a rebuild (re-analysis or matrix reset)
+                print(f"Could not rehydrate session value {key}: {e}")
+                del state[key]
+
+
+def session_report():
+    """
+    Per-session memory accounting for operators.
+    Returns {"sessions": [...], "resident_bytes": int, "spilled_bytes": int}.
+    """
+    now = time.time()
+    rows = []
+    with _lock:
+        entries = list(_sessions.items())
+    for session_id, entry in entries:
+        state = entry["state"]()
+        if state is None:
+            continue
+        resident = spilled = 0
+        for key in state._keys():
+            try:
+                value = state[key]
+            except KeyError:
+                continue
+            if isinstance(value, SpilledValue):
+                spilled += value.size
+            else:
+                resident += estimate_size(value)
+        rows.append({
+            "session_id": session_id,
+            "idle_seconds": round(now - entry["last_seen"]),
+            "resident_bytes": resident,
+            "spilled_bytes": spilled,
+        })
+    rows.sort(key=lambda r: r["resident_bytes"], reverse=True)
+    return {
+        "sessions": rows,
+        "resident_bytes": sum(r["resident_bytes"] for r in rows),
+        "spilled_bytes": sum(r["spilled_bytes"] for r in rows),
+    }
+
+
+def _spillable(entry, now, policy):
+    # Idle, and its script thread (rerun or fragment) has finished
+    thread = entry["thread"]()
+    return now - entry["last_seen"] >= policy["idle_seconds"] and not (thread and thread.is_alive())
+
+
+def sweep(current_session_id=None, policy=None):
+    """Applies the spill policy to every registered session except the current one."""
+    policy = policy or get_policy()
+    now = time.time()
+
+    with _lock:
+        entries = list(_sessions.items())
+        # Forget sessions Streamlit has already discarded, and their spill files
+        for session_id, entry in entries:
+            if entry["state"]() is None:
+                del _sessions[session_id]
+                shutil.rmtree(os.path.join(policy["spill_dir"], session_id), ignore_errors=True)
+
+    # (last_seen, -size, session_id, key) candidates, oldest first
+    candidates = []
+    resident_total = 0
+    for session_id, entry in entries:
+        state = entry["state"]()
+        if state is None:
+            continue
+        for key in SPILLABLE_KEYS:
+            if key not in state or isinstance(state[key], SpilledValue):
+                continue
+            size = estimate_size(state[key])
+            resident_total += size
+            if session_id != current_session_id and size >= policy["min_spill_bytes"]:
+                candidates.append((entry["last_seen"], -size, session_id, key, entry))
+
+    candidates.sort(key=lambda c: (c[0], c[1]))
+    for _, _, session_id, key, entry in candidates:
+        state = entry["state"]()
+        with entry["lock"]:
+            # Re-checked under the session's lock: it may have rerun since the scan
+            if state is None or not _spillable(entry, now, policy):
+                continue
+            if key not in state or isinstance(state[key], SpilledValue):
+                continue
+            try:
+                resident_total -= _spill(state, session_id, key, policy)
+            except (OSError, pickle.PicklingError) as e:
+                print(f"Could not spill session value {key}: {e}")
+
+    budget = policy["max_total_mb"] * 1024 * 1024
+    metrics.set_gauge("session.count", len(entries))
+    metrics.set_gauge("session.resident_bytes", resident_total)
+    metrics.set_gauge("session.over_budget_bytes", max(resident_total - budget, 0))
+
+def touch():
+    """
+    Call at the top of every rerun and of every st.fragment body (fragment-only
+    reruns skip app.py): registers the session, rehydrates its spilled values
+    and runs the periodic sweep.
+    """
+    global _last_sweep
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    state = _session_state_of(ctx)
+    policy = get_policy()
+    now = time.time()
+    with _lock:
+        entry = _sessions.get(ctx.session_id)
+        if entry is None or entry["state"]() is not state:
+            entry = _sessions[ctx.session_id] = {"state": weakref.ref(state), "last_seen": now,
+                                                 "thread": weakref.ref(threading.current_thread()),
+                                                 "lock": threading.Lock()}
+        due = now - _last_sweep >= policy["sweep_interval"]
+        if due:
+            _last_sweep = now
+
+    with entry["lock"]:
+        entry["last_seen"] = now
+        entry["thread"] = weakref.ref(threading.current_thread())
+        rehydrate(state)
+    if due:
+        sweep(ctx.session_id, policy)
@@ -0,0 +1,290 @@
+import atexit
+import hashlib
+import os
+import pickle
+import secrets
+import threading
+import time
+import zlib
+
+import streamlit as st
+from botocore.exceptions import BotoCoreError, ClientError
+
+from services.session_memory import SpilledValue
+from utils import metrics
+from utils.config import get_section
+
+# Session snapshots, so a reconnecting tab (or every tab after a server
+# restart) lands back where it was instead of on the login page.
+#
+# After login a session gets a random token, kept in the page URL as ?s=...
+# The end of every rerun (and of a progress matrix fragment run) calls
+# checkpoint(). When the values in SNAPSHOT_KEYS or the page have changed,
+# checkpoint() hands a pickled snapshot to a background writer, which
+# compresses it and replaces <dir>/<sha256(token)>.snap. Only the newest
+# pending snapshot per token is written. A new session whose URL carries a
+# token restores the snapshot with one file read and one read of the
+# account: login, current analysis, skill matrix and page. No re-analysis is
+# needed.
+#
+# The token is a bearer credential for ttl_seconds after the last change:
+# anyone with the URL is logged in. Every snapshot is indexed under its user
+# (<dir>/users/<sha256(email)>/), and logout or account deletion removes all
+# of the user's snapshots, from every tab and device. A restore also checks
+# that the account still exists and still points at the snapshot's latest
+# analysis. dir may be on storage shared by every server (e.g. NFS), so a
+# reconnect can land on any of them; it must only be writable by the app.
+
+DEFAULT_POLICY = {
+    "enabled": True,
+    "dir": ".session_snapshots",
+    "ttl_seconds": 12 * 3600,
+}
+
+QUERY_PARAM = "s"
+SNAPSHOT_VERSION = 1
+# Restored as they were; spilled values (see session_memory) are skipped
+SNAPSHOT_KEYS = ("user_email", "latest_sk", "analysis_result", "analysis_complete", "skill_matrix", "avatar_hash")
+PRUNE_INTERVAL = 3600
+
+_lock = threading.Condition()
+_pending = {}  # snapshot path -> (pickled snapshot, user index entry), compressed when written
+# Held while writing, so forget() cannot race a write of the same snapshot
+_write_lock = threading.Lock()
+_writer = None
+_last_prune = 0.0
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update({k: v for k, v in get_section("session_restore").items() if k in policy})
+    return policy
+
+
+def _path(policy, token):
+    return os.path.join(policy["dir"], hashlib.sha256(token.encode()).hexdigest() + ".snap")
+
+
+def _user_dir(policy, email):
+    return os.path.join(policy["dir"], "users", hashlib.sha256(email.encode()).hexdigest())
+
+
+def _write(path, payload, marker):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if marker is not None:
+        # Indexed first, so forget() finds every snapshot that exists
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, "a").close()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(zlib.compress(payload))
+    os.replace(tmp, path)
+
+
+def _prune(policy):
+    """Removes snapshots nobody has changed for ttl_seconds."""
+    cutoff = time.time() - float(policy["ttl_seconds"])
+    try:
+        names = os.listdir(policy["dir"])
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(policy["dir"], name)
+        try:
+            if name.endswith(".snap") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                metrics.incr("session_restore.expired")
+        except OSError:
+            pass
+    # Index entries of snapshots that are gone
+    users = os.path.join(policy["dir"], "users")
+    for user in os.listdir(users) if os.path.isdir(users) else ():
+        user_dir = os.path.join(users, user)
+        try:
+            for name in os.listdir(user_dir):
+                if not os.path.exists(os.path.join(policy["dir"], name)):
+                    os.remove(os.path.join(user_dir, name))
+            os.rmdir(user_dir)  # only succeeds once it is empty
+        except OSError:
+            pass
+
+
+def flush():
+    """Writes every pending snapshot now (the writer thread and atexit use this)."""
+    global _last_prune
+    with _write_lock:
+        with _lock:
+            batch = dict(_pending)
+            _pending.clear()
+        for path, (payload, marker) in batch.items():
+            try:
+                with metrics.timed("session_restore.write"):
+                    _write(path, payload, marker)
+                metrics.incr("session_restore.writes")
+            except OSError as e:
+                metrics.incr("session_restore.write_failures")
+                print(f"Could not write a session snapshot: {e}")
+    if time.time() - _last_prune >= PRUNE_INTERVAL:
+        _last_prune = time.time()
+        _prune(get_policy())
+
+
+def _run_writer():
+    while True:
+        with _lock:
+            while not _pending:
+                _lock.wait()
+        flush()
+
+
+def _submit(path, payload, marker):
+    global _writer
+    with _lock:
+        _pending[path] = (payload, marker)
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="session-snapshots", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+        _lock.notify()
+
+
+def checkpoint(page=None):
+    """
+    Call at the end of a rerun: starts a token for a newly logged-in session
+    and queues a snapshot when anything in it changed. `page` is the routed
+    page, restored as the navigation selection.
+    """
+    policy = get_policy()
+    if not policy["enabled"] or not st.session_state.get("authenticated"):
+        return
+    token = st.session_state.get("session_token")
+    if token is None:
+        token = st.session_state.session_token = secrets.token_urlsafe(24)
+    if st.query_params.get(QUERY_PARAM) != token:
+        st.query_params[QUERY_PARAM] = token
+    if page is not None:
+        st.session_state.session_page = page
+
+    snapshot = {key: st.session_state[key] for key in SNAPSHOT_KEYS
+                if key in st.session_state and not isinstance(st.session_state[key], SpilledValue)}
+    snapshot["page"] = st.session_state.get("session_page")
+    try:
+        payload = pickle.dumps({"version": SNAPSHOT_VERSION, "state": snapshot}, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError) as e:
+        print(f"Could not snapshot the session: {e}")
+        return
+    digest = hashlib.sha1(payload).hexdigest()
+    if st.session_state.get("session_snapshot_digest") == digest:
+        return
+    st.session_state.session_snapshot_digest = digest
+    path = _path(policy, token)
+    email = snapshot.get("user_email")
+    _submit(path, payload, os.path.join(_user_dir(policy, email), os.path.basename(path)) if email else None)
+
+
+def restore():
+    """
+    Restores the session named by the URL's token, if its snapshot exists and
+    has not expired. Returns True when the session is logged in again.
+    """
+    policy = get_policy()
+    token = st.query_params.get(QUERY_PARAM)
+    if not policy["enabled"] or not token:
+        return False
+    path = _path(policy, token)
+    try:
+        with metrics.timed("session_restore.read"):
+            with open(path, "rb") as f:
+                saved = pickle.loads(zlib.decompress(f.read()))
+            age = time.time() - os.path.getmtime(path)
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Could not read a session snapshot: {e}")
+        metrics.incr("session_restore.misses")
+        del st.query_params[QUERY_PARAM]
+        return False
+    if saved.get("version") != SNAPSHOT_VERSION or age > float(policy["ttl_seconds"]) \
+            or not saved["state"].get("user_email"):
+        metrics.incr("session_restore.misses")
+        del st.query_params[QUERY_PARAM]
+        return False
+
+    state = saved["state"]
+    # The snapshot alone is not enough: the account must still exist and its
+    # latest analysis must be the snapshot's
+    from services import db_handler
+    try:
+        login = db_handler.load_login(state["user_email"], cached=False)
+    except (ClientError, BotoCoreError) as e:
+        print(f"Could not verify a session snapshot: {e}")
+        return False
+    if login is None or login[1] != state.get("latest_sk"):
+        metrics.incr("session_restore.stale")
+        _remove(path)
+        del st.query_params[QUERY_PARAM]
+        return False
+
+    for key in SNAPSHOT_KEYS:
+        if key in state:
+            st.session_state[key] = state[key]
+    st.session_state.authenticated = True
+    st.session_state.session_token = token
+    st.session_state.session_page = state.get("page")
+    st.session_state.manual_selection = state.get("page") or "Home"
+    # Analyses saved while this snapshot was not written yet are loaded as at login
+    st.session_state.profile_pending = "analysis_result" not in state
+    metrics.incr("session_restore.restores")
+    return True
+
+
+def _remove(path):
+    with _write_lock:
+        with _lock:
+            _pending.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def forget_user(email):
+    """Drops every snapshot of `email`'s sessions, from all tabs and devices."""
+    policy = get_policy()
+    user_dir = _user_dir(policy, email)
+    with _write_lock:
+        with _lock:
+            for path, (_, marker) in list(_pending.items()):
+                if marker is not None and os.path.dirname(marker) == user_dir:
+                    del _pending[path]
+        try:
+            names = os.listdir(user_dir)
+        except OSError:
+            names = []
+        for name in names:
+            for path in (os.path.join(policy["dir"], name), os.path.join(user_dir, name)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        try:
+            os.rmdir(user_dir)
+        except OSError:
+            pass
+    metrics.incr("session_restore.forgotten", len(names))
+
+
+def forget():
+    """
+    Logout/account deletion: drops the session's token and the snapshots of
+    every session of its user, so no other tab or device restores a login.
+    """
+    token = st.session_state.pop("session_token", None)
+    st.session_state.pop("session_snapshot_digest", None)
+    st.session_state.pop("session_page", None)
+    if QUERY_PARAM in st.query_params:
+        del st.query_params[QUERY_PARAM]
+    if token is not None:
+        _remove(_path(get_policy(), token))
+    email = st.session_state.get("user_email")
+    if email:
+        forget_user(email)
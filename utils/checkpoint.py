@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+
+
+class SegmentCheckpoint:
+    """
+    Per-segment scan cursors for parallel-scan jobs, persisted atomically to a
+    JSON file after every page so a job can be resumed where it stopped.
+    """
+
+    def __init__(self, path, config):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {"config": config, "segments": {}}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Loads a previous run's state and returns its config."""
+        with open(self.path) as f:
+            self.state = json.load(f)
+        return self.state["config"]
+
+    def segment(self, index):
+        with self.lock:
+            return self.state["segments"].setdefault(
+                str(index), {"cursor": None, "done": False, "pages": 0, "rows": 0}
+            )
+
+    def advance(self, index, cursor, rows, **counters):
+        """Records a processed page; extra counters are summed per segment."""
+        with self.lock:
+            seg = self.state["segments"][str(index)]
+            seg["cursor"] = cursor
+            seg["done"] = cursor is None
+            seg["pages"] += 1
+            seg["rows"] += rows
+            for key, value in counters.items():
+                seg[key] = seg.get(key, 0) + value
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def totals(self):
+        """Sums every numeric field across segments."""
+        out = {}
+        with self.lock:
+            for seg in self.state["segments"].values():
+                for key, value in seg.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        out[key] = out.get(key, 0) + value
+        return out
@@ -0,0 +1,19 @@
+import streamlit as st
+
+
+def get_section(name):
+    """
+    Returns a section of secrets.toml as a plain dict.
+    Returns {} when the section (or the whole secrets file) is missing.
+    """
+    try:
+        if name in st.secrets:
+            return dict(st.secrets[name])
+    except FileNotFoundError:
+        pass
+    return {}
+
+
+def is_operator(email):
+    """True if the email is listed under [app] operators in secrets.toml."""
+    return bool(email) and email in get_section("app").get("operators", [])
@@ -0,0 +1,19 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+def fragment_only_run():
+    """True while only a fragment is rerunning, not the whole script."""
+    ctx = get_script_run_ctx()
+    return bool(ctx is not None and ctx.fragment_ids_this_run)
+
+
+def rerun_fragment():
+    """
+    Reruns only the calling st.fragment when this is a fragment-only rerun.
+    While the fragment executes as part of a full script run Streamlit rejects
+    scope="fragment", so the whole script is rerun instead.
+    """
+    if fragment_only_run():
+        st.rerun(scope="fragment")
+    st.rerun()
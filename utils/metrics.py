@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# In-process metrics registry shared by the services.
+# Counters are monotonic, gauges hold the last value set and timings keep
+# a bounded window of recent samples so percentiles stay cheap to compute.
+
+_SAMPLE_WINDOW = 1024
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+
+def incr(name, value=1):
+    """Adds `value` to the named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """Records the current value of a gauge."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, seconds):
+    """Records one timing sample (in seconds), or a size sample such as payload bytes."""
+    with _lock:
+        stat = _timings.get(name)
+        if stat is None:
+            stat = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=_SAMPLE_WINDOW)}
+            _timings[name] = stat
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["max"] = max(stat["max"], seconds)
+        stat["samples"].append(seconds)
+
+
+@contextmanager
+def timed(name):
+    """Context manager that observes the wall time of its body."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[idx]
+
+
+def snapshot():
+    """Returns a plain-dict copy of every metric, safe to json.dumps."""
+    with _lock:
+        timings = {}
+        for name, stat in _timings.items():
+            samples = sorted(stat["samples"])
+            timings[name] = {
+                "count": stat["count"],
+                "total": round(stat["total"], 6),
+                "max": round(stat["max"], 6),
+                "p50": round(_percentile(samples, 0.50), 6),
+                "p90": round(_percentile(samples, 0.90), 6),
+                "p99": round(_percentile(samples, 0.99), 6),
+            }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
+
+
+def reset():
+    """Clears every metric. Mostly useful for benchmarks."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
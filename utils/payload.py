@@ -0,0 +1,81 @@
+import streamlit as st
+
+from utils.config import get_section
+
+# Render payload: what each rerun sends to the browser.
+# tracing counts the serialized ForwardMsg bytes and the elements/blocks a
+# rerun emits and reports them per view as payload.bytes.<view> and
+# payload.elements.<view>. Large messages that repeat unchanged across reruns
+# may reach the browser as cache references, so these are upper bounds on
+# the websocket traffic.
+#
+# Compact rendering ([ui] compact, on by default) merges repeated elements
+# into a single block, trims Plotly specs and paginates long lists. The
+# budgets below apply to compact rendering and are checked by
+# benchmarks/check_payload.py; a rerun over budget counts
+# payload.over_budget.<view>.
+
+PAGE_SIZE = 6
+
+PAYLOAD_BUDGETS = {
+    # view: (bytes, elements) per rerun, sidebar included
+    "dashboard": (16_000, 40),
+    # One section per catalogue skill, so the first page carries the page picker
+    "resources": (8_500, 30),
+}
+
+
+def compact_enabled():
+    return bool(get_section("ui").get("compact", True))
+
+
+def over_budget(view, payload_bytes, elements):
+    budget = PAYLOAD_BUDGETS.get(view)
+    return budget is not None and (payload_bytes > budget[0] or elements > budget[1])
+
+
+def paginate(items, key, page_size=PAGE_SIZE):
+    """
+    Returns the slice of `items` on the selected page. A page picker is shown
+    only when there is more than one page.
+    """
+    if len(items) <= page_size:
+        return items
+    pages = -(-len(items) // page_size)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=key)
+    start = (int(page) - 1) * page_size
+    return items[start:start + page_size]
+
+
+def trim_figure(fig):
+    """
+    Drops the embedded layout template (most of a small figure's JSON) for
+    figures whose colours are all set explicitly. Streamlit's chart theme
+    still applies fonts and backgrounds in the browser.
+    """
+    fig.update_layout(template=None, margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def payload_table(snapshot):
+    """Payload bytes and element counts per view as flat rows."""
+    timings = snapshot["timings"]
+    rows = []
+    for name, stat in sorted(timings.items()):
+        if not name.startswith("payload.bytes."):
+            continue
+        view = name[len("payload.bytes."):]
+        elements = timings.get(f"payload.elements.{view}", {})
+        budget = PAYLOAD_BUDGETS.get(view)
+        rows.append({
+            "view": view,
+            "reruns": stat["count"],
+            "p50_kb": round(stat["p50"] / 1024, 1),
+            "max_kb": round(stat["max"] / 1024, 1),
+            "p50_elements": int(elements.get("p50", 0)),
+            "max_elements": int(elements.get("max", 0)),
+            "budget_kb": round(budget[0] / 1024, 1) if budget else None,
+            "budget_elements": budget[1] if budget else None,
+            "over_budget": snapshot["counters"].get(f"payload.over_budget.{view}", 0),
+        })
+    return rows
@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to `capacity`.
+
+    acquire(n) blocks until n tokens are available and takes them.
+    charge(n) takes tokens without waiting and may push the bucket into debt;
+    use it when the real cost (e.g. DynamoDB ConsumedCapacity) is only known
+    after the request, so the next acquire() waits the debt off.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1.0):
+        """Waits for `tokens` and returns the number of seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= min(tokens, self.capacity):
+                    self._tokens -= tokens
+                    return waited
+                sleep_for = (min(tokens, self.capacity) - self._tokens) / self.rate
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+    def charge(self, tokens):
+        """Deducts tokens immediately (may go negative)."""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import metrics
+from utils.config import get_section
+from utils.fragments import fragment_only_run
+from utils.payload import over_budget
+
+# Per-rerun latency breakdown.
+# Streamlit runs each session's script on its own thread, so the active trace
+# is thread-local: app.py calls begin_rerun() at the top of the script and
+# wraps the routed view in view(); storage and analyzer calls record span()s
+# into whatever trace is active on their thread, and fragment-only reruns are
+# traced by fragment(). Timings also go to the shared metrics registry as
+# rerun.total, rerun.view.<name> and span.<name>, and the bytes/elements the
+# rerun sends to the browser as payload.bytes.<view> and payload.elements.<view>.
+
+DEFAULT_SLOW_RERUN_MS = 1000
+DEFAULT_SLOW_LOG = "logs/slow_reruns.jsonl"
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class RerunTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.depth = 0
+        self.spans = {}  # name -> [count, seconds]
+        self.top_level_seconds = 0.0
+        self.payload_bytes = 0
+        self.elements = 0
+
+    def add(self, name, seconds, top_level):
+        entry = self.spans.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        if top_level:
+            self.top_level_seconds += seconds
+
+
+def begin_rerun():
+    """
+    Starts a new trace for this script run. A trace still active here belongs
+    to a run that left the script before its view() and is dropped.
+    """
+    if current() is not None:
+        metrics.incr("rerun.abandoned")
+    _local.trace = RerunTrace()
+    _count_payload()
+
+
+def _count_payload():
+    # Every ForwardMsg of a script run goes through its context's enqueue().
+    # Streamlit starts a new ScriptRunner (and context) for most reruns, so
+    # the wrapper is installed once per context.
+    ctx = get_script_run_ctx()
+    if ctx is None or getattr(ctx, "_payload_counted", False):
+        return
+    enqueue = ctx.enqueue
+
+    def counting_enqueue(msg):
+        trace = current()
+        if trace is not None:
+            trace.payload_bytes += msg.ByteSize()
+            if msg.HasField("delta") and msg.delta.WhichOneof("type") in ("new_element", "add_block"):
+                trace.elements += 1
+        enqueue(msg)
+
+    ctx.enqueue = counting_enqueue
+    ctx._payload_counted = True
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name):
+    """Times a storage/analyzer call and attributes it to the active rerun."""
+    trace = current()
+    if trace is not None:
+        trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe(f"span.{name}", seconds)
+        if trace is not None:
+            trace.depth -= 1
+            trace.add(name, seconds, top_level=trace.depth == 0)
+
+
+@contextmanager
+def view(name):
+    """
+    Wraps the routed view. Ends the rerun on exit - including st.rerun() and
+    st.stop(), which leave the script through exceptions.
+    """
+    trace = current()
+    if trace is not None:
+        trace.view = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(f"view.{name}", time.perf_counter() - start)
+        end_rerun()
+
+
+@contextmanager
+def fragment(name):
+    """
+    Wraps an st.fragment body. During a full rerun it is one more span; when
+    only the fragment reruns it is a rerun of its own, reported as view
+    "fragment.<name>", even if an earlier run left its trace behind.
+    """
+    if current() is not None and not fragment_only_run():
+        with span(f"fragment.{name}"):
+            yield
+        return
+    begin_rerun()
+    with view(f"fragment.{name}"):
+        yield
+
+
+def end_rerun():
+    """Records the rerun's wall time and logs it when it is over the threshold."""
+    trace = current()
+    if trace is None:
+        return None
+    _local.trace = None
+    total = time.perf_counter() - trace.started
+    view_name = trace.view or "unrouted"
+    metrics.observe("rerun.total", total)
+    metrics.observe(f"rerun.view.{view_name}", total)
+    metrics.observe(f"payload.bytes.{view_name}", trace.payload_bytes)
+    metrics.observe(f"payload.elements.{view_name}", trace.elements)
+    if over_budget(view_name, trace.payload_bytes, trace.elements):
+        metrics.incr(f"payload.over_budget.{view_name}")
+
+    cfg = get_section("perf")
+    if total * 1000 >= float(cfg.get("slow_rerun_ms", DEFAULT_SLOW_RERUN_MS)):
+        metrics.incr("rerun.slow")
+        _log_slow(cfg.get("slow_log", DEFAULT_SLOW_LOG), {
+            "ts": round(time.time(), 3),
+            "view": view_name,
+            "total_ms": round(total * 1000, 1),
+            "spans": {name: {"count": c, "ms": round(s * 1000, 1)}
+                      for name, (c, s) in sorted(trace.spans.items(), key=lambda kv: -kv[1][1])},
+            "other_ms": round((total - trace.top_level_seconds) * 1000, 1),
+            "payload_bytes": trace.payload_bytes,
+            "elements": trace.elements,
+        })
+    return total
+
+
+def _log_slow(path, record):
+    line = json.dumps(record)
+    with _log_lock:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write slow-rerun log: {e}")
+
+
+def read_slow_log(limit=50):
+    """Returns the newest `limit` slow-rerun records, newest first."""
+    path = get_section("perf").get("slow_log", DEFAULT_SLOW_LOG)
+    try:
+        with open(path) as f:
+            lines = f.readlines()[-limit:]
+    except OSError:
+        return []
+    records = []
+    for line in reversed(lines):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def latency_table(snapshot=None):
+    """
+    Rerun, view and span percentiles as flat rows (milliseconds), ready for a
+    dataframe or a CSV export.
+    """
+    snapshot = snapshot or metrics.snapshot()
+    rows = []
+    for name, stat in sorted(snapshot["timings"].items()):
+        if not name.startswith(("rerun.", "view.", "span.")):
+            continue
+        rows.append({
+            "name": name,
+            "count": stat["count"],
+            "p50_ms": round(stat["p50"] * 1000, 1),
+            "p90_ms": round(stat["p90"] * 1000, 1),
+            "p99_ms": round(stat["p99"] * 1000, 1),
+            "max_ms": round(stat["max"] * 1000, 1),
+            "mean_ms": round(stat["total"] / stat["count"] * 1000, 1) if stat["count"] else 0.0,
+        })
+    return rows
@@ -3,6 +3,36 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from utils.data import get_job_market_data, get_skill_gap_data, get_roadmap_data
+from utils.payload import compact_enabled, paginate, trim_figure
+
+
+def _skill_html(skill):
+    color = "red" if skill['severity'] == "High" else "orange" if skill['severity'] == "Medium" else "green"
+    return f"""
+        <div style="margin-bottom: 10px; padding: 10px; border-left: 5px solid {color}; background-color: rgba(0,0,0,0.05);">
+            <strong>{skill['skill']}</strong> <span style="float: right; color: {color};">{skill['severity']} Priority</span>
+        </div>
+    """
+
+
+def _roadmap_html(item):
+    status_color = "#4caf50" if item.get('Status') == "Computed" or item.get('Status') == "Completed" else "#2196f3" if "Progress" in item.get('Status', '') else "#ff9800"
+    return f"""
+    <div style="border-left: 4px solid {status_color}; padding-left: 20px; margin-bottom: 20px;">
+        <h4 style="margin: 0;">{item.get('Stage')} <span style="font-size: 0.8rem; background: {status_color}; color: white; padding: 2px 8px; border-radius: 10px; margin-left: 10px;">{item.get('Date')}</span></h4>
+        <p style="color: #666; margin-bottom: 5px;"><em>{item.get('Status', 'Pending')}</em></p>
+        <div style="margin-top: 10px;">
+            <strong>🎯 Focus Topics:</strong>
+            <ul style="margin-top: 5px;">
+                {''.join([f'<li>{t}</li>' for t in item.get('Topics', [])])}
+            </ul>
+        </div>
+        <div style="background-color: #f0f2f6; padding: 10px; border-radius: 5px; margin-top: 10px;">
+            <strong>⚡ Action Item:</strong> {item.get('Action', 'Complete relevant learning modules.')}
+        </div>
+    </div>
+    """
+
 
 def render():
     st.title(f"Career Dashboard: {st.session_state.get('user_job', 'DevOps Engineer')}")
@@ -13,9 +43,11 @@ def render():
     # Use real data if available, otherwise fallback to mock data
     if analysis_result:
         market_score = analysis_result.get('market_demand_score', 85)
+        demand = analysis_result.get('market_demand')
         match_score = analysis_result.get('match_score', 0)
         missing_skills = analysis_result.get('missing_skills', [])
         salary_range = analysis_result.get('salary_range', [0, 0])
+        salary_band = analysis_result.get('salary_band')
         country = analysis_result.get('target_country', st.session_state.get('user_country', 'USA'))
         hiring_companies = analysis_result.get('hiring_companies', [])
     else:
@@ -23,21 +55,47 @@ def render():
         market = get_job_market_data()
         skills = get_skill_gap_data()
         market_score = market['demand_score']
+        demand = None
         match_score = skills['match_score']
         missing_skills = skills['missing_skills']
         salary_range = market['salary_ranges'].get(st.session_state.get('user_country', 'USA'), [0,0])
+        salary_band = None
         country = st.session_state.get('user_country', 'USA')
         hiring_companies = market['hiring_companies']
 
+    # Compact mode: one HTML block per list, paginated, and leaner chart specs
+    compact = compact_enabled()
+
     c1, c2, c3 = st.columns(3)
     
     with c1:
-        st.metric("Market Demand Score", f"{market_score}/100", "+5% vs last month")
+        if demand:
+            mom = demand['mom_change_pct']
+            st.metric("Market Demand Score", f"{market_score}/100", None if mom is None else f"{mom:+.0f}% vs last month",
+                      help=f"{demand['postings_30d']:,} postings in the last 30 days and {demand['postings_90d']:,} "
+                           f"in the last 90, as of {demand['as_of']}")
+        else:
+            st.metric("Market Demand Score", f"{market_score}/100")
     with c2:
         st.metric("Skill Match", f"{match_score}%", f"{len(missing_skills)} Missing Skills")
+        if analysis_result:
+            from services.db_handler import match_score_rank
+            role = analysis_result.get('target_role_detected')
+            rank = match_score_rank(role, country, match_score)
+            if rank:
+                st.caption(f"Top {rank['top_percent']}% of {rank['population']:,} {role} candidates in {country}")
+            implied = analysis_result.get('implied_skills')
+            if implied:
+                st.caption("Credited from related skills: " +
+                           ", ".join(f"{s['skill']} (via {s['via']})" for s in implied))
     with c3:
-        avg_salary = sum(salary_range)/2 if salary_range else 0
-        st.metric("Potential Salary (Avg)", f"${avg_salary:,.0f}", country)
+        if salary_band:
+            st.metric("Potential Salary (Median)", f"${salary_band['p50']:,.0f}", country,
+                      help=f"Middle half: ${salary_band['p25']:,.0f} - ${salary_band['p75']:,.0f} "
+                           f"({salary_band['samples']:,} salaries, {salary_band['seniority']} level)")
+        else:
+            avg_salary = sum(salary_range)/2 if salary_range else 0
+            st.metric("Potential Salary (Avg)", f"${avg_salary:,.0f}", country)
 
     st.markdown("---")
 
@@ -57,45 +115,89 @@ def render():
                          {'range': [0, 50], 'color': "lightgray"},
                          {'range': [50, 80], 'color': "gray"}],
                      'threshold' : {'line': {'color': "red", 'width': 4}, 'thickness': 0.75, 'value': 90}}))
+        if compact:
+            trim_figure(fig)
         st.plotly_chart(fig, use_container_width=True)
         
         st.subheader("Missing Skills Analysis")
-        for skill in missing_skills:
-            color = "red" if skill['severity'] == "High" else "orange" if skill['severity'] == "Medium" else "green"
-            st.markdown(f"""
-                <div style="margin-bottom: 10px; padding: 10px; border-left: 5px solid {color}; background-color: rgba(0,0,0,0.05);">
-                    <strong>{skill['skill']}</strong> <span style="float: right; color: {color};">{skill['severity']} Priority</span>
-                </div>
-            """, unsafe_allow_html=True)
+        if compact:
+            page = paginate(missing_skills, key="dashboard_missing_page")
+            st.markdown("".join(_skill_html(skill) for skill in page), unsafe_allow_html=True)
+        else:
+            for skill in missing_skills:
+                st.markdown(_skill_html(skill), unsafe_allow_html=True)
 
     with col_right:
         st.subheader("Salary Comparison by Country")
-        # Transform salary data for Plotly - Keeping this part simpler for now, maybe just show current country vs others from static data if needed
-        # For now, let's just visualize the current range vs a few others from static data for context
-        
-        static_market = get_job_market_data() # For comparison context
-        data = []
-        
-        # Add current user analysis
-        data.append({"Country": country + " (You)", "Min": salary_range[0], "Max": salary_range[1], "Avg": sum(salary_range)/2})
-        
-        # Add a few others for comparison
-        for c, r in static_market['salary_ranges'].items():
-            if c != country:
-                data.append({"Country": c, "Min": r[0], "Max": r[1], "Avg": sum(r)/2})
-        
-        df_sal = pd.DataFrame(data[:5]) # Top 5 to avoid crowding
-        fig_sal = px.bar(df_sal, x='Country', y='Avg', color='Avg', 
-                         title="Average Annual Salary (USD)",
-                         color_continuous_scale='Viridis')
+        bands = []
+        if salary_band:
+            from services.salary_index import country_bands
+            bands = country_bands(analysis_result.get('target_role_detected'), salary_band['seniority'], first=country)
+        if bands:
+            # Median with the p25-p75 band, from the salary index
+            df_sal = pd.DataFrame([{"Country": b["country"] + (" (You)" if i == 0 else ""), "Median": b["p50"],
+                                    "Above": b["p75"] - b["p50"], "Below": b["p50"] - b["p25"]}
+                                   for i, b in enumerate(bands)])  # the user's country leads
+            fig_sal = px.bar(df_sal, x='Country', y='Median', color='Median', error_y='Above', error_y_minus='Below',
+                             title="Median Annual Salary (USD), p25-p75",
+                             color_continuous_scale='Viridis')
+        else:
+            static_market = get_job_market_data() # For comparison context
+            data = []
+
+            # Add current user analysis
+            data.append({"Country": country + " (You)", "Min": salary_range[0], "Max": salary_range[1], "Avg": sum(salary_range)/2})
+
+            # Add a few others for comparison
+            for c, r in static_market['salary_ranges'].items():
+                if c != country:
+                    data.append({"Country": c, "Min": r[0], "Max": r[1], "Avg": sum(r)/2})
+
+            df_sal = pd.DataFrame(data[:5]) # Top 5 to avoid crowding
+            fig_sal = px.bar(df_sal, x='Country', y='Avg', color='Avg',
+                             title="Average Annual Salary (USD)",
+                             color_continuous_scale='Viridis')
+        if compact:
+            trim_figure(fig_sal)
         st.plotly_chart(fig_sal, use_container_width=True)
         
+        # Match score over time (summary attributes only, fetched once per session)
+        if "score_history" not in st.session_state:
+            from services.db_handler import list_history
+            items, _ = list_history(st.session_state.get("user_email", "unknown_user"), limit=50)
+            st.session_state.score_history = [
+                {"Analyzed": pd.to_datetime(int(i["created_at"]), unit="s"), "Match Score": i.get("match_score", 0),
+                 "Job": i.get("job_title", "")}
+                for i in reversed(items)
+            ]
+        if len(st.session_state.score_history) > 1:
+            fig_hist = px.line(pd.DataFrame(st.session_state.score_history), x="Analyzed", y="Match Score",
+                               hover_data=["Job"], markers=True, title="Match Score Over Time")
+            fig_hist.update_yaxes(range=[0, 100])
+            st.plotly_chart(fig_hist, use_container_width=True)
+
         if "UAE" in country:
             st.info("💡 Note: UAE offers tax-free salaries. Companies often provide relocation packages.")
         
         st.subheader("Top Hiring Companies")
         st.dataframe(hiring_companies, use_container_width=True)
         
+        # Matching postings from the offline job index (shown only when an index has been built)
+        if analysis_result:
+            from services.job_index import matching_jobs
+            jobs = matching_jobs(analysis_result, k=10)
+            if jobs:
+                st.subheader("Matching Jobs")
+                st.dataframe(
+                    pd.DataFrame(jobs)[["title", "company", "posted_at", "skill_fit", "url"]],
+                    column_config={
+                        "title": "Role", "company": "Company", "posted_at": "Posted",
+                        "skill_fit": st.column_config.ProgressColumn("Skill Fit", min_value=0, max_value=1),
+                        "url": st.column_config.LinkColumn("Link"),
+                    },
+                    use_container_width=True, hide_index=True
+                )
+
         # Live Search Link
         search_query = f"{st.session_state.get('user_job', 'simulated')} jobs in {country}"
         search_url = f"https://www.linkedin.com/jobs/search/?keywords={search_query.replace(' ', '%20')}"
@@ -104,29 +206,12 @@ def render():
     st.markdown("---")
     st.subheader("Personalized Career Roadmap")
     
-    roadmap = analysis_result.get('roadmap', get_roadmap_data()) # Fallback if missing
-    
-    st.subheader("Personalized Career Roadmap")
-    
-    roadmap = analysis_result.get('roadmap', get_roadmap_data()) # Fallback if missing
+    roadmap = (analysis_result or {}).get('roadmap', get_roadmap_data()) # Fallback if missing
     
     # Detailed Vertical/Card Timeline
-    for item in roadmap:
-        status_color = "#4caf50" if item.get('Status') == "Computed" or item.get('Status') == "Completed" else "#2196f3" if "Progress" in item.get('Status', '') else "#ff9800"
-        
-        with st.container():
-            st.markdown(f"""
-            <div style="border-left: 4px solid {status_color}; padding-left: 20px; margin-bottom: 20px;">
-                <h4 style="margin: 0;">{item.get('Stage')} <span style="font-size: 0.8rem; background: {status_color}; color: white; padding: 2px 8px; border-radius: 10px; margin-left: 10px;">{item.get('Date')}</span></h4>
-                <p style="color: #666; margin-bottom: 5px;"><em>{item.get('Status', 'Pending')}</em></p>
-                <div style="margin-top: 10px;">
-                    <strong>🎯 Focus Topics:</strong>
-                    <ul style="margin-top: 5px;">
-                        {''.join([f'<li>{t}</li>' for t in item.get('Topics', [])])}
-                    </ul>
-                </div>
-                <div style="background-color: #f0f2f6; padding: 10px; border-radius: 5px; margin-top: 10px;">
-                    <strong>⚡ Action Item:</strong> {item.get('Action', 'Complete relevant learning modules.')}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    if compact:
+        st.markdown("".join(_roadmap_html(item) for item in roadmap), unsafe_allow_html=True)
+    else:
+        for item in roadmap:
+            with st.container():
+                st.markdown(_roadmap_html(item), unsafe_allow_html=True)
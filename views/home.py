@@ -1,5 +1,79 @@
 import streamlit as st
 import time
+from datetime import datetime
+
+COUNTRIES = ["USA", "Canada", "Germany", "UK", "Australia", "UAE", "India"]
+
+def _finish_analysis(result, job_title, country, resume_text=None, text_hash=None):
+    """Stores a successful analysis in the session and the DB, then opens the Dashboard."""
+    st.session_state.analysis_complete = True
+    st.session_state.analysis_result = result
+    st.session_state.user_job = job_title
+    st.session_state.user_country = country
+    
+    # Save to DB using Authenticated Email
+    from services.db_handler import save_profile
+    user_email = st.session_state.get("user_email", "unknown_user")
+    latest_sk = save_profile(user_email, result, resume_text=resume_text, text_hash=text_hash)
+    if latest_sk:
+        st.session_state.latest_sk = latest_sk  # what a session snapshot is checked against
+        st.session_state.pop("score_history", None) # Refetch the chart data
+        st.session_state.pop("stored_resumes", None)
+        st.toast("Progress saved to Cloud! ☁️")
+    
+    # Trigger navigation to Dashboard
+    st.session_state.manual_selection = "Dashboard"
+    st.success("Analysis Complete! Redirecting...")
+    st.rerun()
+
+def _render_retarget():
+    """Re-analyzes a stored resume for another role or country, without a new upload."""
+    from services.db_handler import list_resume_texts, load_resume_text
+    user_email = st.session_state.get("user_email", "unknown_user")
+    if "stored_resumes" not in st.session_state:
+        st.session_state.stored_resumes = list_resume_texts(user_email)
+    stored = st.session_state.stored_resumes
+    if not stored:
+        return
+    
+    with st.container(border=True):
+        st.subheader("Re-target Your Resume")
+        st.caption("Try another role or country with a resume you already uploaded - no new upload needed.")
+        labels = {r["hash"]: f"Resume last used {datetime.fromtimestamp(r['last_used']):%d %b %Y} ({r['chars']:,} characters)"
+                  for r in stored}
+        text_hash = st.selectbox("Stored Resume", list(labels), format_func=labels.get)
+        new_job = st.text_input("New Target Job", value=st.session_state.get("user_job", ""), key="retarget_job")
+        new_country = st.selectbox("New Target Country", COUNTRIES, key="retarget_country")
+        
+        if st.button("Re-target", use_container_width=True):
+            if not new_job:
+                st.error("Please provide a Job Title.")
+                return
+            resume_text = load_resume_text(user_email, text_hash)
+            if resume_text is None:
+                st.session_state.pop("stored_resumes", None)
+                st.error("That resume is no longer stored. Please upload it again.")
+                return
+            from services.analysis_client import retarget
+            result = retarget(new_job, resume_text, new_country)
+            if result.get("success"):
+                _finish_analysis(result, new_job, new_country, text_hash=text_hash)
+            else:
+                st.error(f"Analysis failed: {result.get('error')}")
+
+def _render_account():
+    with st.expander("Account"):
+        st.caption("Deleting your account removes your analyses, stored resume text and profile photo.")
+        confirm = st.checkbox("I understand this cannot be undone", key="confirm_delete_account")
+        if st.button("Delete my account", disabled=not confirm):
+            from services.db_handler import delete_user
+            ok, message = delete_user(st.session_state.get("user_email", "unknown_user"))
+            if ok:
+                from services import session_restore
+                session_restore.forget()
+                st.session_state.clear()
+                st.rerun()
+            st.error(message)
 
 def render():
     st.markdown("""
@@ -23,7 +97,7 @@ def render():
             
             target_country = st.selectbox(
                 "Target Country for Relocation",
-                ["USA", "Canada", "Germany", "UK", "Australia", "UAE", "India"]
+                COUNTRIES
             )
             
             st.markdown("---")
@@ -35,25 +109,22 @@ def render():
                         # pypdf supports file-like objects
                         
                         try:
-                            from services.career_analyzer import analyze_profile
-                            result = analyze_profile(dream_job, uploaded_file, target_country)
+                            from services.analysis_client import analyze
+                            from services.resource_governor import describe_outcome
+                            from utils.config import get_section
+                            result = analyze(dream_job, uploaded_file, target_country,
+                                             budget=get_section("analysis_budget"), keep_text=True)
+                            # The extracted text is stored with the analysis, not kept in session
+                            resume_text = result.pop("resume_text", None)
+                            # Which earlier upload it repeats is not part of the user's analysis
+                            result.pop("near_duplicate", None)
                             
                             if result.get("success"):
-                                st.session_state.analysis_complete = True
-                                st.session_state.analysis_result = result
-                                st.session_state.user_job = dream_job
-                                st.session_state.user_country = target_country
-                                
-                                # Save to DB using Authenticated Email
-                                from services.db_handler import save_profile
-                                user_email = st.session_state.get("user_email", "unknown_user")
-                                if save_profile(user_email, result):
-                                    st.toast("Progress saved to Cloud! ☁️")
-                                
-                                # Trigger navigation to Dashboard
-                                st.session_state.manual_selection = "Dashboard"
-                                st.success("Analysis Complete! Redirecting...")
-                                st.rerun()
+                                # Partial result (budget hit) - still usable, but tell the user
+                                budget_note = describe_outcome(result.get("extraction", {}))
+                                if budget_note:
+                                    st.toast(budget_note, icon="⚠️")
+                                _finish_analysis(result, dream_job, target_country, resume_text=resume_text)
                             else:
                                 st.error(f"Analysis failed: {result.get('error')}")
                         except Exception as e:
@@ -61,3 +132,6 @@ def render():
                             print(f"Analysis error: {e}")
                 else:
                     st.error("Please provide both a Job Title and Resume.")
+
+        _render_retarget()
+        _render_account()
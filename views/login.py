@@ -1,5 +1,4 @@
 import streamlit as st
-import time
 from services import db_handler
 
 def render():
@@ -31,13 +30,11 @@ def render():
                                 # Set Session State
                                 st.session_state.authenticated = True
                                 st.session_state.user_email = email.strip()
-                                st.session_state.analysis_result = result
-                                if result:
-                                    st.session_state.analysis_complete = True
-                                    st.session_state.manual_selection = "Dashboard"
-                                else:
-                                    st.session_state.manual_selection = "Home"
-                                time.sleep(1)
+                                # Profile and avatar are hydrated by app.py after the first page is drawn
+                                st.session_state.profile_pending = True
+                                st.session_state.latest_sk = result.get("latest_sk")
+                                st.session_state.avatar_hash = None
+                                st.session_state.manual_selection = "Home"
                                 st.rerun()
                             else:
                                 st.error(str(result))
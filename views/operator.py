@@ -0,0 +1,72 @@
+import json
+import streamlit as st
+import pandas as pd
+from services import profile_cache, region_router, session_memory
+from utils import metrics, tracing
+from utils.payload import payload_table
+
+def render():
+    st.title("Operator Console")
+    st.caption("Process-local view: each server process reports its own sessions and metrics.")
+
+    # Session memory accounting
+    report = session_memory.session_report()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Active Sessions", len(report["sessions"]))
+    c2.metric("Resident Session Memory", f"{report['resident_bytes'] / 1024 / 1024:.1f} MB")
+    c3.metric("Spilled to Disk", f"{report['spilled_bytes'] / 1024 / 1024:.1f} MB")
+
+    if report["sessions"]:
+        st.dataframe(pd.DataFrame(report["sessions"]), use_container_width=True, hide_index=True)
+
+    if st.button("Run spill sweep now"):
+        session_memory.sweep()
+        st.rerun()
+
+    snap = metrics.snapshot()
+    over = snap["gauges"].get("session.over_budget_bytes", 0)
+    if over:
+        # Active sessions are never spilled, so the sweep cannot get under max_total_mb on its own
+        st.warning(f"Active sessions hold {over / 1024 / 1024:.1f} MB more than [session_memory] max_total_mb.")
+
+    # Profile cache: every hit is a DynamoDB read (and a JSON decode) not made
+    st.subheader("Profile Cache")
+    cache = profile_cache.stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hit Ratio", f"{cache['hit_ratio']:.0%}")
+    c2.metric("Hits / Misses", f"{cache['hits']:,} / {cache['misses']:,}")
+    c3.metric("Item Reads Saved", f"{cache['reads_saved']:,}")
+    c4.metric("GetItem Calls", f"{snap['counters'].get('dynamodb.calls.GetItem', 0):,}")
+
+    # DynamoDB latency per region, with replica misses and fallbacks to the home region
+    st.subheader("Storage Regions")
+    st.dataframe(pd.DataFrame(region_router.region_table(snap)), use_container_width=True, hide_index=True)
+
+    # Rerun latency per view and per storage/analyzer call
+    st.subheader("Rerun Latency")
+    latency = pd.DataFrame(tracing.latency_table(snap))
+    if latency.empty:
+        st.caption("No reruns recorded yet.")
+    else:
+        st.dataframe(latency, use_container_width=True, hide_index=True)
+        st.download_button("Download latency percentiles (CSV)", latency.to_csv(index=False),
+                           file_name="dreamjob_rerun_latency.csv", mime="text/csv")
+
+    slow = tracing.read_slow_log()
+    with st.expander(f"Slow reruns ({len(slow)} most recent)"):
+        for record in slow:
+            st.json(record, expanded=False)
+
+    # Bytes and elements each view sends to the browser per rerun
+    st.subheader("Render Payload")
+    payload = pd.DataFrame(payload_table(snap))
+    if payload.empty:
+        st.caption("No reruns recorded yet.")
+    else:
+        st.dataframe(payload, use_container_width=True, hide_index=True)
+
+    # Raw metrics
+    st.subheader("Metrics")
+    st.download_button("Download metrics (JSON)", json.dumps(snap, indent=2),
+                       file_name="dreamjob_metrics.json", mime="application/json")
+    st.json(snap, expanded=False)
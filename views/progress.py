@@ -1,5 +1,8 @@
 import streamlit as st
 import pandas as pd
+from services import session_memory, session_restore
+from utils import tracing
+from utils.fragments import fragment_only_run, rerun_fragment
 
 def render():
     st.title("Skills Progress Matrix")
@@ -39,6 +42,25 @@ def render():
             
         st.session_state.skill_matrix = pd.DataFrame(matrix_data)
 
+    skill_matrix()
+
+@st.fragment
+def skill_matrix():
+    # Editing the matrix or adding a skill reruns only this fragment, not the
+    # sidebar, navigation and routing in app.py.
+    with tracing.fragment("progress"):
+        # A fragment-only rerun skips app.py's touch(); the matrix may have been spilled
+        session_memory.touch()
+        _skill_matrix_body()
+
+def _save_matrix(df):
+    st.session_state.skill_matrix = df
+    # Full reruns are checkpointed at the end of app.py
+    if fragment_only_run():
+        session_restore.checkpoint()
+    rerun_fragment()
+
+def _skill_matrix_body():
     # Allow adding new skills
     with st.expander("Add Custom Skill"):
         c1, c2, c3 = st.columns([2, 1, 1])
@@ -47,8 +69,7 @@ def render():
         if c3.button("Add"):
             if new_skill:
                 new_row = {"Skill": new_skill, "Category": new_cat, "Done": False, "Priority": "Medium"}
-                st.session_state.skill_matrix = pd.concat([st.session_state.skill_matrix, pd.DataFrame([new_row])], ignore_index=True)
-                st.rerun()
+                _save_matrix(pd.concat([st.session_state.skill_matrix, pd.DataFrame([new_row])], ignore_index=True))
 
     # Editable Dataframe
     edited_df = st.data_editor(
@@ -73,8 +94,7 @@ def render():
     
     # Update state
     if not edited_df.equals(st.session_state.skill_matrix):
-        st.session_state.skill_matrix = edited_df
-        st.rerun()
+        _save_matrix(edited_df)
 
     # Metrics
     if not edited_df.empty:
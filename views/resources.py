@@ -1,62 +1,67 @@
 import streamlit as st
+from services.learning_plan import get_catalog, normalize_skill, plan
+from utils.payload import compact_enabled, paginate
+
+
+def _cost(item):
+    return f"${item['cost_usd']:,.0f}" if item.get('cost_usd') else "Free"
+
+
+def _render_plan(missing_skills):
+    """The smallest set of resources covering every gap within the budget, as one block."""
+    budget = st.number_input("Learning budget (USD, 0 = free resources only)", min_value=0, value=100, step=25,
+                             key="plan_budget")
+    result = plan(missing_skills, budget)
+    rows = [f"| **[{item['title']}]({item['link']})** | {', '.join(item['covers'])} | "
+            f"{_cost(item)} | {item.get('hours', 0):g} h |"
+            for item in result["items"]]
+    lines = ["### 🗺️ Your Learning Plan",
+             f"{len(result['items'])} resources, ${result['cost_usd']:,.0f} and about {result['hours']:,.0f} hours "
+             f"for {len(missing_skills) - len(result['uncovered'])} of your {len(missing_skills)} missing skills.", ""]
+    if rows:
+        lines += ["| Resource | Covers | Cost | Time |", "| --- | --- | --- | --- |"] + rows
+    if result["uncovered"]:
+        lines += ["", f"Not covered by the catalogue within this budget: {', '.join(result['uncovered'])}"]
+    st.markdown("\n".join(lines))
+
 
 def render():
     st.title("Personalized Learning Resources")
     st.markdown("Curated, high-quality resources to bridge your skill gaps. Direct links to official documentation and top-rated courses.")
     
-    # Factual Resource Database (No estimates, verified top providers)
-    resources_db = {
-        "Kubernetes": [
-            {"title": "Kubernetes Official Docs", "link": "https://kubernetes.io/docs/home/", "type": "Documentation", "cost": "Free"},
-            {"title": "Certified Kubernetes Administrator (CKA)", "link": "https://training.linuxfoundation.org/certification/certified-kubernetes-administrator-cka/", "type": "Certification", "cost": "Paid"},
-            {"title": "Kubernetes for the Absolute Beginners (Udemy)", "link": "https://www.udemy.com/course/learn-kubernetes/", "type": "Course", "cost": "Paid"}
-        ],
-        "Docker": [
-            {"title": "Docker Get Started", "link": "https://docs.docker.com/get-started/", "type": "Documentation", "cost": "Free"},
-            {"title": "Docker Mastery: with Kubernetes +Swarm (Udemy)", "link": "https://www.udemy.com/course/docker-mastery/", "type": "Course", "cost": "Paid"}
-        ],
-        "AWS": [
-            {"title": "AWS Skill Builder", "link": "https://explore.skillbuilder.aws/", "type": "Course", "cost": "Freemium"},
-            {"title": "AWS Certified Solutions Architect - Associate", "link": "https://aws.amazon.com/certification/certified-solutions-architect-associate/", "type": "Certification", "cost": "Paid"}
-        ],
-        "Python": [
-            {"title": "Python.org Official Tutorial", "link": "https://docs.python.org/3/tutorial/", "type": "Documentation", "cost": "Free"},
-            {"title": "Automate the Boring Stuff with Python", "link": "https://automatetheboringstuff.com/", "type": "Book/Course", "cost": "Free"}
-        ],
-        "CI/CD": [
-            {"title": "GitLab CI/CD Docs", "link": "https://docs.gitlab.com/ee/ci/", "type": "Documentation", "cost": "Free"},
-            {"title": "Jenkins - The Definitive Guide", "link": "https://www.jenkins.io/doc/", "type": "Documentation", "cost": "Free"}
-        ],
-        "System Design": [
-            {"title": "System Design Primer (GitHub)", "link": "https://github.com/donnemartin/system-design-primer", "type": "Guide", "cost": "Free"},
-            {"title": "Grokking the System Design Interview", "link": "https://www.designgurus.io/course/grokking-the-system-design-interview", "type": "Course", "cost": "Paid"}
-        ]
-    }
-    
     # Get user skills context
     analysis = st.session_state.get("analysis_result", {})
     missing_skills = [s['skill'] for s in analysis.get("missing_skills", [])]
     
-    # Display logic
-    if not missing_skills:
-        # Default view if no analysis
-        categories = resources_db.keys()
-    else:
-        # Prioritize missing skills
-        categories = list(set(missing_skills)) + [k for k in resources_db.keys() if k not in missing_skills]
+    if missing_skills:
+        _render_plan(missing_skills)
+
+    # One section per catalogue skill (the same catalogue the plan draws from),
+    # spelled as in the catalogue; missing skills first and expanded
+    catalog = get_catalog()
+    names = {}
+    for item in catalog.items:
+        for skill in item.get("skills", []):
+            names.setdefault(normalize_skill(skill), skill)
+    missing = [normalize_skill(s) for s in missing_skills]
+    ordered = [k for k in dict.fromkeys(missing) if k in catalog.by_skill]
+    ordered += [k for k in names if k not in ordered]
+    sections = [(k, k in missing) for k in ordered]
+    
+    # Compact mode: one table per category instead of three columns per item, paginated
+    compact = compact_enabled()
+    if compact:
+        sections = paginate(sections, key="resources_page")
     
-    for category in categories:
-        # Simple fuzzy matching for our DB keys
-        db_key = None
-        for k in resources_db.keys():
-            if k.lower() in category.lower() or category.lower() in k.lower():
-                db_key = k
-                break
-        
-        if db_key:
-            with st.expander(f"📚 {db_key} Resources", expanded=True if category in missing_skills else False):
-                for item in resources_db[db_key]:
+    for key, expanded in sections:
+        items = [catalog.items[i] for i in catalog.by_skill[key]]
+        with st.expander(f"📚 {names[key]} Resources", expanded=expanded):
+            if compact:
+                rows = [f"| **[{item['title']}]({item['link']})** | {item.get('type', '')} | {_cost(item)} |" for item in items]
+                st.markdown("\n".join(["| Resource | Type | Cost |", "| --- | --- | --- |"] + rows))
+            else:
+                for item in items:
                     c1, c2, c3 = st.columns([3, 1, 1])
                     c1.markdown(f"**[{item['title']}]({item['link']})**")
-                    c2.caption(item['type'])
-                    c3.caption(f"{item['cost']}")
+                    c2.caption(item.get('type', ''))
+                    c3.caption(_cost(item))